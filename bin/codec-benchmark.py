@@ -0,0 +1,44 @@
+import argparse
+import timeit
+
+import numpy as np
+
+from l2l import dict_to_list, list_to_dict, ParameterCodec
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compares the conversion of a population between Individual-Dicts and "
+                                                 "arrays with dict_to_list/list_to_dict and with a ParameterCodec")
+    parser.add_argument('--dims', type=int, default=10000, help="Number of values of the sequence parameter")
+    parser.add_argument('--pop-size', type=int, default=100, help="Number of individuals")
+    parser.add_argument('--repeat', type=int, default=5, help="Number of repetitions, the best time is reported")
+    args = parser.parse_args()
+
+    random_state = np.random.RandomState(0)
+    individual_dicts = [{'weights': random_state.rand(args.dims), 'learning_rate': random_state.rand(),
+                         'decay': random_state.rand()}
+                        for _ in range(args.pop_size)]
+    _, dict_spec = dict_to_list(individual_dicts[0], get_dict_spec=True)
+    codec = ParameterCodec(dict_spec)
+    values = codec.encode_population(individual_dicts)
+
+    conversions = [
+        ("encode", lambda: np.array([dict_to_list(ind) for ind in individual_dicts]),
+         lambda: codec.encode_population(individual_dicts)),
+        ("decode", lambda: [list_to_dict(row, dict_spec) for row in values],
+         lambda: codec.decode_population(values)),
+        # The optimizers used to convert the rows to lists before calling list_to_dict
+        ("decode from lists", lambda: [list_to_dict(row, dict_spec) for row in values.tolist()],
+         lambda: codec.decode_population(values)),
+    ]
+
+    print("Population of {} individuals with {} values each".format(args.pop_size, codec.size))
+    print("{:<20}{:>16}{:>16}{:>10}".format("conversion", "functions [ms]", "codec [ms]", "speed-up"))
+    for name, legacy, precompiled in conversions:
+        legacy_time = min(timeit.repeat(legacy, number=1, repeat=args.repeat)) * 1000
+        codec_time = min(timeit.repeat(precompiled, number=1, repeat=args.repeat)) * 1000
+        print("{:<20}{:>16.3f}{:>16.3f}{:>9.1f}x".format(name, legacy_time, codec_time, legacy_time / codec_time))
+
+
+if __name__ == '__main__':
+    main()
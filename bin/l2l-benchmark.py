@@ -0,0 +1,307 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from l2l.optimizees.functions.benchmarked_functions import BenchmarkedFunctions
+from l2l.optimizees.functions.function_generator import FunctionGenerator
+from l2l.optimizees.functions.optimizee import FunctionGeneratorOptimizee
+from l2l.optimizers.cmaes import CMAESOptimizer, CMAESParameters
+from l2l.optimizers.crossentropy import CrossEntropyOptimizer, CrossEntropyParameters
+from l2l.optimizers.crossentropy.distribution import Gaussian, NoisyGaussian
+from l2l.optimizers.evolution import GeneticAlgorithmOptimizer, GeneticAlgorithmParameters, \
+    SteadyStateGeneticAlgorithmOptimizer
+from l2l.optimizers.evolutionstrategies import EvolutionStrategiesOptimizer, EvolutionStrategiesParameters, \
+    AsynchronousEvolutionStrategiesOptimizer
+from l2l.optimizers.face import FACEOptimizer, FACEParameters
+from l2l.optimizers.gradientdescent import GradientDescentOptimizer, ClassicGDParameters
+from l2l.optimizers.gridsearch import GridSearchOptimizer, GridSearchParameters
+from l2l.optimizers.naturalevolutionstrategies import NaturalEvolutionStrategiesOptimizer, \
+    NaturalEvolutionStrategiesParameters
+from l2l.optimizers.paralleltempering.optimizer import ParallelTemperingOptimizer, ParallelTemperingParameters, \
+    AvailableCoolingSchedules as PTCoolingSchedules
+from l2l.optimizers.simulatedannealing.optimizer import SimulatedAnnealingOptimizer, SimulatedAnnealingParameters, \
+    AvailableCoolingSchedules as SACoolingSchedules
+from l2l.utils.environment import Environment
+from l2l.utils.phase_timings import get_timings
+
+# Phases which do not overlap, see Environment._record_timings
+TOP_LEVEL_PHASES = ['evaluation', 'checkpoint', 'post_process', 'jube_files', 'trajectory_dump', 'result_collection']
+
+
+def _ce(pop_size, n_iteration, dims, bound, seed):
+    return CrossEntropyOptimizer, CrossEntropyParameters(pop_size=pop_size, rho=0.2, smoothing=0.0, temp_decay=0,
+                                                         n_iteration=n_iteration,
+                                                         distribution=NoisyGaussian(noise_decay=0.95),
+                                                         stop_criterion=np.inf, seed=seed)
+
+
+def _face(pop_size, n_iteration, dims, bound, seed):
+    return FACEOptimizer, FACEParameters(min_pop_size=pop_size, max_pop_size=pop_size, n_elite=max(2, pop_size // 5),
+                                         smoothing=0.2, temp_decay=0, n_iteration=n_iteration, distribution=Gaussian(),
+                                         n_expand=5, seed=seed, stop_criterion=np.inf)
+
+
+def _ga(pop_size, n_iteration, dims, bound, seed):
+    return GeneticAlgorithmOptimizer, GeneticAlgorithmParameters(seed=seed, pop_size=pop_size, cx_prob=0.5,
+                                                                 mut_prob=0.3, n_iteration=n_iteration, ind_prob=0.02,
+                                                                 tourn_size=3, mate_par=0.5, mut_par=1)
+
+
+def _steady_state_ga(pop_size, n_iteration, dims, bound, seed):
+    return SteadyStateGeneticAlgorithmOptimizer, _ga(pop_size, n_iteration, dims, bound, seed)[1]
+
+
+def _es(pop_size, n_iteration, dims, bound, seed):
+    return EvolutionStrategiesOptimizer, EvolutionStrategiesParameters(learning_rate=0.1, noise_std=1.0,
+                                                                       mirrored_sampling_enabled=True,
+                                                                       fitness_shaping_enabled=True,
+                                                                       pop_size=pop_size, n_iteration=n_iteration,
+                                                                       stop_criterion=np.inf, seed=seed)
+
+
+def _asynchronous_es(pop_size, n_iteration, dims, bound, seed):
+    return AsynchronousEvolutionStrategiesOptimizer, _es(pop_size, n_iteration, dims, bound, seed)[1]
+
+
+def _nes(pop_size, n_iteration, dims, bound, seed):
+    return NaturalEvolutionStrategiesOptimizer, NaturalEvolutionStrategiesParameters(
+        learning_rate_mu=0.1, learning_rate_sigma=None, mu=np.zeros(dims), sigma=np.ones(dims),
+        mirrored_sampling_enabled=True, fitness_shaping_enabled=True, pop_size=pop_size, n_iteration=n_iteration,
+        stop_criterion=np.inf, seed=seed)
+
+
+def _cmaes(pop_size, n_iteration, dims, bound, seed):
+    return CMAESOptimizer, CMAESParameters(sigma=(bound[1] - bound[0]) / 4., pop_size=max(2, pop_size),
+                                           n_iteration=n_iteration, stop_criterion=np.inf, seed=seed)
+
+
+def _gd(pop_size, n_iteration, dims, bound, seed):
+    return GradientDescentOptimizer, ClassicGDParameters(learning_rate=0.01, exploration_step_size=0.01,
+                                                         n_random_steps=pop_size, n_iteration=n_iteration,
+                                                         stop_criterion=np.inf, seed=seed)
+
+
+def _grid_search(pop_size, n_iteration, dims, bound, seed):
+    # Grid search evaluates a single generation of (n_steps + 1) ** dims individuals
+    n_steps = max(1, int(round(pop_size ** (1. / dims))) - 1)
+    return GridSearchOptimizer, GridSearchParameters(param_grid={'coords': (bound[0], bound[1], n_steps)})
+
+
+def _sa(pop_size, n_iteration, dims, bound, seed):
+    return SimulatedAnnealingOptimizer, SimulatedAnnealingParameters(
+        n_parallel_runs=pop_size, noisy_step=.03, temp_decay=.99, n_iteration=n_iteration, stop_criterion=np.inf,
+        seed=seed, cooling_schedule=SACoolingSchedules.QUADRATIC_ADDAPTIVE)
+
+
+def _pt(pop_size, n_iteration, dims, bound, seed):
+    return ParallelTemperingOptimizer, ParallelTemperingParameters(
+        n_parallel_runs=pop_size, noisy_step=.03, n_iteration=n_iteration, stop_criterion=np.inf, seed=seed,
+        cooling_schedules=[PTCoolingSchedules.EXPONENTIAL_ADDAPTIVE] * pop_size,
+        temperature_bounds=np.tile([0.8, 0.], (pop_size, 1)), decay_parameters=np.full(pop_size, 0.99))
+
+
+# Name, function creating the optimizer class and parameters, fitness weight and whether the optimizer runs in the
+# asynchronous mode of the environment
+OPTIMIZERS = [
+    ('CrossEntropy', _ce, -1., False),
+    ('FACE', _face, -1., False),
+    ('GeneticAlgorithm', _ga, -1., False),
+    ('SteadyStateGeneticAlgorithm', _steady_state_ga, -1., True),
+    ('EvolutionStrategies', _es, -1., False),
+    ('AsynchronousEvolutionStrategies', _asynchronous_es, -1., True),
+    ('NaturalEvolutionStrategies', _nes, -1., False),
+    ('CMAES', _cmaes, -1., False),
+    # Gradient descent does descent!
+    ('GradientDescent', _gd, 1., False),
+    ('GridSearch', _grid_search, -1., False),
+    ('SimulatedAnnealing', _sa, -1., False),
+    ('ParallelTempering', _pt, -1., False),
+]
+
+
+def get_functions(names, dims_list):
+    """
+    Returns the benchmark functions to run as tuples (name, dims, function generator). Each function is used with its
+    own dimensionality, and additionally with each of dims_list it supports
+    """
+    bench_functs = BenchmarkedFunctions()
+    functions = []
+    for function_id, (name, _) in enumerate(bench_functs.function_name_map):
+        if names and name not in names:
+            continue
+        (_, fg_instance), _ = bench_functs.get_function_by_index(function_id, noise=False)
+        functions.append((name, fg_instance.dims, fg_instance))
+        for dims in dims_list:
+            if dims == fg_instance.dims:
+                continue
+            try:
+                resized = FunctionGenerator(fg_instance.function_parameters, dims=dims)
+                resized.cost_function(np.zeros(dims))
+            except Exception as e:
+                print("Skipping {} in {} dimensions: {!r}".format(name, dims, e))
+                continue
+            functions.append((name, dims, resized))
+    return functions
+
+
+def run_case(make_optimizer, fitness_weight, asynchronous, fg_instance, pop_size, args, trace_memory=False):
+    """
+    Runs one optimization and returns its measurements
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        env = Environment(trajectory='benchmark', filename=os.path.join(directory, 'benchmark'),
+                          automatic_storing=args.storing, backend=args.backend, n_workers=args.n_workers,
+                          asynchronous=asynchronous)
+        traj = env.trajectory
+        optimizee = FunctionGeneratorOptimizee(traj, fg_instance, seed=args.seed)
+        optimizer_class, parameters = make_optimizer(pop_size, args.n_iteration, fg_instance.dims,
+                                                     fg_instance.bound, args.seed)
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        optimizer = optimizer_class(traj, optimizee_create_individual=optimizee.create_individual,
+                                    optimizee_fitness_weights=(fitness_weight,), parameters=parameters,
+                                    optimizee_bounding_func=optimizee.bounding_func)
+        env.add_postprocessing(optimizer.post_process)
+        env.run(optimizee.simulate)
+        wall_time = time.perf_counter() - start
+        peak_memory = None
+        if trace_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    timings = get_timings(traj)
+    # Some optimizers empty the lists of fitnesses they are given, so the individuals are counted instead
+    n_evaluations = sum(len(traj.individuals[generation]) for generation in traj.results.all_results._data)
+    evaluation_time = sum(entry['phases'].get('evaluation', 0.) for entry in timings.values())
+    if not evaluation_time:
+        # The asynchronous mode only records the evaluation time of each individual
+        evaluation_time = sum(sum(entry['evaluation_times'].values()) for entry in timings.values())
+    latencies = [sum(entry['phases'].get(phase, 0.) for phase in TOP_LEVEL_PHASES) for entry in timings.values()]
+    return {
+        'wall_time': wall_time,
+        'n_evaluations': n_evaluations,
+        'n_generations': len(timings),
+        'evaluations_per_second': n_evaluations / wall_time,
+        'overhead_per_individual': (wall_time - evaluation_time) / max(n_evaluations, 1),
+        'generation_latency_mean': float(np.mean(latencies)) if latencies else None,
+        'generation_latency_max': float(np.max(latencies)) if latencies else None,
+        'peak_memory': peak_memory,
+    }
+
+
+def compare(results, baseline_path, threshold):
+    """
+    Prints the change of the measurements with respect to an earlier run of the benchmark
+    :return: the number of cases whose overhead per individual grew by more than the factor threshold
+    """
+    with open(baseline_path) as f:
+        baseline = {_case_key(case): case for case in json.load(f)['results']}
+    n_regressions = 0
+    print()
+    print("Comparison with {}".format(baseline_path))
+    print("{:<32}{:<16}{:>6}{:>6}{:>14}{:>14}".format("optimizer", "function", "dims", "pop", "evals/s", "overhead"))
+    for case in results:
+        old = baseline.get(_case_key(case))
+        if old is None or not old['evaluations_per_second'] or not old['overhead_per_individual']:
+            continue
+        speed = case['evaluations_per_second'] / old['evaluations_per_second']
+        overhead = case['overhead_per_individual'] / old['overhead_per_individual']
+        regression = overhead > threshold
+        n_regressions += regression
+        print("{:<32}{:<16}{:>6}{:>6}{:>13.2f}x{:>13.2f}x{}".format(
+            case['optimizer'], case['function'], case['dims'], case['pop_size'], speed, overhead,
+            "  REGRESSION" if regression else ""))
+    return n_regressions
+
+
+def _case_key(case):
+    return case['optimizer'], case['function'], case['dims'], case['pop_size']
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures the overhead of the outer loop for every optimizer on every "
+                                                 "benchmark function, and saves the results as JSON so that they "
+                                                 "can be compared between commits")
+    parser.add_argument('--optimizers', nargs='*', default=[], help="Optimizers to run, all by default: {}".format(
+        ", ".join(name for name, _, _, _ in OPTIMIZERS)))
+    parser.add_argument('--functions', nargs='*', default=[], help="Benchmark functions to run, all by default")
+    parser.add_argument('--pop-sizes', nargs='+', type=int, default=[10, 50], help="Population sizes")
+    parser.add_argument('--dims', nargs='*', type=int, default=[],
+                        help="Dimensions in which the functions are run in addition to their own")
+    parser.add_argument('--n-iteration', type=int, default=10, help="Number of generations")
+    parser.add_argument('--repeat', type=int, default=3, help="Number of repetitions, the fastest one is reported")
+    parser.add_argument('--backend', default='serial', choices=['serial', 'pool', 'workers'],
+                        help="Backend of the environment")
+    parser.add_argument('--n-workers', type=int, default=None, help="Number of workers of the backend")
+    parser.add_argument('--storing', action='store_true', help="Store the trajectory after every generation")
+    parser.add_argument('--no-memory', action='store_true',
+                        help="Do not measure the peak memory, which takes one more run with tracemalloc. Only the "
+                             "memory allocated in this process is measured")
+    parser.add_argument('--seed', type=int, default=1, help="Seed of the optimizers and optimizees")
+    parser.add_argument('--output', default='benchmark.json', help="Path of the JSON file with the results")
+    parser.add_argument('--compare', default=None, help="JSON file of an earlier run to compare the results with")
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help="Factor by which the overhead per individual has to grow to be reported as a regression")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    unknown = set(args.optimizers) - {name for name, _, _, _ in OPTIMIZERS}
+    if unknown:
+        parser.error("Unknown optimizers: {}".format(", ".join(sorted(unknown))))
+    optimizers = [optimizer for optimizer in OPTIMIZERS if not args.optimizers or optimizer[0] in args.optimizers]
+    functions = get_functions(args.functions, args.dims)
+
+    results = []
+    print("{:<32}{:<16}{:>6}{:>6}{:>12}{:>16}{:>14}{:>12}".format(
+        "optimizer", "function", "dims", "pop", "evals/s", "overhead [ms]", "latency [ms]", "peak [MB]"))
+    for optimizer_name, make_optimizer, fitness_weight, asynchronous in optimizers:
+        for function_name, dims, fg_instance in functions:
+            for pop_size in args.pop_sizes:
+                runs = [run_case(make_optimizer, fitness_weight, asynchronous, fg_instance, pop_size, args)
+                        for _ in range(args.repeat)]
+                case = min(runs, key=lambda run: run['wall_time'])
+                if not args.no_memory:
+                    case['peak_memory'] = run_case(make_optimizer, fitness_weight, asynchronous, fg_instance,
+                                                   pop_size, args, trace_memory=True)['peak_memory']
+                case.update(optimizer=optimizer_name, function=function_name, dims=dims, pop_size=pop_size)
+                results.append(case)
+                print("{:<32}{:<16}{:>6}{:>6}{:>12.1f}{:>16.3f}{:>14.3f}{:>12}".format(
+                    optimizer_name, function_name, dims, pop_size, case['evaluations_per_second'],
+                    case['overhead_per_individual'] * 1000, case['generation_latency_mean'] * 1000,
+                    "-" if case['peak_memory'] is None else "{:.2f}".format(case['peak_memory'] / 2 ** 20)))
+
+    meta = {
+        'commit': _git_commit(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'arguments': vars(args),
+    }
+    with open(args.output, 'w') as f:
+        json.dump({'meta': meta, 'results': results}, f, indent=2)
+    print("Results written to {}".format(args.output))
+
+    if args.compare is not None and compare(results, args.compare, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
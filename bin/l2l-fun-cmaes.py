@@ -0,0 +1,58 @@
+
+import numpy as np
+
+from l2l.optimizees.functions.benchmarked_functions import BenchmarkedFunctions
+from l2l.optimizees.functions.optimizee import FunctionGeneratorOptimizee
+from l2l.optimizers.cmaes import CMAESParameters, CMAESOptimizer
+from l2l.utils.experiment import Experiment
+
+
+def run_experiment():
+    experiment = Experiment("../results/")
+    name = 'L2L-FUN-CMAES'
+    trajectory_name = 'ipop'
+    traj, all_jube_params = experiment.prepare_experiment(name=name,
+                                                          trajectory_name=trajectory_name,
+                                                          log_stdout=True)
+
+    ## Benchmark function
+    function_id = 14
+    bench_functs = BenchmarkedFunctions()
+    (benchmark_name, benchmark_function), benchmark_parameters = \
+        bench_functs.get_function_by_index(function_id, noise=True)
+
+    optimizee_seed = 200
+
+    ## Innerloop simulator
+    optimizee = FunctionGeneratorOptimizee(traj, benchmark_function, seed=optimizee_seed)
+
+    ## Outerloop optimizer initialization
+    optimizer_seed = 1234
+    parameters = CMAESParameters(
+        sigma=1.0,
+        pop_size=None,
+        n_iteration=1000,
+        stop_criterion=np.inf,
+        seed=optimizer_seed,
+        n_restarts=5)
+
+    optimizer = CMAESOptimizer(
+        traj,
+        optimizee_create_individual=optimizee.create_individual,
+        optimizee_fitness_weights=(-1.,),
+        parameters=parameters,
+        optimizee_bounding_func=optimizee.bounding_func)
+
+    # Run experiment
+    experiment.run_experiment(optimizer=optimizer, optimizee=optimizee,
+                              optimizer_parameters=parameters)
+    # End experiment
+    experiment.end_experiment(optimizer)
+
+
+def main():
+    run_experiment()
+
+
+if __name__ == '__main__':
+    main()
@@ -14,7 +14,9 @@ def run_experiment():
                                                           log_stdout=True)
     optimizee_seed = 200
 
-    optimizee_parameters = MNISTOptimizeeParameters(n_hidden=10, seed=optimizee_seed, use_small_mnist=True)
+    # The individuals are scored on minibatches of 500 images, only the best one is scored on the whole dataset
+    optimizee_parameters = MNISTOptimizeeParameters(n_hidden=10, seed=optimizee_seed, use_small_mnist=True,
+                                                    minibatch_size=500)
     ## Innerloop simulator
     optimizee = MNISTOptimizee(traj, optimizee_parameters)
 
@@ -36,6 +38,8 @@ def run_experiment():
                               optimizee_parameters=optimizee_parameters)
     # End experiment
     experiment.end_experiment(optimizer)
+    print("Score of the best individual on the whole dataset: ",
+          optimizee.validate(optimizer.best_individual['weights']))
 
 
 def main():
@@ -0,0 +1,86 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from l2l.optimizees.synthetic import SyntheticOptimizee, SyntheticOptimizeeParameters
+from l2l.optimizers.crossentropy import CrossEntropyOptimizer, CrossEntropyParameters
+from l2l.optimizers.crossentropy.distribution import NoisyGaussian
+from l2l.utils.environment import Environment
+from l2l.utils.phase_timings import get_timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-tests an execution backend with the SyntheticOptimizee, whose "
+                                                 "evaluations take a configurable time and memory, and reports the "
+                                                 "throughput, the overhead and the stragglers of every generation")
+    parser.add_argument('--backend', default='pool', choices=['serial', 'pool', 'workers'],
+                        help="Backend of the environment")
+    parser.add_argument('--n-workers', type=int, default=None, help="Number of workers, default the number of CPUs")
+    parser.add_argument('--pop-size', type=int, default=1000, help="Number of individuals per generation")
+    parser.add_argument('--n-iteration', type=int, default=3, help="Number of generations")
+    parser.add_argument('--dims', type=int, default=10, help="Number of parameters of the individuals")
+    parser.add_argument('--latency', type=float, default=0.01, help="Latency of an evaluation in seconds, see "
+                                                                    "SyntheticOptimizeeParameters")
+    parser.add_argument('--distribution', default='fixed', choices=['fixed', 'lognormal', 'pareto'],
+                        help="Distribution of the latencies")
+    parser.add_argument('--shape', type=float, default=1., help="Shape of the distribution of the latencies")
+    parser.add_argument('--max-latency', type=float, default=None, help="Upper limit of the latencies in seconds")
+    parser.add_argument('--memory', type=int, default=0, help="Bytes allocated by each evaluation")
+    parser.add_argument('--busy-wait', action='store_true', help="Spend the latency computing instead of sleeping")
+    parser.add_argument('--timeout', type=float, default=None, help="Time limit of an evaluation in seconds")
+    parser.add_argument('--speculation-threshold', type=float, default=None,
+                        help="Fraction of a generation after which the stragglers are evaluated a second time")
+    parser.add_argument('--storing', action='store_true', help="Store the trajectory after every generation")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as directory:
+        env = Environment(trajectory='synthetic-load', filename=os.path.join(directory, 'synthetic-load'),
+                          automatic_storing=args.storing, backend=args.backend, n_workers=args.n_workers,
+                          timeout=args.timeout, speculation_threshold=args.speculation_threshold,
+                          penalty_fitness=None if args.timeout is None else (np.inf, ))
+        traj = env.trajectory
+        optimizee = SyntheticOptimizee(traj, SyntheticOptimizeeParameters(
+            dims=args.dims, latency=args.latency, latency_distribution=args.distribution, latency_shape=args.shape,
+            max_latency=args.max_latency, memory=args.memory, busy_wait=args.busy_wait, seed=1))
+        parameters = CrossEntropyParameters(pop_size=args.pop_size, rho=0.2, smoothing=0.0, temp_decay=0,
+                                            n_iteration=args.n_iteration, distribution=NoisyGaussian(),
+                                            stop_criterion=np.inf, seed=1)
+        optimizer = CrossEntropyOptimizer(traj, optimizee_create_individual=optimizee.create_individual,
+                                          optimizee_fitness_weights=(-1., ), parameters=parameters,
+                                          optimizee_bounding_func=optimizee.bounding_func)
+        env.add_postprocessing(optimizer.post_process)
+        start = time.perf_counter()
+        env.run(optimizee.simulate)
+        wall_time = time.perf_counter() - start
+
+    print("{:>4}{:>8}{:>14}{:>14}{:>14}{:>14}{:>14}{:>14}".format(
+        "gen", "n", "evaluation", "dispatch", "post_process", "evals/s", "median eval", "max eval"))
+    n_evaluations = 0
+    evaluation_time = 0.
+    for generation, entry in get_timings(traj).items():
+        phases = entry['phases']
+        times = np.array(list(entry['evaluation_times'].values()) or [np.nan])
+        n_individuals = len(traj.individuals[generation])
+        n_evaluations += n_individuals
+        evaluation_time += phases.get('evaluation', 0.)
+        print("{:>4}{:>8}{:>14.3f}{:>14.3f}{:>14.3f}{:>14.1f}{:>14.4f}{:>14.4f}".format(
+            generation, n_individuals, phases.get('evaluation', 0.), phases.get('dispatch', 0.),
+            phases.get('post_process', 0.), n_individuals / phases.get('evaluation', np.nan),
+            np.median(times), np.max(times)))
+    # With n_workers evaluating in parallel, the evaluations take at least this long
+    n_workers = 1 if args.backend == 'serial' else args.n_workers or os.cpu_count()
+    expected = sum(optimizee.get_latency(generation, ind_idx) for generation in range(args.n_iteration)
+                   for ind_idx in range(args.pop_size)) / n_workers
+    print("{} evaluations in {:.3f} s ({:.1f} evaluations/s), {:.3f} ms of overhead per individual".format(
+        n_evaluations, wall_time, n_evaluations / wall_time, (wall_time - evaluation_time) / n_evaluations * 1000))
+    print("Evaluation phases took {:.3f} s, the latencies alone {:.3f} s on {} workers".format(
+        evaluation_time, expected, n_workers))
+
+
+if __name__ == '__main__':
+    main()
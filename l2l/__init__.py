@@ -268,6 +268,79 @@ def list_to_dict(input_list, dict_spec):
     return return_dict
 
 
+class ParameterCodec:
+    """
+    Converts Individual-Dicts to arrays and back like :func:`.dict_to_list` and :func:`.list_to_dict`, for a given
+    dict specification. The specification is analysed once, when the codec is created, instead of at every conversion,
+    and whole populations are converted at once.
+
+    Decoding does not copy anything: the values of the returned Individual-Dicts are views into the given array.
+
+    :param dict_spec: The dict specification of the individuals, as returned by :func:`.dict_to_list`
+    """
+
+    def __init__(self, dict_spec):
+        self.dict_spec = tuple(dict_spec)
+        #: Tuples (key, column) giving the position of each parameter in the array of an individual
+        self.columns = []
+        cursor = 0
+        for key, value_type, value_len in self.dict_spec:
+            if value_type == DictEntryType.Sequence:
+                self.columns.append((key, slice(cursor, cursor + value_len)))
+            else:
+                self.columns.append((key, cursor))
+            cursor += value_len
+        #: Number of values of an individual
+        self.size = cursor
+
+    @classmethod
+    def from_individual(cls, individual_dict):
+        """
+        Creates the codec for individuals with the same parameters as the given Individual-Dict
+        """
+        _, dict_spec = dict_to_list(individual_dict, get_dict_spec=True)
+        return cls(dict_spec)
+
+    def encode(self, individual_dict):
+        """
+        Returns the array of the values of the given Individual-Dict, the same as :func:`.dict_to_list`
+        """
+        return self.encode_population([individual_dict])[0]
+
+    def decode(self, values):
+        """
+        Returns the Individual-Dict of the given array of values. The values of the dictionary are views into the array
+        """
+        return {key: values[column] for key, column in self.columns}
+
+    def encode_population(self, individual_dicts, dtype=None):
+        """
+        Returns an array with the values of one Individual-Dict per row
+        :param individual_dicts: List of Individual-Dicts
+        :param dtype: Type of the array. By default, the type of the values of the first individual
+        """
+        import numpy as np
+
+        if dtype is None:
+            if individual_dicts:
+                dtype = np.result_type(*[np.asarray(individual_dicts[0][key]) for key, _ in self.columns])
+            else:
+                dtype = np.float64
+        values = np.empty((len(individual_dicts), self.size), dtype=dtype)
+        if individual_dicts:
+            # One assignment per parameter instead of one per parameter and individual
+            for key, column in self.columns:
+                values[:, column] = [ind[key] for ind in individual_dicts]
+        return values
+
+    def decode_population(self, values):
+        """
+        Returns the list of the Individual-Dicts of the rows of the given array. The values of the dictionaries are
+        views into the array
+        """
+        return [{key: row[column] for key, column in self.columns} for row in values]
+
+
 def get_grouped_dict(dict_iter):
     """
     This function takes an iterator of :class:`dict` objects and returns a grouped dict. It
@@ -433,8 +506,19 @@ class DummyTrajectory:
 
 
 @contextmanager
-def timed(logger, section_name='Run'):
+def timed(logger, section_name='Run', timings=None):
+    """
+    Measures the wall-clock time spent in the enclosed block
+    :param logger: Logger to which the time is reported, or None to only record it in timings
+    :param section_name: Name of the measured section
+    :param timings: Optional dictionary in which the time is added to the entry section_name
+    """
     start = timer()
-    yield
-    end = timer()
-    logger.info("{} took {:.3f} seconds".format(section_name, end - start))
+    try:
+        yield
+    finally:
+        end = timer()
+        if timings is not None:
+            timings[section_name] = timings.get(section_name, 0.) + end - start
+        if logger is not None:
+            logger.info("{} took {:.3f} seconds".format(section_name, end - start))
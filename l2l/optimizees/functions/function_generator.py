@@ -70,6 +70,27 @@ class FunctionGenerator:
 
         return res
 
+    def cost_function_batch(self, X, random_state=None):
+        """Gets the values of the function for many points at once. This gives the same values as calling
+        :meth:`cost_function` on each row of `X` in turn, including the noise, but evaluates all the points with
+        NumPy operations.
+
+        :param X: array of shape (n_points, dims) with one point per row
+        :param ~numpy.random.RandomState random_state: The random generator used to generate the
+            noise for the function.
+        :return: array of shape (n_points,) with the values of the function
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        res = np.zeros(X.shape[0])
+        for f in self.gen_functions:
+            res += f.batch(X)
+
+        if self.noise:
+            assert isinstance(random_state, np.random.RandomState)
+            res += random_state.normal(self.mu, self.sigma, size=X.shape[0])
+
+        return res
+
     def get_params(self):
         fg_params = []
         for param in self.function_parameters:
@@ -98,6 +119,15 @@ class Function(ABC):
         """
         pass
 
+    def batch(self, X):
+        """
+        Evaluates the function on many points at once. Subclasses override this with a vectorised implementation.
+
+        :param X: input data matrix of shape (n_points, dims)
+        :return: array of shape (n_points,) with the output of the function for each row of X
+        """
+        return np.array([self(x) for x in X])
+
 
 ShekelParameters = namedtuple('ShekelParameters', ['A', 'c'])
 ShekelParameters.__doc__ = """
@@ -146,6 +176,10 @@ class Shekel(Function):
             value += sum_diff_sq
         return -value
 
+    def batch(self, X):
+        diff_sq = (X[:, np.newaxis, :] - self.A[np.newaxis, :, :]) ** 2 + self.c[np.newaxis, :, np.newaxis]
+        return -np.sum(np.sum(diff_sq, axis=2) ** -1, axis=1)
+
 
 MichalewiczParameters = namedtuple('MichalewiczParameters', ['m'])
 MichalewiczParameters.__doc__ = """
@@ -181,6 +215,11 @@ class Michalewicz(Function):
         value = -np.sum(np.sin(x) * b)
         return value
 
+    def batch(self, X):
+        i = np.arange(1, self.dims + 1)
+        b = np.sin((i * X ** 2) / np.pi) ** (2 * self.m)
+        return -np.sum(np.sin(X) * b, axis=1)
+
 
 LangermannParameters = namedtuple('LangermannParameters', ['A', 'c'])
 LangermannParameters.__doc__ = """
@@ -227,6 +266,10 @@ class Langermann(Function):
             value += self.c[i] * np.exp((-1 / np.pi) * sum_diff_sq) * np.cos(np.pi * sum_diff_sq)
         return value
 
+    def batch(self, X):
+        sum_diff_sq = np.sum((X[:, np.newaxis, :] - self.A[np.newaxis, :, :]) ** 2, axis=2)
+        return np.sum(self.c * np.exp((-1 / np.pi) * sum_diff_sq) * np.cos(np.pi * sum_diff_sq), axis=1)
+
 
 EasomParameters = namedtuple('EasomParameters', [])
 
@@ -251,6 +294,9 @@ class Easom(Function):
         value = -cos_x.prod() * np.exp(-np.sum(x_min_pi))
         return value
 
+    def batch(self, X):
+        return -np.prod(np.cos(X), axis=1) * np.exp(-np.sum((X - np.pi) ** 2, axis=1))
+
 
 PermutationParameters = namedtuple('PermutationParameters', ['beta'])
 PermutationParameters.__doc__ = """
@@ -290,6 +336,13 @@ class Permutation(Function):
         value = np.sum(value ** 2)
         return value
 
+    def batch(self, X):
+        # Axis 1 runs over the exponents k, axis 2 over the coordinates i
+        k = np.arange(1, self.dims + 1)[:, np.newaxis]
+        i = np.arange(1, self.dims + 1)[np.newaxis, :]
+        value = np.sum((i ** k + self.beta) * ((X[:, np.newaxis, :] / i) ** k - 1), axis=2)
+        return np.sum(value ** 2, axis=1)
+
 
 GaussianParameters = namedtuple('GaussianParameters', ['sigma', 'mean'])
 GaussianParameters.__doc__ = """
@@ -326,6 +379,12 @@ class Gaussian(Function):
         value = value * np.exp(-0.5 * (np.transpose(x - self.mean).dot(np.linalg.inv(self.sigma))).dot((x - self.mean)))
         return -value
 
+    def batch(self, X):
+        diff = X - self.mean
+        value = 1 / np.sqrt((2 * np.pi) ** self.dims * np.linalg.det(self.sigma))
+        exponent = np.einsum('ni,ij,nj->n', diff, np.linalg.inv(self.sigma), diff)
+        return -value * np.exp(-0.5 * exponent)
+
 
 RastriginParameters = namedtuple('RastriginParameters', [])
 
@@ -346,6 +405,9 @@ class Rastrigin(Function):
         x = np.array(x)
         return np.sum(x ** 2 + 10 - 10 * np.cos(2 * np.pi * x))
 
+    def batch(self, X):
+        return np.sum(X ** 2 + 10 - 10 * np.cos(2 * np.pi * X), axis=1)
+
 
 RosenbrockParameters = namedtuple('RosenbrockParameters', [])
 
@@ -370,6 +432,11 @@ class Rosenbrock(Function):
         value = sum(value)
         return value
 
+    def batch(self, X):
+        X_1 = X[:, 1:self.dims]
+        X_0 = X[:, 0:self.dims - 1]
+        return np.sum(100 * (X_1 - X_0 ** 2) ** 2 + (1 - X_0) ** 2, axis=1)
+
 
 AckleyParameters = namedtuple('AckleyParameters', [])
 
@@ -392,6 +459,10 @@ class Ackley(Function):
         return np.exp(1) + 20 - 20 * np.exp(-0.2 * np.sqrt(np.sum(x ** 2) / self.dims)) \
             - np.exp(np.sum(np.cos(2 * np.pi * x)) / self.dims)
 
+    def batch(self, X):
+        return np.exp(1) + 20 - 20 * np.exp(-0.2 * np.sqrt(np.sum(X ** 2, axis=1) / self.dims)) \
+            - np.exp(np.sum(np.cos(2 * np.pi * X), axis=1) / self.dims)
+
 
 ChasmParameters = namedtuple('ChasmParameters', [])
 
@@ -414,3 +485,6 @@ class Chasm(Function):
     def __call__(self, x):
         x = np.array(x)
         return 1e3 * np.abs(x[0]) / (1e3 * np.abs(x[0]) + 1) + 1e-2 * np.abs(x[1])
+
+    def batch(self, X):
+        return 1e3 * np.abs(X[:, 0]) / (1e3 * np.abs(X[:, 0]) + 1) + 1e-2 * np.abs(X[:, 1])
@@ -1,6 +1,7 @@
 import numpy as np
 
 from l2l.optimizees.optimizee import Optimizee
+from l2l.utils.population import stack_parameter
 
 
 class FunctionGeneratorOptimizee(Optimizee):
@@ -60,3 +61,17 @@ class FunctionGeneratorOptimizee(Optimizee):
 
         individual = np.array(traj.individual.coords)
         return (self.cost_fn(individual, random_state=self.random_state), )
+
+    def simulate_batch(self, traj, individuals):
+        """
+        Returns the values of the function chosen during initialization for all the individuals, computed in a single
+        vectorised call. The values, including the noise, are the same as those of :meth:`simulate` called on each
+        individual in turn, up to floating point rounding.
+
+        :param ~l2l.utils.trajectory.Trajectory traj: Trajectory
+        :param individuals: list of individuals to simulate
+        :return: a list of single element :obj:`tuple` containing the value of the chosen function for each individual
+        """
+        coords = stack_parameter(individuals, 'coords')
+        values = self.fg_instance.cost_function_batch(coords, random_state=self.random_state)
+        return [(value, ) for value in values]
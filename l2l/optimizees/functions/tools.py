@@ -16,8 +16,8 @@ def plot(fn, random_state):
     X = np.arange(fn.bound[0], fn.bound[1], 0.05)
     Y = np.arange(fn.bound[0], fn.bound[1], 0.05)
     XX, YY = np.meshgrid(X, Y)
-    Z = [fn.cost_function([x, y], random_state=random_state) for x, y in zip(XX.ravel(), YY.ravel())]
-    Z = np.array(Z).reshape(XX.shape)
+    Z = fn.cost_function_batch(np.column_stack((XX.ravel(), YY.ravel())), random_state=random_state)
+    Z = Z.reshape(XX.shape)
 
     # Plot the surface.
     surf = ax.plot_surface(XX, YY, Z, cmap=cm.coolwarm, linewidth=0, antialiased=False)
@@ -61,6 +61,40 @@ class NeuralNetworkClassifier:
         score = n_correct / n_total
         return score
 
+    def score_batch(self, hidden_weights, output_weights, x, y, dtype=np.float64, chunk_size=None):
+        """
+        Computes the score of many networks at once. The weights of all the networks are stacked, so that each chunk
+        of images is scored for all of them with a few large matrix multiplications.
+
+        :param hidden_weights: n_networks x n_hidden x n_input size
+        :param output_weights: n_networks x n_output x n_hidden size
+        :param x: batch_size x n_input size
+        :param y: batch_size size
+        :param dtype: floating point type used for the computation, e.g. np.float32 to halve the memory and time
+        :param chunk_size: number of images scored at once, which bounds the memory used. All at once if None
+        :return: n_networks size array with the score of each network
+        """
+        n_networks = hidden_weights.shape[0]
+        assert hidden_weights.shape[1:] == (self.n_hidden, self.n_input)
+        assert output_weights.shape[1:] == (self.n_output, self.n_hidden)
+        # All the hidden layers are stacked into a single matrix, -> (n_networks * n_hidden) x n_input
+        stacked_hidden_weights = hidden_weights.reshape(-1, self.n_input).astype(dtype, copy=False)
+        output_weights = output_weights.astype(dtype, copy=False)
+        n_total = len(y)
+        if chunk_size is None:
+            chunk_size = n_total
+
+        n_correct = np.zeros(n_networks, dtype=int)
+        for start in range(0, n_total, chunk_size):
+            x_chunk = x[start:start + chunk_size].astype(dtype, copy=False)
+            hidden_activation = sigmoid(np.dot(stacked_hidden_weights, x_chunk.T))
+            # -> n_networks x n_hidden x chunk_size
+            hidden_activation = hidden_activation.reshape(n_networks, self.n_hidden, -1)
+            output_activation = np.matmul(output_weights, hidden_activation)  # -> n_networks x n_output x chunk_size
+            output_labels = np.argmax(output_activation, axis=1)  # -> n_networks x chunk_size
+            n_correct += np.count_nonzero(y[start:start + chunk_size] == output_labels, axis=1)
+        return n_correct / n_total
+
 
 def main():
     from sklearn.datasets import load_digits, fetch_mldata
@@ -1,12 +1,34 @@
+import os
 from collections import namedtuple
 
 import numpy as np
 from sklearn.datasets import load_digits, fetch_openml
 
 from l2l.optimizees.optimizee import Optimizee
+from l2l.utils.population import stack_parameter
 from .nn import NeuralNetworkClassifier
 
-MNISTOptimizeeParameters = namedtuple('MNISTOptimizeeParameters', ['n_hidden', 'seed', 'use_small_mnist'])
+MNISTOptimizeeParameters = namedtuple('MNISTOptimizeeParameters', ['n_hidden', 'seed', 'use_small_mnist',
+                                                                   'score_dtype', 'score_chunk_size',
+                                                                   'minibatch_size', 'dataset_cache_path'])
+MNISTOptimizeeParameters.__new__.__defaults__ = ('float64', 10000, None, None)
+MNISTOptimizeeParameters.__doc__ = """
+:param n_hidden: Number of hidden units of the network
+:param seed: Seed of the random generator used to create the individuals
+:param use_small_mnist: Use the 8 x 8 digits dataset of scikit-learn instead of the 28 x 28 MNIST dataset
+:param score_dtype: Floating point type used by :meth:`MNISTOptimizee.simulate_batch`, 'float64' (default) or
+    'float32', which is faster but may round differently
+:param score_chunk_size: Number of images :meth:`MNISTOptimizee.simulate_batch` scores at once for the whole
+    population, which bounds the memory it uses (default 10000)
+:param minibatch_size: If set, the individuals are scored on a random subset of this many images instead of the whole
+    dataset. The subset is drawn anew every generation, seeded by `seed` and the generation, and is the same for all
+    the individuals of a generation. Use :meth:`MNISTOptimizee.validate` to score e.g. the best individual on the whole
+    dataset. Default None, i.e. the whole dataset is used
+:param dataset_cache_path: Directory where the normalised dataset is stored as .npy files, which are then opened
+    memory-mapped by the optimizee in every process instead of being loaded and copied into each of them. Default None,
+    i.e. the directory `mnist_cache` in the simulation path of the experiment if the trajectory was prepared by
+    :class:`~l2l.utils.experiment.Experiment`, and no cache otherwise
+"""
 
 
 class MNISTOptimizee(Optimizee):
@@ -25,28 +47,38 @@ class MNISTOptimizee(Optimizee):
     def __init__(self, traj, parameters):
         super().__init__(traj)
 
-        if parameters.use_small_mnist:
-            # 8 x 8 images
-            mnist_digits = load_digits()
-            n_input = np.prod(mnist_digits.images.shape[1:])
-            n_images = len(mnist_digits.images)  # 1797
-            data_images = mnist_digits.images.reshape(n_images, -1) / 16.  # -> 1797 x 64
-            data_targets = mnist_digits.target
+        cache_path = parameters.dataset_cache_path
+        if cache_path is None and 'JUBE_params' in traj.par.keys():
+            cache_path = os.path.join(traj.parameters["JUBE_params"].params['paths_obj'].simulation_path, 'mnist_cache')
+        if cache_path is not None:
+            name = 'small_mnist' if parameters.use_small_mnist else 'mnist'
+            self.dataset_cache_files = (os.path.join(cache_path, name + '_images.npy'),
+                                        os.path.join(cache_path, name + '_targets.npy'))
+            if not all(os.path.exists(fname) for fname in self.dataset_cache_files):
+                os.makedirs(cache_path, exist_ok=True)
+                for fname, data in zip(self.dataset_cache_files, self._load_dataset(parameters.use_small_mnist)):
+                    # Written under a temporary name first, as other processes may open the cache at the same time
+                    tmp_fname = '{}.{}.tmp'.format(fname, os.getpid())
+                    with open(tmp_fname, 'wb') as handle:
+                        np.save(handle, data)
+                    os.replace(tmp_fname, fname)
+            data_images, data_targets = self._open_dataset_cache()
         else:
-            # 28 x 28 images
-            mnist_digits = fetch_openml('MNIST original')
-            n_input = np.prod(mnist_digits.data.shape[1:])
-            data_images = mnist_digits.data / 255.  # -> 70000 x 284
-            n_images = len(data_images)
-            data_targets = mnist_digits.target
+            self.dataset_cache_files = None
+            data_images, data_targets = self._load_dataset(parameters.use_small_mnist)
+        n_images, n_input = data_images.shape
 
         self.n_images = n_images
+        self.score_dtype = np.dtype(parameters.score_dtype)
+        self.score_chunk_size = parameters.score_chunk_size
+        self.minibatch_size = parameters.minibatch_size
         self.data_images, self.data_targets = data_images, data_targets
 
         seed = parameters.seed
         n_hidden = parameters.n_hidden
 
         seed = np.uint32(seed)
+        self.seed = seed
         self.random_state = np.random.RandomState(seed=seed)
 
         n_output = 10  # This is always true for mnist
@@ -96,7 +128,56 @@ class MNISTOptimizee(Optimizee):
         # configure_loggers(exactly_once=True)  # logger configuration is here since this function is paralellised
         # taken care of by jube
 
-        flattened_weights = traj.individual.weights
+        self._set_weights(traj.individual.weights)
+        data_images, data_targets = self._evaluation_data(traj.individual.generation)
+        return self.nn.score(data_images, data_targets)
+
+    def simulate_batch(self, traj, individuals):
+        """
+        Returns the scores of the networks of all the individuals, computed together for the whole population. The
+        individuals have to belong to the same generation
+
+        :param ~l2l.utils.trajectory.Trajectory traj: Trajectory
+        :param individuals: list of individuals to simulate
+        :return: a list with the score of each individual
+        """
+        flattened_weights = stack_parameter(individuals, 'weights')
+        (n_hidden, n_input), (n_output, _) = self.nn.get_weights_shapes()
+        n_hidden_weights = n_hidden * n_input
+
+        hidden_weights = flattened_weights[:, :n_hidden_weights].reshape(-1, n_hidden, n_input)
+        output_weights = flattened_weights[:, n_hidden_weights:].reshape(-1, n_output, n_hidden)
+        data_images, data_targets = self._evaluation_data(individuals[0].generation)
+        scores = self.nn.score_batch(hidden_weights, output_weights, data_images, data_targets,
+                                     dtype=self.score_dtype, chunk_size=self.score_chunk_size)
+        return list(scores)
+
+    def validate(self, flattened_weights):
+        """
+        Returns the score of the network with the given weights on the whole dataset, also when the individuals are
+        scored on minibatches
+
+        :param flattened_weights: the weights of an individual, e.g. of the best one found by the optimizer
+        :return: the score on the whole dataset
+        """
+        self._set_weights(np.asarray(flattened_weights))
+        return self.nn.score(self.data_images, self.data_targets)
+
+    def _evaluation_data(self, generation):
+        """
+        Returns the images and targets the individuals of the given generation are scored on
+        """
+        if self.minibatch_size is None or self.minibatch_size >= self.n_images:
+            return self.data_images, self.data_targets
+        # The same minibatch is drawn for all the individuals of a generation, in every process
+        random_state = np.random.RandomState([self.seed, generation])
+        indices = np.sort(random_state.choice(self.n_images, self.minibatch_size, replace=False))
+        return self.data_images[indices], self.data_targets[indices]
+
+    def _set_weights(self, flattened_weights):
+        """
+        Sets the weights of the network from the flattened weights of an individual
+        """
         weight_shapes = self.nn.get_weights_shapes()
 
         cumulative_num_weights_per_layer = np.cumsum([np.prod(weight_shape) for weight_shape in weight_shapes])
@@ -111,4 +192,40 @@ class MNISTOptimizee(Optimizee):
             weights.append(w)
 
         self.nn.set_weights(*weights)
-        return self.nn.score(self.data_images, self.data_targets)
+
+    @staticmethod
+    def _load_dataset(use_small_mnist):
+        """
+        Loads the dataset and normalises the images
+        :return: the images, n_images x n_input, and the targets, n_images
+        """
+        if use_small_mnist:
+            # 8 x 8 images
+            mnist_digits = load_digits()
+            n_images = len(mnist_digits.images)  # 1797
+            data_images = mnist_digits.images.reshape(n_images, -1) / 16.  # -> 1797 x 64
+            data_targets = mnist_digits.target
+        else:
+            # 28 x 28 images
+            mnist_digits = fetch_openml('MNIST original')
+            data_images = mnist_digits.data / 255.  # -> 70000 x 284
+            data_targets = mnist_digits.target
+        return data_images, data_targets
+
+    def _open_dataset_cache(self):
+        """
+        Opens the cached images and targets memory-mapped and read-only
+        """
+        return tuple(np.load(fname, mmap_mode='r') for fname in self.dataset_cache_files)
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        if self.dataset_cache_files is not None:
+            # The dataset is opened again from the cache instead of being copied into the pickle
+            del state['data_images'], state['data_targets']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if self.dataset_cache_files is not None:
+            self.data_images, self.data_targets = self._open_dataset_cache()
@@ -41,3 +41,43 @@ class Optimizee:
             multi-dimensional fitness function.
 
         """
+
+    def simulate_batch(self, traj, individuals):
+        """
+        Does the simulation for all the given individuals at once. Optimizees which can evaluate many individuals more
+        efficiently than one after the other, e.g. with vectorised operations, should override this function. If it is
+        overridden, the :class:`~l2l.utils.environment.Environment` calls it once per generation instead of calling
+        :meth:`simulate` for every individual when the individuals are run in the main process (serial backend).
+        The default implementation calls :meth:`simulate` on each individual in turn.
+
+        :param  ~l2l.utils.trajectory.Trajectory traj: The trajectory that contains the parameters
+        :param individuals: list of :class:`~l2l.utils.individual.Individual` to simulate
+
+        :return: a :class:`list` with the fitness :class:`tuple` of each individual, in the same order as `individuals`
+        """
+        fitnesses = []
+        for ind in individuals:
+            traj.individual = ind
+            fitnesses.append(self.simulate(traj))
+        return fitnesses
+
+
+def get_simulate_batch(runfunc):
+    """
+    Returns the simulate_batch function of the optimizee if `runfunc` is the simulate function of an optimizee which
+    overrides :meth:`Optimizee.simulate_batch`, and None otherwise. A simulate_batch function inherited from a base
+    class of the class which defines simulate is not returned, as it would bypass the overridden simulate.
+
+    :param runfunc: The function called to simulate an individual, usually the bound simulate method of an optimizee
+    """
+    optimizee = getattr(runfunc, '__self__', None)
+    if not isinstance(optimizee, Optimizee) or runfunc.__name__ != 'simulate':
+        return None
+
+    def defining_class(name):
+        return next(cls for cls in type(optimizee).__mro__ if name in vars(cls))
+
+    batch_class = defining_class('simulate_batch')
+    if batch_class is Optimizee or not issubclass(batch_class, defining_class('simulate')):
+        return None
+    return optimizee.simulate_batch
@@ -0,0 +1,3 @@
+from .optimizee import SyntheticOptimizee, SyntheticOptimizeeParameters
+
+__all__ = ['SyntheticOptimizee', 'SyntheticOptimizeeParameters']
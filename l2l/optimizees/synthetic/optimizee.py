@@ -0,0 +1,114 @@
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from l2l.optimizees.optimizee import Optimizee
+
+SyntheticOptimizeeParameters = namedtuple('SyntheticOptimizeeParameters', ['dims', 'latency', 'latency_distribution',
+                                                                           'latency_shape', 'max_latency', 'memory',
+                                                                           'busy_wait', 'seed'])
+SyntheticOptimizeeParameters.__new__.__defaults__ = (0., 'fixed', 1., None, 0, False, 0)
+SyntheticOptimizeeParameters.__doc__ = """
+:param dims: Number of values of the parameter 'coords' of the individuals
+:param latency: Time in seconds taken by the evaluation of an individual: the fixed time, or the median of the
+    'lognormal' distribution, or the minimum of the 'pareto' distribution. Default 0
+:param latency_distribution: 'fixed' (default), 'lognormal' or 'pareto', the latter giving a few very slow stragglers
+:param latency_shape: Standard deviation of the logarithm of the latency for the 'lognormal' distribution, or shape
+    (tail index) of the 'pareto' distribution, whose mean is infinite if it is 1 or less. Default 1
+:param max_latency: Upper limit in seconds of the latency, default None, i.e. no limit
+:param memory: Number of bytes allocated and written during the evaluation of an individual, default 0
+:param busy_wait: Spend the latency in a busy loop instead of sleeping, so that the evaluation occupies a CPU. Default
+    False
+:param seed: Seed of the random generator used to create the individuals and to draw the latencies. Default 0
+"""
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'lognormal', 'pareto')
+
+
+class SyntheticOptimizee(Optimizee):
+    """
+    Optimizee without an actual workload, to measure the overhead and scaling of the execution backends. The evaluation
+    of an individual takes a configurable time and memory, and its fitness is the sum of the squares of its
+    coordinates, which is cheap and deterministic.
+
+    The latency of an individual is drawn from the given distribution with a random generator seeded by the seed, the
+    generation and the index of the individual. It is thus the same on every backend and every time the individual is
+    evaluated, e.g. when it is retried.
+
+    NOTE: Make sure the optimizee_fitness_weights is set to (-1,) to minimize the value of the function
+
+    :param traj: The trajectory used to conduct the optimization.
+    :param parameters: Instance of :func:`~collections.namedtuple` :class:`.SyntheticOptimizeeParameters`
+    """
+
+    def __init__(self, traj, parameters):
+        super().__init__(traj)
+        if parameters.latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError("Unknown latency distribution {}, expected one of {}".format(
+                parameters.latency_distribution, ", ".join(LATENCY_DISTRIBUTIONS)))
+
+        self.dims = parameters.dims
+        self.latency = parameters.latency
+        self.latency_distribution = parameters.latency_distribution
+        self.latency_shape = parameters.latency_shape
+        self.max_latency = parameters.max_latency
+        self.memory = parameters.memory
+        self.busy_wait = parameters.busy_wait
+        self.seed = np.uint32(parameters.seed)
+        self.bound = [-1., 1.]
+        self.random_state = np.random.RandomState(seed=self.seed)
+
+        traj.individual.f_add_parameter('coords', self.create_individual()['coords'])
+        traj.individual.f_add_parameter('seed', self.seed)
+
+    def create_individual(self):
+        """
+        Creates an individual with random coordinates in [-1, 1]
+        """
+        return {'coords': self.random_state.uniform(self.bound[0], self.bound[1], self.dims)}
+
+    def bounding_func(self, individual):
+        """
+        Bounds the individual within [-1, 1] via coordinate clipping
+        """
+        return {'coords': np.clip(individual['coords'], a_min=self.bound[0], a_max=self.bound[1])}
+
+    def get_latency(self, generation, ind_idx):
+        """
+        Returns the time in seconds taken by the evaluation of an individual
+        :param generation: Generation of the individual
+        :param ind_idx: Index of the individual
+        """
+        random_state = np.random.RandomState([self.seed, generation, ind_idx])
+        if self.latency_distribution == 'lognormal':
+            latency = self.latency * np.exp(self.latency_shape * random_state.standard_normal())
+        elif self.latency_distribution == 'pareto':
+            # numpy draws from the Lomax distribution, which is shifted by 1 from the Pareto distribution
+            latency = self.latency * (1. + random_state.pareto(self.latency_shape))
+        else:
+            latency = self.latency
+        if self.max_latency is not None:
+            latency = min(latency, self.max_latency)
+        return latency
+
+    def simulate(self, traj):
+        """
+        Waits for the latency of the individual while holding the configured memory, and returns the sum of the
+        squares of its coordinates
+
+        :param ~l2l.utils.trajectory.Trajectory traj: Trajectory
+        :return: a single element :obj:`tuple` containing the fitness
+        """
+        individual = traj.individual
+        end = time.time() + self.get_latency(individual.generation, individual.ind_idx)
+        # Every page is written so that the memory is actually committed
+        buffer = np.ones(self.memory, dtype=np.uint8) if self.memory else None
+        if self.busy_wait:
+            while time.time() < end:
+                pass
+        else:
+            time.sleep(max(0., end - time.time()))
+        del buffer
+        coords = np.asarray(individual.coords)
+        return (float(np.sum(coords ** 2)), )
@@ -0,0 +1,431 @@
+import logging
+from collections import namedtuple
+
+import numpy as np
+
+from l2l import dict_to_list, ParameterCodec
+from l2l.optimizers.optimizer import Optimizer
+from l2l.utils.population import Population
+
+logger = logging.getLogger("optimizers.cmaes")
+
+CMAESParameters = namedtuple('CMAESParameters', [
+    'sigma',
+    'pop_size',
+    'n_iteration',
+    'stop_criterion',
+    'seed',
+    'separable',
+    'eigen_update_interval',
+    'n_restarts',
+    'pop_size_increase',
+    'tol_fun',
+    'tol_x',
+])
+CMAESParameters.__new__.__defaults__ = (False, None, 0, 2, 1e-12, 1e-12)
+
+CMAESParameters.__doc__ = """
+:param sigma: Initial step size, i.e. standard deviation of the search distribution in every coordinate. It should be
+    about a fourth of the width of the region where the optimum is expected
+:param pop_size: Number of individuals per generation. If None, the default 4 + floor(3 * ln(d)) is used, where d is the
+    number of parameters of an individual
+:param n_iteration: Number of generations to perform, in total over all the restarts
+:param stop_criterion: (Optional) Stop if this fitness is reached.
+:param seed: The random seed used for generating new individuals
+:param separable: (Optional) Adapt only the diagonal of the covariance matrix, which takes O(d) instead of O(d^2)
+    time and memory per individual and learns faster, but cannot follow correlations between the parameters. Default
+    False
+:param eigen_update_interval: (Optional) Number of generations between two eigendecompositions of the covariance
+    matrix. Default: the number of generations after which the covariance matrix changes significantly, which grows
+    with d so that the O(d^3) decomposition does not dominate the cost of a generation
+:param n_restarts: (Optional) Number of restarts with an increased population size (IPOP-CMA-ES) once the search has
+    converged or stagnated, default 0
+:param pop_size_increase: (Optional) Factor by which the population size is multiplied at every restart, default 2
+:param tol_fun: (Optional) The search has converged once the fitnesses of the last generations vary by less than this,
+    default 1e-12
+:param tol_x: (Optional) The search has converged once the step size in every coordinate is smaller than this, default
+    1e-12
+"""
+
+
+class CMAESOptimizer(Optimizer):
+    """
+    Class implementing the covariance matrix adaptation evolution strategy (CMA-ES) with weighted recombination as in:
+
+    Hansen, N. (2016). The CMA Evolution Strategy: A Tutorial. arXiv:1604.00772 [cs, stat].
+
+    Ros, R., & Hansen, N. (2008). A Simple Modification in CMA-ES Achieving Linear Time and Space Complexity.
+    In Parallel Problem Solving from Nature - PPSN X (pp. 296-305).
+
+    Auger, A., & Hansen, N. (2005). A Restart CMA Evolution Strategy With Increasing Population Size.
+    In 2005 IEEE Congress on Evolutionary Computation (pp. 1769-1776).
+
+    In the pseudo code the algorithm does:
+
+    For n iterations do:
+      - Sample individuals x_i = m + sigma * B * D * z_i with z_i from N(0, I), where C = B * D^2 * B^T is the
+        eigendecomposition of the covariance matrix
+      - evaluate individuals and sort them in descending order of fitness
+      - Move the mean m to the weighted mean of the best half of the individuals
+      - Update the evolution paths p_sigma and p_c, i.e. the smoothed sums of the steps of the mean
+      - Update the covariance matrix C with the rank-one update p_c * p_c^T and the rank-mu update from the steps
+        of the best individuals
+      - Increase the step size sigma if p_sigma is longer than expected under random selection, decrease it otherwise
+      - Every `eigen_update_interval` generations, recompute B and D from C
+      - If the search has converged or stagnated, restart it from a new individual with a larger population, at most
+        `n_restarts` times
+
+    With `separable`, C is kept diagonal, so that B is the identity and D holds the square roots of its diagonal.
+
+    The individuals are bounded with the optimizee_bounding_func before being evaluated, and the bounded individuals
+    are used to update the distribution.
+
+    :param  ~l2l.utils.trajectory.Trajectory traj:
+      Use this trajectory to store the parameters of the specific runs. The parameters should be
+      initialized based on the values in `parameters`
+
+    :param optimizee_create_individual:
+      Function that creates a new individual. All parameters of the Individual-Dict returned should be
+      of numpy.float64 type. The first individual and the one of every restart are the initial mean of the search
+      distribution
+
+    :param optimizee_fitness_weights:
+      Fitness weights. The fitness returned by the Optimizee is multiplied by these values (one for each
+      element of the fitness vector)
+
+    :param parameters:
+      Instance of :func:`~collections.namedtuple` :class:`.CMAESParameters` containing the
+      parameters needed by the Optimizer
+
+    """
+
+    def __init__(self,
+                 traj,
+                 optimizee_create_individual,
+                 optimizee_fitness_weights,
+                 parameters,
+                 optimizee_bounding_func=None):
+
+        super().__init__(
+            traj,
+            optimizee_create_individual=optimizee_create_individual,
+            optimizee_fitness_weights=optimizee_fitness_weights,
+            parameters=parameters,
+            optimizee_bounding_func=optimizee_bounding_func)
+
+        self.optimizee_bounding_func = optimizee_bounding_func
+
+        if parameters.sigma <= 0:
+            raise ValueError("sigma needs to be greater than 0")
+        if parameters.pop_size is not None and parameters.pop_size < 2:
+            raise ValueError("pop_size needs to be greater than 1")
+        if parameters.pop_size_increase < 1:
+            raise ValueError("pop_size_increase needs to be at least 1")
+
+        current_individual_arr, self.optimizee_individual_dict_spec = dict_to_list(
+            self.optimizee_create_individual(), get_dict_spec=True)
+        self.optimizee_individual_codec = ParameterCodec(self.optimizee_individual_dict_spec)
+        n_dims = len(current_individual_arr)
+
+        if parameters.pop_size is None:
+            pop_size = 4 + int(np.floor(3 * np.log(n_dims)))
+        else:
+            pop_size = parameters.pop_size
+
+        # The following parameters are recorded
+        traj.f_add_parameter('sigma', parameters.sigma, comment='Initial step size')
+        traj.f_add_parameter('pop_size', pop_size, comment='Number of individuals simulated in each run')
+        traj.f_add_parameter('n_iteration', parameters.n_iteration, comment='Number of iterations to run')
+        traj.f_add_parameter(
+            'stop_criterion', parameters.stop_criterion, comment='Stop if best individual reaches this fitness')
+        traj.f_add_parameter(
+            'seed', np.uint32(parameters.seed), comment='Seed used for random number generation in optimizer')
+        traj.f_add_parameter('separable', parameters.separable, comment='Adapt only the diagonal of the covariance')
+        traj.f_add_parameter('n_restarts', parameters.n_restarts, comment='Number of restarts')
+        traj.f_add_parameter(
+            'pop_size_increase', parameters.pop_size_increase, comment='Increase of the population size at restarts')
+        traj.f_add_parameter('tol_fun', parameters.tol_fun, comment='Tolerance of the fitness for restarts')
+        traj.f_add_parameter('tol_x', parameters.tol_x, comment='Tolerance of the step size for restarts')
+
+        self.random_state = np.random.RandomState(traj.parameters.seed)
+
+        traj.f_add_derived_parameter(
+            'dimension', n_dims, comment='The dimension of the parameter space of the optimizee')
+
+        # Added a generation-wise parameter logging
+        traj.results.f_add_result_group(
+            'generation_params',
+            comment='This contains the optimizer parameters that are'
+                    ' common across a generation')
+
+        self.n_dims = n_dims
+        self.separable = parameters.separable
+        self.eigen_update_interval = parameters.eigen_update_interval
+        self.tol_fun = parameters.tol_fun
+        self.tol_x = parameters.tol_x
+        self.g = 0  # the current generation
+        self.restart = 0  # the number of restarts so far
+        self.best_fitness_in_run = -np.inf
+        self.best_individual_in_run = None
+        self.best_fitness = -np.inf
+        self.best_individual = None
+
+        self._start(current_individual_arr, pop_size, traj.sigma)
+
+        self.eval_pop = self._get_eval_pop()
+        self.eval_pop_arr = self.eval_pop.values
+
+        self._expand_trajectory(traj)
+
+    def _start(self, mean, pop_size, sigma):
+        """
+        Sets the strategy parameters for the given population size and resets the search distribution to the given
+        mean and step size
+        """
+        n = self.n_dims
+        self.pop_size = pop_size
+        self.n_parents = pop_size // 2
+        weights = np.log(self.n_parents + 0.5) - np.log(np.arange(1, self.n_parents + 1))
+        self.weights = weights / np.sum(weights)
+        self.mu_eff = 1. / np.sum(self.weights ** 2)
+
+        # Learning rates of the evolution paths, the covariance matrix and the step size
+        self.c_c = (4. + self.mu_eff / n) / (n + 4. + 2. * self.mu_eff / n)
+        self.c_sigma = (self.mu_eff + 2.) / (n + self.mu_eff + 5.)
+        self.c_1 = 2. / ((n + 1.3) ** 2 + self.mu_eff)
+        self.c_mu = min(1. - self.c_1, 2. * (self.mu_eff - 2. + 1. / self.mu_eff) / ((n + 2.) ** 2 + self.mu_eff))
+        if self.separable:
+            # A diagonal matrix has only n degrees of freedom and can be learned faster
+            self.c_1 = min(1., self.c_1 * (n + 2.) / 3.)
+            self.c_mu = min(1. - self.c_1, self.c_mu * (n + 2.) / 3.)
+        self.damps = 1. + 2. * max(0., np.sqrt((self.mu_eff - 1.) / (n + 1.)) - 1.) + self.c_sigma
+        # Expected length of a N(0, I) distributed vector
+        self.chi_n = np.sqrt(n) * (1. - 1. / (4. * n) + 1. / (21. * n ** 2))
+        if self.eigen_update_interval is None:
+            self.eigen_interval = max(1, int(0.5 / ((self.c_1 + self.c_mu) * n)))
+        else:
+            self.eigen_interval = max(1, self.eigen_update_interval)
+
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.sigma = float(sigma)
+        self.p_sigma = np.zeros(n)
+        self.p_c = np.zeros(n)
+        if self.separable:
+            self.cov = np.ones(n)  # the diagonal of the covariance matrix
+            self.eigenbasis = None
+        else:
+            self.cov = np.eye(n)
+            self.eigenbasis = np.eye(n)
+        self.eigenvalues_sqrt = np.ones(n)
+        self.last_eigen_update = 0
+        self.generation_in_restart = 0
+        self.best_fitness_history = []
+
+    def _get_eval_pop(self):
+        """
+        Returns the population to evaluate, sampled from the current search distribution
+        """
+        z = self.random_state.standard_normal((self.pop_size, self.n_dims))
+        if self.separable:
+            steps = z * self.eigenvalues_sqrt
+        else:
+            steps = np.dot(z * self.eigenvalues_sqrt, self.eigenbasis.T)
+        eval_pop = Population(self.mean + self.sigma * steps, self.optimizee_individual_codec)
+
+        # Bounding function has to be applied AFTER the individual has been converted to a dict
+        if self.optimizee_bounding_func is not None:
+            eval_pop = eval_pop.bounded(self.optimizee_bounding_func)
+        return eval_pop
+
+    def _update_eigendecomposition(self):
+        """
+        Recomputes B and D from the covariance matrix, see the class documentation
+        """
+        if self.separable:
+            self.eigenvalues_sqrt = np.sqrt(self.cov)
+            return
+        # Only the upper triangle is used, so rounding errors cannot make the matrix asymmetric
+        eigenvalues, self.eigenbasis = np.linalg.eigh(self.cov, UPLO='U')
+        self.eigenvalues_sqrt = np.sqrt(np.maximum(eigenvalues, np.finfo(float).tiny))
+        self.last_eigen_update = self.generation_in_restart
+
+    def post_process(self, traj, fitnesses_results):
+        """
+        See :meth:`~l2l.optimizers.optimizer.Optimizer.post_process`
+        """
+
+        n_iteration, stop_criterion = traj.n_iteration, traj.stop_criterion
+
+        weighted_fitness_list = np.empty(len(self.eval_pop_arr))
+        # **************************************************************************************************************
+        # Storing run-information in the trajectory
+        # Reading fitnesses and performing distribution update
+        # **************************************************************************************************************
+        for run_index, fitness in fitnesses_results:
+            # We need to convert the current run index into an ind_idx
+            # (index of individual within one generation)
+            traj.v_idx = run_index
+            ind_index = traj.par.ind_idx
+
+            traj.f_add_result('$set.$.individual', self.eval_pop[ind_index])
+            traj.f_add_result('$set.$.fitness', fitness)
+
+            weighted_fitness_list[ind_index] = np.dot(fitness, self.optimizee_fitness_weights)
+        traj.v_idx = -1  # set trajectory back to default
+        fitnesses_results.clear()
+
+        # Performs descending arg-sort of weighted fitness
+        fitness_sorting_indices = np.argsort(-weighted_fitness_list, kind='stable')
+        sorted_population = self.eval_pop_arr[fitness_sorting_indices]
+        sorted_fitness = weighted_fitness_list[fitness_sorting_indices]
+
+        self.best_individual_in_run = sorted_population[0]
+        self.best_fitness_in_run = sorted_fitness[0]
+        if self.best_fitness_in_run > self.best_fitness:
+            self.best_fitness = self.best_fitness_in_run
+            self.best_individual = self.optimizee_individual_codec.decode(self.best_individual_in_run)
+
+        logger.info("-- End of generation %d --", self.g)
+        logger.info("  Evaluated %d individuals", len(sorted_fitness))
+        logger.info('  Best Fitness: %.4f', self.best_fitness_in_run)
+        logger.info('  Average Fitness: %.4f', np.mean(sorted_fitness))
+        logger.info('  Step size: %.4g', self.sigma)
+
+        # **************************************************************************************************************
+        # Storing Generation Parameters / Results in the trajectory
+        # **************************************************************************************************************
+        # These entries correspond to the generation that has been simulated prior to this post-processing run
+
+        # Documentation of algorithm parameters for the current generation
+        #
+        # generation          - The index of the evaluated generation
+        # restart             - The number of restarts before the evaluated generation
+        # best_fitness_in_run - The highest fitness among the individuals in the
+        #                       evaluated generation
+        # pop_size            - Population size
+        generation_result_dict = {
+            'generation': self.g,
+            'restart': self.restart,
+            'best_fitness_in_run': self.best_fitness_in_run,
+            'average_fitness_in_run': np.mean(sorted_fitness),
+            'pop_size': self.pop_size
+        }
+
+        generation_name = 'generation_{}'.format(self.g)
+        traj.results.generation_params.f_add_result_group(generation_name)
+        traj.results.generation_params.f_add_result(
+            generation_name + '.algorithm_params',
+            generation_result_dict,
+            comment="These are the parameters that correspond to the algorithm. "
+                    "Look at the source code for `CMAESOptimizer::post_process()` "
+                    "for comments documenting these parameters"
+        )
+
+        # Only the variances are stored, the full covariance matrix can be too large to store in every generation
+        traj.results.generation_params.f_add_result(
+            generation_name + '.distribution_params',
+            {'mean': self.mean.copy(), 'sigma': self.sigma,
+             'variance': (self.cov if self.separable else np.diag(self.cov)).copy()},
+            comment="These are the parameters of the distribution that underlies the"
+                    " currently evaluated generation")
+
+        self._update_distribution(sorted_population)
+        converged = self._has_converged(sorted_fitness)
+
+        # **************************************************************************************************************
+        # Create the next generation by sampling the inferred distribution
+        # **************************************************************************************************************
+        # Note that this is only done in case the evaluated run is not the last run
+
+        # check if to stop
+        if self.g < n_iteration - 1 and self.best_fitness_in_run < stop_criterion:
+            if converged:
+                if self.restart >= traj.n_restarts:
+                    logger.info("-- Search converged after %d restarts --", self.restart)
+                    return
+                self.restart += 1
+                new_pop_size = int(self.pop_size * traj.pop_size_increase)
+                logger.info("-- Restart %d with %d individuals --", self.restart, new_pop_size)
+                new_individual_arr = self.optimizee_individual_codec.encode(self.optimizee_create_individual())
+                self._start(new_individual_arr, new_pop_size, traj.sigma)
+
+            self.eval_pop = self._get_eval_pop()
+            self.eval_pop_arr = self.eval_pop.values
+
+            self.g += 1  # Update generation counter
+            self._expand_trajectory(traj)
+
+    def _update_distribution(self, sorted_population):
+        """
+        Updates the mean, the evolution paths, the covariance matrix and the step size of the search distribution from
+        the individuals sorted in descending order of fitness
+        """
+        self.generation_in_restart += 1
+        steps = (sorted_population[:self.n_parents] - self.mean) / self.sigma
+        mean_step = np.dot(self.weights, steps)
+        self.mean = self.mean + self.sigma * mean_step
+
+        # C^(-1/2) * mean_step, with the possibly outdated eigendecomposition
+        if self.separable:
+            whitened_step = mean_step / self.eigenvalues_sqrt
+        else:
+            whitened_step = np.dot(self.eigenbasis,
+                                   np.dot(self.eigenbasis.T, mean_step) / self.eigenvalues_sqrt)
+        self.p_sigma = (1. - self.c_sigma) * self.p_sigma + \
+            np.sqrt(self.c_sigma * (2. - self.c_sigma) * self.mu_eff) * whitened_step
+        p_sigma_norm = np.linalg.norm(self.p_sigma)
+        # The rank-one update is stalled while the step size increases quickly
+        h_sigma = p_sigma_norm / np.sqrt(1. - (1. - self.c_sigma) ** (2 * self.generation_in_restart)) / self.chi_n \
+            < 1.4 + 2. / (self.n_dims + 1.)
+        self.p_c = (1. - self.c_c) * self.p_c + \
+            h_sigma * np.sqrt(self.c_c * (2. - self.c_c) * self.mu_eff) * mean_step
+
+        decay = 1. - self.c_1 - self.c_mu + (1. - h_sigma) * self.c_1 * self.c_c * (2. - self.c_c)
+        if self.separable:
+            self.cov = decay * self.cov + self.c_1 * self.p_c ** 2 + \
+                self.c_mu * np.dot(self.weights, steps ** 2)
+        else:
+            self.cov = decay * self.cov + self.c_1 * np.outer(self.p_c, self.p_c) + \
+                self.c_mu * np.dot(steps.T * self.weights, steps)
+
+        self.sigma *= np.exp(min(1., (self.c_sigma / self.damps) * (p_sigma_norm / self.chi_n - 1.)))
+
+        if self.separable or self.generation_in_restart - self.last_eigen_update >= self.eigen_interval:
+            self._update_eigendecomposition()
+
+    def _has_converged(self, sorted_fitness):
+        """
+        Returns whether the search has converged or stagnated, i.e. whether the fitness does not change anymore, the
+        steps are too small, or the covariance matrix is ill-conditioned
+        """
+        history_length = 10 + int(np.ceil(30. * self.n_dims / self.pop_size))
+        self.best_fitness_history.append(sorted_fitness[0])
+        self.best_fitness_history = self.best_fitness_history[-history_length:]
+
+        fitness_range = max(np.max(sorted_fitness) - np.min(sorted_fitness),
+                            np.max(self.best_fitness_history) - np.min(self.best_fitness_history))
+        if len(self.best_fitness_history) >= history_length and fitness_range < self.tol_fun:
+            logger.info("  Fitness changes less than tol_fun")
+            return True
+        if self.sigma * max(np.max(np.abs(self.p_c)), np.max(self.eigenvalues_sqrt)) < self.tol_x:
+            logger.info("  Step size is smaller than tol_x")
+            return True
+        if np.max(self.eigenvalues_sqrt) > 1e7 * np.min(self.eigenvalues_sqrt):
+            logger.info("  Covariance matrix is ill-conditioned")
+            return True
+        return not np.all(np.isfinite(self.mean))
+
+    def end(self, traj):
+        """
+        See :meth:`~l2l.optimizers.optimizer.Optimizer.end`
+        """
+        traj.f_add_result('final_individual', self.best_individual)
+        traj.f_add_result('final_fitness', self.best_fitness)
+        traj.f_add_result('n_iteration', self.g + 1)
+        traj.f_add_result('n_restarts', self.restart)
+
+        # ------------ Finished all runs and print result --------------- #
+        logger.info("-- End of (successful) CMA-ES optimization --")
+        logger.info("-- Final best individual --")
+        logger.info('  %s: %s', 'best_fitness', self.best_fitness)
+        logger.info('  %s: %s', 'restarts', self.restart)
@@ -356,3 +356,215 @@ class NoisyGaussian(Gaussian):
             " 'init_random_state' member function to set it"
 
         return self.random_state.multivariate_normal(self.mean, self.noisy_cov, n_individuals)
+
+
+class LowRankGaussian(Distribution):
+    """
+    Gaussian distribution whose covariance matrix is the sum of a low-rank and a diagonal matrix
+
+        cov = factors * factors^T + diag(diagonal)
+
+    where factors is a d x rank matrix. The factors are the leading principal components of the fitted data, and the
+    diagonal holds the variance they leave unexplained, so that the variance of every coordinate is the one of the data.
+    Unlike :class:`.Gaussian`, neither fitting nor sampling form the d x d covariance matrix: they take
+    O(n * d * min(n, d)) and O(n * d * rank) time for n individuals of d parameters, which makes the distribution usable
+    with individuals of thousands of parameters. The factors and the standard deviations computed by the fit are reused
+    by every call of :meth:`sample`.
+
+    :param rank: Number of factors, i.e. of directions whose correlations are kept
+    """
+
+    def __init__(self, rank=10):
+        if rank < 0:
+            raise ValueError("The rank of the distribution has to be non-negative")
+        self.rank = rank
+        self.random_state = None
+        self.mean = None
+        self.factors = None
+        self.diagonal = None
+        self._std = None
+
+    def init_random_state(self, random_state):
+        assert self.random_state is None, "The random_state has already been set for the distribution"
+        assert isinstance(random_state, np.random.RandomState)
+        self.random_state = random_state
+
+    def get_params(self):
+        params_dict_items = [("distribution_name", self.__class__.__name__),
+                             ("rank", self.rank)]
+        return dict(params_dict_items)
+
+    def _fit_factors(self, centered_data, n_samples):
+        """
+        Returns the leading principal components of the centered data, scaled by their standard deviation
+        """
+        rank = min(self.rank, *centered_data.shape)
+        if rank == 0:
+            return np.zeros((centered_data.shape[1], 0))
+        _, singular_values, components = np.linalg.svd(centered_data, full_matrices=False)
+        return components[:rank].T * (singular_values[:rank] / np.sqrt(n_samples))
+
+    def _truncate(self, factors):
+        """
+        Returns the best approximation of rank self.rank of factors * factors^T, as factors, and the diagonal of the
+        difference
+        """
+        if factors.shape[1] <= self.rank:
+            return factors, np.zeros(factors.shape[0])
+        q, r = np.linalg.qr(factors)
+        u, singular_values, _ = np.linalg.svd(r)
+        truncated = np.dot(q, u[:, :self.rank] * singular_values[:self.rank])
+        return truncated, np.sum(factors ** 2, axis=1) - np.sum(truncated ** 2, axis=1)
+
+    def fit(self, data_list, smooth_update=0):
+        """
+        Fit the distribution to the given data
+
+        :param data_list: list or numpy array with individuals as rows
+        :param smooth_update: determines to which extent the new samples account for the new distribution.
+          default is 0 -> old parameters are fully discarded. The smoothed covariance matrix is truncated to the rank of
+          the distribution again, its diagonal is kept
+
+        :return dict: specifying current parametrization
+        """
+        assert self.random_state is not None, \
+            "The random_state for the distribution has not been set, call the" \
+            " 'init_random_state' member function to set it"
+
+        data = np.asarray(data_list, dtype=np.float64)
+        # Same normalisation as np.cov, which Gaussian uses
+        n_samples = max(data.shape[0] - 1, 1)
+        mean = np.mean(data, axis=0)
+        centered_data = data - mean
+        factors = self._fit_factors(centered_data, n_samples)
+        diagonal = np.maximum(np.sum(centered_data ** 2, axis=0) / n_samples - np.sum(factors ** 2, axis=1), 0.)
+
+        if self.mean is None:
+            self.mean, self.factors, self.diagonal = mean, factors, diagonal
+
+        self.mean = smooth_update * self.mean + (1 - smooth_update) * mean
+        self.factors, residual = self._truncate(np.hstack((np.sqrt(smooth_update) * self.factors,
+                                                           np.sqrt(1 - smooth_update) * factors)))
+        self.diagonal = smooth_update * self.diagonal + (1 - smooth_update) * diagonal + np.maximum(residual, 0.)
+        self._std = np.sqrt(self.diagonal)
+
+        logger.debug('Gaussian center\n%s', self.mean)
+        logger.debug('Gaussian factors\n%s', self.factors)
+        logger.debug('Gaussian diagonal\n%s', self.diagonal)
+
+        return {'mean': self.mean, 'factors': self.factors, 'diagonal': self.diagonal}
+
+    def sample(self, n_individuals):
+        """Sample n_individuals individuals under the current parametrization
+
+        :param n_individuals: number of individuals to sample.
+
+        :return: numpy array with n_individual rows of individuals
+        """
+        assert self.random_state is not None, \
+            "The random_state for the distribution has not been set, call the" \
+            " 'init_random_state' member function to set it"
+        n_dims = self.mean.shape[0]
+        samples = self.mean + self._std * self.random_state.standard_normal((n_individuals, n_dims))
+        if self.factors.shape[1]:
+            samples += np.dot(self.random_state.standard_normal((n_individuals, self.factors.shape[1])),
+                              self.factors.T)
+        return samples
+
+
+class DiagonalGaussian(LowRankGaussian):
+    """
+    Gaussian distribution with a diagonal covariance matrix, i.e. with independent coordinates. Fitting and sampling
+    take O(n * d) time for n individuals of d parameters. See :class:`.LowRankGaussian`
+    """
+
+    def __init__(self):
+        LowRankGaussian.__init__(self, rank=0)
+
+    def get_params(self):
+        params_dict_items = [("distribution_name", self.__class__.__name__)]
+        return dict(params_dict_items)
+
+    def fit(self, data_list, smooth_update=0):
+        """
+        Fit the distribution to the given data, see :meth:`.LowRankGaussian.fit`
+
+        :return dict: specifying current parametrization
+        """
+        LowRankGaussian.fit(self, data_list, smooth_update)
+        return {'mean': self.mean, 'variance': self.diagonal}
+
+
+class NoisyLowRankGaussian(LowRankGaussian):
+    """
+    Additive Noisy :class:`.LowRankGaussian` distribution. As for :class:`.NoisyGaussian`, noise is added to the
+    variance of each coordinate after every fit and decayed afterwards.
+
+    :param rank: Number of factors, see :class:`.LowRankGaussian`
+    :param noise_magnitude: scalar factor that affects the magnitude of noise
+        applied on the distribution parameters
+    :param coordinate_scale: This should be a vector representing the scaling of
+        the coordinates. The noise applied to each coordinate `i` is
+        `noise_magnitude*coordinate_scale[i]`
+    :param noise_decay: Multiplicative decay of the noise components
+    """
+
+    def __init__(self, rank=10, noise_magnitude=1.0, coordinate_scale=None, noise_decay=0.95):
+        LowRankGaussian.__init__(self, rank=rank)
+        self.noise_decay = noise_decay
+        self.noise_magnitude = np.float64(noise_magnitude)
+        if coordinate_scale is None:
+            self.coordinate_scale = np.float64(1)
+        else:
+            self.coordinate_scale = np.array(coordinate_scale).astype(np.float64)
+        self.current_noise_magnitude = self.noise_magnitude
+        self.noise_value = None
+
+    def get_params(self):
+        params_dict = super().get_params()
+        params_dict.update(dict(distribution_name=self.__class__.__name__,
+                                noise_magnitude=self.noise_magnitude,
+                                coordinate_scale=self.coordinate_scale,
+                                noise_decay=self.noise_decay))
+        return params_dict
+
+    def fit(self, data_list, smooth_update=0):
+        """
+        Fits the parameters to the given data (see :class:`.LowRankGaussian`) and additionally
+        adds noise to the variance of each coordinate. Also, the noise is decayed after each step
+
+        :param data_list: Data to be fitted to
+        :param smooth_update: Smooth the parameter update with regard to the
+            previous configuration
+
+        :return dict: describing parameter configuration
+        """
+        distribution_parameters = super().fit(data_list, smooth_update)
+        n_dims = self.diagonal.shape[0]
+        self.noise_value = np.abs(
+            self.random_state.normal(loc=0.0, scale=self.current_noise_magnitude * self.coordinate_scale,
+                                     size=n_dims))
+        # Only the sampling uses the noise, the fitted diagonal is smoothed without it like in NoisyGaussian
+        self._std = np.sqrt(self.diagonal + self.noise_value)
+        self.current_noise_magnitude *= self.noise_decay
+
+        logger.debug('Noise value\n%s', self.noise_value)
+        distribution_parameters['noise_value'] = self.noise_value
+        return distribution_parameters
+
+
+class NoisyDiagonalGaussian(NoisyLowRankGaussian, DiagonalGaussian):
+    """
+    Additive Noisy :class:`.DiagonalGaussian` distribution, see :class:`.NoisyLowRankGaussian`
+
+    :param noise_magnitude: scalar factor that affects the magnitude of noise
+        applied on the distribution parameters
+    :param coordinate_scale: This should be a vector representing the scaling of
+        the coordinates. The noise applied to each coordinate `i` is
+        `noise_magnitude*coordinate_scale[i]`
+    :param noise_decay: Multiplicative decay of the noise components
+    """
+
+    def __init__(self, noise_magnitude=1.0, coordinate_scale=None, noise_decay=0.95):
+        NoisyLowRankGaussian.__init__(self, rank=0, noise_magnitude=noise_magnitude,
+                                      coordinate_scale=coordinate_scale, noise_decay=noise_decay)
@@ -3,8 +3,9 @@ from collections import namedtuple
 
 import numpy as np
 
-from l2l import dict_to_list, list_to_dict
+from l2l import dict_to_list, ParameterCodec
 from l2l.optimizers.optimizer import Optimizer
+from l2l.utils.population import Population
 
 logger = logging.getLogger("optimizers.crossentropy")
 
@@ -27,7 +28,9 @@ CrossEntropyParameters.__doc__ = """
 
 :param n_iteration: Number of iterations to perform
 :param distribution: Distribution object to use. Has to implement a fit and sample function. Should be one of 
-  :class:`~.Gaussian`, :class:`~.NoisyGaussian`, :class:`~.BayesianGaussianMixture`, :class:`~.NoisyBayesianGaussianMixture`
+  :class:`~.Gaussian`, :class:`~.NoisyGaussian`, :class:`~.BayesianGaussianMixture`, :class:`~.NoisyBayesianGaussianMixture`,
+  or for individuals with many parameters :class:`~.DiagonalGaussian`, :class:`~.NoisyDiagonalGaussian`,
+  :class:`~.LowRankGaussian`, :class:`~.NoisyLowRankGaussian`
 :param stop_criterion: (Optional) Stop if this fitness is reached.
 :param seed: The random seed used to sample and fit the distribution. :class:`.CrossEntropyOptimizer`
     uses a random generator seeded with this seed.
@@ -106,6 +109,7 @@ class CrossEntropyOptimizer(Optimizer):
 
         temp_indiv, self.optimizee_individual_dict_spec = dict_to_list(self.optimizee_create_individual(),
                                                                        get_dict_spec=True)
+        self.optimizee_individual_codec = ParameterCodec(self.optimizee_individual_dict_spec)
         traj.f_add_derived_parameter('dimension', len(temp_indiv),
                                      comment='The dimension of the parameter space of the optimizee')
         traj.f_add_derived_parameter('n_elite', int(parameters.rho * parameters.pop_size),
@@ -137,8 +141,8 @@ class CrossEntropyOptimizer(Optimizer):
         if optimizee_bounding_func is not None:
             current_eval_pop = [self.optimizee_bounding_func(ind) for ind in current_eval_pop]
 
-        self.eval_pop = current_eval_pop
-        self.eval_pop_asarray = np.array([dict_to_list(x) for x in self.eval_pop])
+        self.eval_pop = Population.from_dicts(current_eval_pop, self.optimizee_individual_codec)
+        self.eval_pop_asarray = self.eval_pop.values
 
         # Max Likelihood
         self.current_distribution = parameters.distribution
@@ -192,8 +196,7 @@ class CrossEntropyOptimizer(Optimizer):
         # See original describtion of cross entropy for optimization
         elite_individuals = sorted_population[:n_elite]
 
-        self.best_individual = list_to_dict(sorted_population[0],
-                                            self.optimizee_individual_dict_spec)
+        self.best_individual = self.optimizee_individual_codec.decode(sorted_population[0])
         self.best_fitness_in_run = sorted_fitness[0]
         self.gamma = sorted_fitness[n_elite - 1]
 
@@ -261,18 +264,16 @@ class CrossEntropyOptimizer(Optimizer):
         #**************************************************************************************************************
         # Note that this is only done in case the evaluated run is not the last run
         fitnesses_results.clear()
-        self.eval_pop.clear()
 
         # check if to stop
         if self.g < n_iteration - 1 and self.best_fitness_in_run < stop_criterion:
             #Sample from the constructed distribution
             self.eval_pop_asarray = self.current_distribution.sample(self.pop_size)
-            self.eval_pop = [list_to_dict(ind_asarray, self.optimizee_individual_dict_spec)
-                             for ind_asarray in self.eval_pop_asarray]
+            self.eval_pop = Population(self.eval_pop_asarray, self.optimizee_individual_codec)
             # Clip to boundaries
             if self.optimizee_bounding_func is not None:
-                self.eval_pop = [self.optimizee_bounding_func(individual) for individual in self.eval_pop]
-                self.eval_pop_asarray = np.array([dict_to_list(x) for x in self.eval_pop])
+                self.eval_pop = self.eval_pop.bounded(self.optimizee_bounding_func)
+                self.eval_pop_asarray = self.eval_pop.values
             self.g += 1  # Update generation counter
             self.T *= temp_decay
             self._expand_trajectory(traj)
@@ -1,7 +1,9 @@
 from .optimizer import GeneticAlgorithmParameters
 from .optimizer import GeneticAlgorithmOptimizer
+from .optimizer import SteadyStateGeneticAlgorithmOptimizer
 
 __all__ = [
     'GeneticAlgorithmParameters',
     'GeneticAlgorithmOptimizer',
+    'SteadyStateGeneticAlgorithmOptimizer',
 ]
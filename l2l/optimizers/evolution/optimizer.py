@@ -4,10 +4,12 @@ import random
 from collections import namedtuple
 
 from deap import base, creator, tools
+import numpy as np
 from deap.tools import HallOfFame
 
-from l2l import dict_to_list, list_to_dict
+from l2l import dict_to_list, ParameterCodec
 from l2l.optimizers.optimizer import Optimizer
+from l2l.utils.population import Population
 
 logger = logging.getLogger("l2l-ga")
 
@@ -52,6 +54,7 @@ class GeneticAlgorithmOptimizer(Optimizer):
                          parameters=parameters, optimizee_bounding_func=optimizee_bounding_func)
         self.optimizee_bounding_func = optimizee_bounding_func
         __, self.optimizee_individual_dict_spec = dict_to_list(optimizee_create_individual(), get_dict_spec=True)
+        self.optimizee_individual_codec = ParameterCodec(self.optimizee_individual_dict_spec)
 
         traj.f_add_parameter('seed', parameters.seed, comment='Seed for RNG')
         traj.f_add_parameter('pop_size', parameters.pop_size, comment='Population size')  # 185
@@ -70,7 +73,7 @@ class GeneticAlgorithmOptimizer(Optimizer):
         toolbox = base.Toolbox()
         # Structure initializers
         toolbox.register("individual", tools.initIterate, creator.Individual,
-                         lambda: dict_to_list(optimizee_create_individual()))
+                         lambda: self.optimizee_individual_codec.encode(optimizee_create_individual()))
         toolbox.register("population", tools.initRepeat, list, toolbox.individual)
 
         # Operator registering
@@ -83,11 +86,11 @@ class GeneticAlgorithmOptimizer(Optimizer):
                 else:
                     # Deap Functions modify individuals in-place, Hence we must do the same
                     result_individuals_deap = func(*args, **kwargs)
-                    result_individuals = [list_to_dict(x, self.optimizee_individual_dict_spec)
+                    result_individuals = [self.optimizee_individual_codec.decode(np.asarray(x))
                                           for x in result_individuals_deap]
                     bounded_individuals = [self.optimizee_bounding_func(x) for x in result_individuals]
                     for i, deap_indiv in enumerate(result_individuals_deap):
-                        deap_indiv[:] = dict_to_list(bounded_individuals[i])
+                        deap_indiv[:] = self.optimizee_individual_codec.encode(bounded_individuals[i])
                     print("Bounded Individual: {}".format(bounded_individuals))
                     return result_individuals_deap
 
@@ -103,8 +106,7 @@ class GeneticAlgorithmOptimizer(Optimizer):
         # NOTE: The Individual object implements the list interface.
         self.pop = toolbox.population(n=traj.pop_size)
         self.eval_pop_inds = [ind for ind in self.pop if not ind.fitness.valid]
-        self.eval_pop = [list_to_dict(ind, self.optimizee_individual_dict_spec)
-                         for ind in self.eval_pop_inds]
+        self.eval_pop = self._get_eval_pop()
 
         self.g = 0  # the current generation
         self.toolbox = toolbox  # the DEAP toolbox
@@ -142,16 +144,16 @@ class GeneticAlgorithmOptimizer(Optimizer):
 
         logger.info("-- End of generation {} --".format(self.g))
         best_inds = tools.selBest(self.eval_pop_inds, 2)
-        self.best_individual = list_to_dict(best_inds[0], self.optimizee_individual_dict_spec)
+        self.best_individual = self.optimizee_individual_codec.decode(np.asarray(best_inds[0]))
         for best_ind in best_inds:
-            print("Best individual is %s, %s" % (list_to_dict(best_ind, self.optimizee_individual_dict_spec),
+            print("Best individual is %s, %s" % (self.optimizee_individual_codec.decode(np.asarray(best_ind)),
                                                  best_ind.fitness.values))
 
         self.hall_of_fame.update(self.eval_pop_inds)
 
         logger.info("-- Hall of fame --")
         for hof_ind in tools.selBest(self.hall_of_fame, 2):
-            logger.info("HOF individual is %s, %s" % (list_to_dict(hof_ind, self.optimizee_individual_dict_spec),
+            logger.info("HOF individual is %s, %s" % (self.optimizee_individual_codec.decode(np.asarray(hof_ind)),
                                                       hof_ind.fitness.values))
 
         # ------- Create the next generation by crossover and mutation -------- #
@@ -186,12 +188,19 @@ class GeneticAlgorithmOptimizer(Optimizer):
             self.pop[:] = offspring
 
             self.eval_pop_inds = [ind for ind in self.pop if not ind.fitness.valid]
-            self.eval_pop = [list_to_dict(ind, self.optimizee_individual_dict_spec)
-                             for ind in self.eval_pop_inds]
+            self.eval_pop = self._get_eval_pop()
 
             self.g += 1  # Update generation counter
             self._expand_trajectory(traj)
 
+    def _get_eval_pop(self):
+        """
+        Returns the population of the DEAP individuals which have to be evaluated
+        """
+        values = np.reshape(np.array(self.eval_pop_inds, dtype=float),
+                            (len(self.eval_pop_inds), self.optimizee_individual_codec.size))
+        return Population(values, self.optimizee_individual_codec)
+
     def end(self, traj):
         """
         See :meth:`~l2l.optimizers.optimizer.Optimizer.end`
@@ -205,3 +214,86 @@ class GeneticAlgorithmOptimizer(Optimizer):
         logger.info("-- Hall of fame --")
         for hof_ind in self.hall_of_fame:
             logger.info("HOF individual is %s, %s" % (hof_ind, hof_ind.fitness.values))
+
+
+class SteadyStateGeneticAlgorithmOptimizer(GeneticAlgorithmOptimizer):
+    """
+    Steady-state variant of the :class:`GeneticAlgorithmOptimizer`, to be run in the asynchronous mode of the
+    environment. There is no barrier between generations: every time the fitness of an individual is known, it
+    replaces the worst individual of the population if it is better, and a single offspring is bred from the
+    population by tournament selection, crossover and mutation and evaluated in its place. This keeps all the workers
+    busy when the evaluation times vary.
+
+    Every `pop_size` evaluations count as a generation, and `pop_size * n_iteration` individuals are evaluated in total,
+    as in the :class:`GeneticAlgorithmOptimizer`.
+
+    See :class:`GeneticAlgorithmOptimizer` for the parameters.
+    """
+
+    asynchronous = True
+
+    def __init__(self, traj,
+                 optimizee_create_individual,
+                 optimizee_fitness_weights,
+                 parameters,
+                 optimizee_bounding_func=None):
+        super().__init__(traj, optimizee_create_individual, optimizee_fitness_weights, parameters,
+                         optimizee_bounding_func=optimizee_bounding_func)
+        # The DEAP individuals being evaluated, indexed by ind_idx. The population only holds evaluated individuals
+        self.pending = dict(enumerate(self.pop))
+        self.pop = []
+        self.n_submitted = len(self.pending)
+        self.n_evaluated = 0
+
+    def post_process(self, traj, fitnesses_results):
+        raise Exception("The SteadyStateGeneticAlgorithmOptimizer can only be run in the asynchronous mode of the "
+                        "environment")
+
+    def post_process_individual(self, traj, individual, fitness):
+        """
+        See :meth:`~l2l.optimizers.optimizer.Optimizer.post_process_individual`
+        """
+        deap_individual = self.pending.pop(individual.ind_idx)
+        deap_individual.fitness.values = fitness
+        traj.f_add_result('$set.$.individual', self.optimizee_individual_codec.decode(np.asarray(deap_individual)))
+        traj.f_add_result('$set.$.fitness', fitness)
+        self.hall_of_fame.update([deap_individual])
+
+        if len(self.pop) < traj.pop_size:
+            self.pop.append(deap_individual)
+        else:
+            worst_index = min(range(len(self.pop)), key=lambda i: self.pop[i].fitness)
+            if deap_individual.fitness > self.pop[worst_index].fitness:
+                self.pop[worst_index] = deap_individual
+
+        self.n_evaluated += 1
+        if self.n_evaluated % traj.pop_size == 0:
+            logger.info("-- End of generation {} --".format(self.g))
+            best_ind = tools.selBest(self.pop, 1)[0]
+            self.best_individual = self.optimizee_individual_codec.decode(np.asarray(best_ind))
+            logger.info("Best individual is %s, %s" % (self.best_individual, best_ind.fitness.values))
+            if self.g < traj.n_iteration - 1:
+                self.g += 1
+
+        if self.n_submitted >= traj.pop_size * traj.n_iteration:
+            return []
+        offspring = self._breed(traj)
+        new_individuals = self._add_individuals(
+            traj, [self.optimizee_individual_codec.decode(np.asarray(offspring, dtype=float))])
+        self.pending[new_individuals[0].ind_idx] = offspring
+        self.n_submitted += 1
+        return new_individuals
+
+    def _breed(self, traj):
+        """
+        Returns a new DEAP individual bred from the evaluated population
+        """
+        parents = self.toolbox.select(self.pop, 2, tournsize=min(traj.tourn_size, len(self.pop)))
+        child, other = map(self.toolbox.clone, parents)
+        if random.random() < traj.cx_prob:
+            self.toolbox.mate(child, other)
+        # Mutate the duplicates of evaluated individuals as well, so that they are not evaluated again
+        if random.random() < traj.mut_prob or any(tuple(child) == tuple(ind) for ind in self.pop):
+            self.toolbox.mutate(child)
+        del child.fitness.values
+        return child
@@ -1,3 +1,4 @@
-from .optimizer import EvolutionStrategiesOptimizer, EvolutionStrategiesParameters
+from .optimizer import EvolutionStrategiesOptimizer, EvolutionStrategiesParameters, \
+    AsynchronousEvolutionStrategiesOptimizer
 
-__all__ = ['EvolutionStrategiesOptimizer', 'EvolutionStrategiesParameters']
+__all__ = ['EvolutionStrategiesOptimizer', 'EvolutionStrategiesParameters', 'AsynchronousEvolutionStrategiesOptimizer']
@@ -2,8 +2,11 @@ import logging
 from collections import namedtuple
 
 import numpy as np
-from l2l import dict_to_list, list_to_dict
+from l2l import dict_to_list, ParameterCodec
 from l2l.optimizers.optimizer import Optimizer
+from l2l.utils.noise_table import NoiseTablePopulation, SharedNoiseTable, default_noise_table_path, \
+    default_noise_table_base_path
+from l2l.utils.population import Population
 
 logger = logging.getLogger("optimizers.evolutionstrategies")
 
@@ -16,7 +19,10 @@ EvolutionStrategiesParameters = namedtuple('EvolutionStrategiesParameters', [
     'n_iteration',
     'stop_criterion',
     'seed',
+    'noise_table_size',
+    'noise_table_path',
 ])
+EvolutionStrategiesParameters.__new__.__defaults__ = (None, None)
 
 EvolutionStrategiesParameters.__doc__ = """
  :param learning_rate: Learning rate
@@ -30,6 +36,15 @@ EvolutionStrategiesParameters.__doc__ = """
  :param n_iteration: Number of iterations to perform
  :param stop_criterion: (Optional) Stop if this fitness is reached.
  :param seed: The random seed used for generating new individuals
+ :param noise_table_size: (Optional) If set, the perturbations are taken
+                          from a :class:`~l2l.utils.noise_table.SharedNoiseTable`
+                          of this many values, e.g. 25000000, and the
+                          individuals only carry their offset into it
+ :param noise_table_path: (Optional) Directory of the noise table. Default:
+                          see :func:`~l2l.utils.noise_table.default_noise_table_path`.
+                          The versions of the search distribution are
+                          stored apart from it, see
+                          :func:`~l2l.utils.noise_table.default_noise_table_base_path`
 """
 
 
@@ -68,9 +83,17 @@ class EvolutionStrategiesOptimizer(Optimizer):
 
 
 
-    NOTE: This is not the most efficient implementation in terms of
-    communication, since the new parameters are communicated to the individuals
-    rather than the seed as in the paper.
+    NOTE: By default, the new parameters are communicated to the individuals
+    rather than the seed as in the paper, which makes sending an individual
+    cost as much as its number of parameters. With `noise_table_size`, the
+    perturbations are taken from a shared noise table instead, see
+    :class:`~l2l.utils.noise_table.NoiseTablePopulation`: the individuals only
+    carry the version of the current individual, the offset of their
+    perturbation in the table and its sign, and are reconstructed by the
+    process evaluating them. The current individual and the noise standard
+    deviation are written to the table once per generation. The
+    optimizee_bounding_func is not applied in this mode, as the individuals
+    are only known to the processes evaluating them.
     NOTE: Doesn't yet contain fitness shaping and mirrored sampling
 
     :param  ~l2l.utils.trajectory.Trajectory traj:
@@ -134,12 +157,32 @@ class EvolutionStrategiesOptimizer(Optimizer):
         traj.f_add_parameter(
             'seed', np.uint32(parameters.seed),
             comment='Seed used for random number generation in optimizer')
+        traj.f_add_parameter(
+            'noise_table_size', parameters.noise_table_size,
+            comment='Number of values of the shared noise table')
 
         self.random_state = np.random.RandomState(traj.parameters.seed)
 
         self.current_individual_arr, self.optimizee_individual_dict_spec = \
             dict_to_list(
                 self.optimizee_create_individual(), get_dict_spec=True)
+        self.optimizee_individual_codec = ParameterCodec(
+            self.optimizee_individual_dict_spec)
+
+        self.noise_table = None
+        self.noise_table_version = -1
+        if parameters.noise_table_size:
+            base_path = default_noise_table_base_path(traj)
+            self.noise_table = SharedNoiseTable(
+                parameters.noise_table_path or default_noise_table_path(traj),
+                parameters.noise_table_size, seed=parameters.seed,
+                base_path=base_path)
+            # Without an experiment, no stored trajectory refers to the
+            # versions of the search distribution after the run, see end
+            self.remove_noise_table_bases = base_path is None
+            if optimizee_bounding_func is not None:
+                logger.warning("The individuals sampled from the noise table "
+                               "are not bounded")
 
         noise_std_shape = np.array(parameters.noise_std).shape
         ind_shape = self.current_individual_arr.shape
@@ -174,29 +217,45 @@ class EvolutionStrategiesOptimizer(Optimizer):
         # entropy algorithm and thus needs to handle the optimizee individuals
         # as vectors
         self.current_perturbations = self._get_perturbations(traj)
-        current_eval_pop_arr = (
-            self.current_individual_arr + self.current_perturbations).tolist()
+        self.eval_pop = self._get_eval_pop()
+        self.eval_pop_arr = self.eval_pop.values
 
-        self.eval_pop = [list_to_dict(ind, self.optimizee_individual_dict_spec)
-                         for ind in current_eval_pop_arr]
-        self.eval_pop.append(list_to_dict(self.current_individual_arr,
-                                          self.optimizee_individual_dict_spec))
+        self._expand_trajectory(traj)
 
-        # Bounding function has to be applied AFTER the individual has been
-        # converted to a dict
-        if optimizee_bounding_func is not None:
-            self.eval_pop[:] = [self.optimizee_bounding_func(ind) for ind in
-                                self.eval_pop]
+    def _get_eval_pop(self):
+        """
+        Returns the population to evaluate: the perturbed individuals
+        followed by the current individual
+        """
+        if self.noise_table is not None:
+            return self.noise_table_pop
 
-        self.eval_pop_arr = np.array(
-            [dict_to_list(ind) for ind in self.eval_pop])
+        eval_pop = Population(
+            np.vstack((self.current_individual_arr + self.current_perturbations,
+                       self.current_individual_arr)),
+            self.optimizee_individual_codec)
 
-        self._expand_trajectory(traj)
+        # Bounding function has to be applied AFTER the individual has been
+        # converted to a dict
+        if self.optimizee_bounding_func is not None:
+            eval_pop = eval_pop.bounded(self.optimizee_bounding_func)
+        return eval_pop
 
     def _get_perturbations(self, traj):
         pop_size, noise_std, mirrored_sampling_enabled = \
             traj.pop_size, traj.noise_std, traj.mirrored_sampling_enabled
 
+        if self.noise_table is not None:
+            # The versions of the earlier generations are kept, as the individuals stored in the trajectory and its
+            # checkpoints are reconstructed from them
+            self.noise_table_version += 1
+            self.noise_table_pop = NoiseTablePopulation.sample(
+                self.noise_table, self.noise_table_version,
+                self.current_individual_arr, noise_std, pop_size,
+                mirrored_sampling_enabled, self.random_state,
+                self.optimizee_individual_codec, include_center=True)
+            return noise_std * self.noise_table_pop.noise()[:-1]
+
         rand = self.random_state.randn(
                                 pop_size, *self.current_individual_arr.shape)
         perturbations = noise_std * rand
@@ -209,10 +268,7 @@ class EvolutionStrategiesOptimizer(Optimizer):
         See :meth:`~l2l.optimizers.optimizer.Optimizer.post_process`
         """
 
-        n_iteration, stop_criterion, learning_rate = \
-            traj.n_iteration, traj.stop_criterion, traj.learning_rate
-        noise_std, fitness_shaping_enabled = \
-            traj.noise_std, traj.fitness_shaping_enabled
+        n_iteration, stop_criterion = traj.n_iteration, traj.stop_criterion
 
         weighted_fitness_list = []
         # *********************************************************************
@@ -254,12 +310,44 @@ class EvolutionStrategiesOptimizer(Optimizer):
         sorted_perturbations = self.current_perturbations[
             fitness_sorting_indices]
 
+        self._record_generation(traj, sorted_population, sorted_fitness,
+                                current_individual_fitness)
+        self._update_current_individual(traj, sorted_fitness,
+                                        sorted_perturbations)
+
+        # *********************************************************************
+        # Create the next generation by sampling the inferred distribution
+        # *********************************************************************
+        # Note that this is only done in case the evaluated run is not the
+        # last run
+
+        # check if to stop
+        max_g = n_iteration - 1
+        if self.g < max_g and self.best_fitness_in_run < stop_criterion:
+            self.current_perturbations = self._get_perturbations(traj)
+            self.eval_pop = self._get_eval_pop()
+            self.eval_pop_arr = self.eval_pop.values
+
+            self.g += 1  # Update generation counter
+            self._expand_trajectory(traj)
+
+    def _record_generation(self, traj, sorted_population, sorted_fitness,
+                           current_individual_fitness):
+        """
+        Logs the evaluated generation and stores its parameters in the
+        trajectory
+        :param sorted_population: The evaluated perturbed individuals, in
+            descending order of fitness
+        :param sorted_fitness: Their weighted fitnesses
+        :param current_individual_fitness: The weighted fitness of the current
+            individual
+        """
         self.best_individual_in_run = sorted_population[0]
         self.best_fitness_in_run = sorted_fitness[0]
 
         logger.info("-- End of generation %d --", self.g)
         logger.info("  Evaluated %d individuals",
-                    len(weighted_fitness_list) + 1)
+                    len(sorted_fitness) + 1)
         logger.info('  Best Fitness: %.4f', self.best_fitness_in_run)
         logger.info('  Average Fitness: %.4f', np.mean(sorted_fitness))
 
@@ -293,6 +381,18 @@ class EvolutionStrategiesOptimizer(Optimizer):
                     "for comments documenting these parameters"
         )
 
+    def _update_current_individual(self, traj, sorted_fitness,
+                                   sorted_perturbations):
+        """
+        Moves the current individual along the perturbations weighted by
+        their fitness, or by their utility if fitness shaping is enabled
+        :param sorted_fitness: The weighted fitnesses of the perturbed
+            individuals, in descending order
+        :param sorted_perturbations: The corresponding perturbations
+        """
+        learning_rate, noise_std, fitness_shaping_enabled = \
+            traj.learning_rate, traj.noise_std, traj.fitness_shaping_enabled
+
         if fitness_shaping_enabled:
             sorted_utilities = []
             n_individuals = len(sorted_fitness)
@@ -316,51 +416,165 @@ class EvolutionStrategiesOptimizer(Optimizer):
         weight = len(fitnesses_to_fit) * np.asarray(noise_std) ** 2
         self.current_individual_arr += learning_rate * (sum_fits / weight)
 
-        # *********************************************************************
-        # Create the next generation by sampling the inferred distribution
-        # *********************************************************************
-        # Note that this is only done in case the evaluated run is not the
-        # last run
-        self.eval_pop.clear()
-
-        # check if to stop
-        max_g = n_iteration - 1
-        if self.g < max_g and self.best_fitness_in_run < stop_criterion:
-            self.current_perturbations = self._get_perturbations(traj)
-            perturbated = \
-                self.current_individual_arr + self.current_perturbations
-            current_eval_pop_arr = perturbated.tolist()
-
-            self.eval_pop[:] = [
-                list_to_dict(ind, self.optimizee_individual_dict_spec)
-                for ind in current_eval_pop_arr]
-            self.eval_pop.append(
-                list_to_dict(self.current_individual_arr,
-                             self.optimizee_individual_dict_spec))
-
-            # Bounding function has to be applied AFTER the individual has been
-            # converted to a dict
-            if self.optimizee_bounding_func is not None:
-                self.eval_pop[:] = [self.optimizee_bounding_func(ind)
-                                    for ind in self.eval_pop]
-
-            self.eval_pop_arr[:] = np.asarray(
-                [dict_to_list(ind) for ind in self.eval_pop])
-
-            self.g += 1  # Update generation counter
-            self._expand_trajectory(traj)
-
     def end(self, traj):
         """
         See :meth:`~l2l.optimizers.optimizer.Optimizer.end`
         """
-        best_last_indiv_dict = list_to_dict(
-            self.best_individual_in_run.tolist(),
-            self.optimizee_individual_dict_spec)
+        best_last_indiv_dict = self.optimizee_individual_codec.decode(self.best_individual_in_run)
 
         traj.f_add_result('final_individual', best_last_indiv_dict)
         traj.f_add_result('final_fitness', self.best_fitness_in_run)
         traj.f_add_result('n_iteration', self.g + 1)
 
+        if self.noise_table is not None and self.remove_noise_table_bases:
+            self.noise_table.remove_bases()
+
         # ------------ Finished all runs and print result --------------- #
         logger.info("-- End of (successful) ES optimization --")
+
+
+class AsynchronousEvolutionStrategiesOptimizer(EvolutionStrategiesOptimizer):
+    """
+    Asynchronous variant of the :class:`EvolutionStrategiesOptimizer`, to be
+    run in the asynchronous mode of the environment. Instead of waiting for
+    a whole generation, a new perturbation of the current individual is
+    evaluated as soon as the fitness of any individual is known, so that no
+    worker waits for the slowest individual of a generation. The current
+    individual is updated every time the fitnesses of as many perturbations
+    as in a generation of the synchronous optimizer have been received.
+
+    Each completed update counts as a generation, and the current individual
+    itself is evaluated once per generation. The optimization stops after
+    `n_iteration` updates, or once the stop criterion is reached, so that at
+    most as many perturbations as in the synchronous optimizer are
+    evaluated.
+
+    NOTE: A perturbation is weighted by its fitness in the update following
+    its evaluation, even if the current individual has been updated since
+    it was sampled. The update is therefore based on slightly stale
+    perturbations when the evaluation times vary.
+
+    See :class:`EvolutionStrategiesOptimizer` for the parameters.
+    """
+
+    asynchronous = True
+
+    def __init__(self, traj, optimizee_create_individual,
+                 optimizee_fitness_weights, parameters,
+                 optimizee_bounding_func=None):
+        if parameters.noise_table_size:
+            raise ValueError("The AsynchronousEvolutionStrategiesOptimizer "
+                             "does not support the shared noise table")
+        super().__init__(traj, optimizee_create_individual,
+                         optimizee_fitness_weights, parameters,
+                         optimizee_bounding_func=optimizee_bounding_func)
+        n_perturbations = len(self.current_perturbations)
+        # Perturbation and evaluated values of each individual being
+        # evaluated, indexed by ind_idx. The perturbation of the current
+        # individual is None
+        self.pending = {
+            i: (self.current_perturbations[i], self.eval_pop_arr[i])
+            for i in range(n_perturbations)}
+        self.pending[n_perturbations] = (None, self.eval_pop_arr[-1])
+        # Weighted fitness, perturbation and values of the individuals
+        # evaluated since the last update
+        self.evaluated = []
+        self.current_individual_fitness = np.nan
+        self.n_submitted = n_perturbations
+        self.finished = False
+        # Mirror image of the last sampled perturbation, evaluated next if
+        # mirrored sampling is enabled
+        self.mirrored_perturbation = None
+
+    def post_process(self, traj, fitnesses_results):
+        raise Exception("The AsynchronousEvolutionStrategiesOptimizer can "
+                        "only be run in the asynchronous mode of the "
+                        "environment")
+
+    def post_process_individual(self, traj, individual, fitness):
+        """
+        See :meth:`~l2l.optimizers.optimizer.Optimizer.post_process_individual`
+        """
+        perturbation, values = self.pending.pop(individual.ind_idx)
+        traj.f_add_result('$set.$.individual',
+                          self.optimizee_individual_codec.decode(values))
+        traj.f_add_result('$set.$.fitness', fitness)
+
+        weighted_fitness = np.dot(fitness, self.optimizee_fitness_weights)
+        if perturbation is None:
+            self.current_individual_fitness = weighted_fitness
+            return []
+        if self.finished:
+            return []
+        self.evaluated.append((weighted_fitness, perturbation, values))
+
+        new_individuals = []
+        if len(self.evaluated) == len(self.current_perturbations):
+            self._update(traj)
+            if not self.finished:
+                new_individuals += self._submit(traj, None)
+
+        n_budget = traj.n_iteration * len(self.current_perturbations)
+        if not self.finished and self.n_submitted < n_budget:
+            new_individuals += self._submit(traj, self._sample_perturbation(
+                traj))
+            self.n_submitted += 1
+        return new_individuals
+
+    def _update(self, traj):
+        """
+        Updates the current individual with the perturbations evaluated since
+        the last update, and starts the next generation unless the
+        optimization is finished
+        """
+        weighted_fitness, perturbations, values = zip(*self.evaluated)
+        self.evaluated = []
+        fitness_sorting_indices = list(reversed(np.argsort(weighted_fitness)))
+        sorted_fitness = np.asarray(weighted_fitness)[fitness_sorting_indices]
+        sorted_population = np.asarray(values)[fitness_sorting_indices]
+        sorted_perturbations = np.asarray(perturbations)[
+            fitness_sorting_indices]
+
+        self._record_generation(traj, sorted_population, sorted_fitness,
+                                self.current_individual_fitness)
+        self._update_current_individual(traj, sorted_fitness,
+                                        sorted_perturbations)
+
+        if (self.g < traj.n_iteration - 1
+                and self.best_fitness_in_run < traj.stop_criterion):
+            self.g += 1
+        else:
+            self.finished = True
+
+    def _sample_perturbation(self, traj):
+        """
+        Returns a new perturbation, or the mirror image of the previous one
+        if mirrored sampling is enabled
+        """
+        if self.mirrored_perturbation is not None:
+            perturbation = self.mirrored_perturbation
+            self.mirrored_perturbation = None
+            return perturbation
+        perturbation = traj.noise_std * self.random_state.randn(
+            *self.current_individual_arr.shape)
+        if traj.mirrored_sampling_enabled:
+            self.mirrored_perturbation = -perturbation
+        return perturbation
+
+    def _submit(self, traj, perturbation):
+        """
+        Adds the current individual with the given perturbation, or the
+        current individual itself if the perturbation is None, to the
+        trajectory
+        :return: list with the new individual
+        """
+        values = self.current_individual_arr.copy()
+        if perturbation is not None:
+            values += perturbation
+        individual_dict = self.optimizee_individual_codec.decode(values)
+        if self.optimizee_bounding_func is not None:
+            individual_dict = self.optimizee_bounding_func(individual_dict)
+            values = self.optimizee_individual_codec.encode(individual_dict)
+        new_individuals = self._add_individuals(traj, [individual_dict])
+        self.pending[new_individuals[0].ind_idx] = (perturbation, values)
+        return new_individuals
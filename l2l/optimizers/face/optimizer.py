@@ -3,8 +3,9 @@ from collections import namedtuple
 
 import numpy as np
 
-from l2l import dict_to_list, list_to_dict
+from l2l import dict_to_list, ParameterCodec
 from l2l.optimizers.optimizer import Optimizer
+from l2l.utils.population import Population
 
 logger = logging.getLogger("optimizers.face")
 
@@ -25,7 +26,9 @@ FACEParameters.__doc__ = """
 :param temp_decay: This parameter is the factor (necessarily between 0 and 1) by which the temperature decays each
   generation. To see the use of temperature, look at the documentation of :class:`.FACEOptimizer`
 :param n_iteration: Number of iterations to perform
-:param distribution: Distribution class to use. Has to implement a fit and sample function.
+:param distribution: Distribution class to use. Has to implement a fit and sample function. For individuals with many
+  parameters, :class:`~.DiagonalGaussian` and :class:`~.LowRankGaussian` avoid the d x d covariance matrix of
+  :class:`~.Gaussian`
 :param stop_criterion: (Optional) Stop if this fitness is reached.
 :param n_expand: (Optional) This is the amount by which the sample size is increased if FACE becomes active
 """
@@ -110,6 +113,7 @@ class FACEOptimizer(Optimizer):
         self.random_state = np.random.RandomState(seed=traj.par.seed)
         temp_indiv, self.optimizee_individual_dict_spec = dict_to_list(self.optimizee_create_individual(),
                                                                        get_dict_spec=True)
+        self.optimizee_individual_codec = ParameterCodec(self.optimizee_individual_dict_spec)
         traj.f_add_derived_parameter('dimension', len(temp_indiv),
                                      comment='The dimension of the parameter space of the optimizee')
 
@@ -139,8 +143,8 @@ class FACEOptimizer(Optimizer):
         if optimizee_bounding_func is not None:
             current_eval_pop = [self.optimizee_bounding_func(ind) for ind in current_eval_pop]
 
-        self.eval_pop = current_eval_pop
-        self.eval_pop_asarray = np.array([dict_to_list(x) for x in self.eval_pop])
+        self.eval_pop = Population.from_dicts(current_eval_pop, self.optimizee_individual_codec)
+        self.eval_pop_asarray = self.eval_pop.values
 
         # Max Likelihood
         self.current_distribution = parameters.distribution
@@ -189,8 +193,7 @@ class FACEOptimizer(Optimizer):
         elite_individuals = sorted_population[:n_elite]
 
         previous_best_fitness = self.best_fitness_in_run
-        self.best_individual = list_to_dict(sorted_population[0],
-                                            self.optimizee_individual_dict_spec)
+        self.best_individual = self.optimizee_individual_codec.decode(sorted_population[0])
         self.best_fitness_in_run = sorted_fitess[0]
         previous_gamma = self.gamma
         self.gamma = sorted_fitess[n_elite - 1]
@@ -259,16 +262,14 @@ class FACEOptimizer(Optimizer):
         # **************************************************************************************************************
         # Note that this is only done in case the evaluated run is not the last run
         fitnesses_results.clear()
-        self.eval_pop.clear()
         if expand:
             # Sample from the constructed distribution
             self.eval_pop_asarray = self.current_distribution.sample(self.pop_size)
-            self.eval_pop = [list_to_dict(ind_asarray, self.optimizee_individual_dict_spec)
-                             for ind_asarray in self.eval_pop_asarray]
+            self.eval_pop = Population(self.eval_pop_asarray, self.optimizee_individual_codec)
             # Clip to boundaries
             if self.optimizee_bounding_func is not None:
-                self.eval_pop = [self.optimizee_bounding_func(individual) for individual in self.eval_pop]
-                self.eval_pop_asarray = np.array([dict_to_list(x) for x in self.eval_pop])
+                self.eval_pop = self.eval_pop.bounded(self.optimizee_bounding_func)
+                self.eval_pop_asarray = self.eval_pop.values
             self.g += 1  # Update generation counter
             self.T *= temp_decay
             self._expand_trajectory(traj)
@@ -4,8 +4,8 @@ from collections import namedtuple
 
 import numpy as np
 
-from l2l import dict_to_list
-from l2l import list_to_dict
+from l2l import dict_to_list, ParameterCodec
+from l2l.utils.population import Population
 from l2l.optimizers.optimizer import Optimizer
 
 logger = logging.getLogger("optimizers.gradientdescent")
@@ -119,12 +119,13 @@ class GradientDescentOptimizer(Optimizer):
         traj.f_add_parameter('seed', np.uint32(parameters.seed), comment='Optimizer random seed')
         
         _, self.optimizee_individual_dict_spec = dict_to_list(self.optimizee_create_individual(), get_dict_spec=True)
+        self.optimizee_individual_codec = ParameterCodec(self.optimizee_individual_dict_spec)
         self.random_state = np.random.RandomState(seed=traj.par.seed)
 
         # Note that this array stores individuals as an np.array of floats as opposed to Individual-Dicts
         # This is because this array is used within the context of the gradient descent algorithm and
         # Thus needs to handle the optimizee individuals as vectors
-        self.current_individual = np.array(dict_to_list(self.optimizee_create_individual()))
+        self.current_individual = self.optimizee_individual_codec.encode(self.optimizee_create_individual())
 
         # Depending on the algorithm used, initialize the necessary variables
         self.updateFunction = None
@@ -144,33 +145,30 @@ class GradientDescentOptimizer(Optimizer):
                                         comment='This contains the optimizer parameters that are'
                                                 ' common across a generation')
 
-        # Explore the neighbourhood in the parameter space of current individual
-        new_individual_list = [
-            list_to_dict(self.current_individual + 
-                         self.random_state.normal(0.0, parameters.exploration_step_size, self.current_individual.size),
-                         self.optimizee_individual_dict_spec)
-            for i in range(parameters.n_random_steps)
-        ]
-
-        # Also add the current individual to determine it's fitness
-        new_individual_list.append(list_to_dict(self.current_individual, self.optimizee_individual_dict_spec))
-            
-        if optimizee_bounding_func is not None:
-            new_individual_list = [self.optimizee_bounding_func(ind) for ind in new_individual_list]
-
         # Storing the fitness of the current individual
         self.current_fitness = -np.Inf
         self.g = 0
         
-        self.eval_pop = new_individual_list
+        self.eval_pop = self._explore_neighbourhood(parameters.exploration_step_size, parameters.n_random_steps)
         self._expand_trajectory(traj)
 
+    def _explore_neighbourhood(self, exploration_step_size, n_random_steps):
+        """
+        Returns the population of random steps around the current individual, followed by the current individual
+        itself to determine its fitness
+        """
+        steps = self.random_state.normal(0.0, exploration_step_size, (n_random_steps, self.current_individual.size))
+        new_population = Population(np.vstack((self.current_individual + steps, self.current_individual)),
+                                    self.optimizee_individual_codec)
+        if self.optimizee_bounding_func is not None:
+            new_population = new_population.bounded(self.optimizee_bounding_func)
+        return new_population
+
     def post_process(self, traj, fitnesses_results):
         """
         See :meth:`~l2l.optimizers.optimizer.Optimizer.post_process`
         """
-        old_eval_pop = self.eval_pop.copy()
-        self.eval_pop.clear()
+        old_eval_pop = self.eval_pop
 
         logger.info("  Evaluating %i individuals" % len(fitnesses_results))
         
@@ -200,12 +198,12 @@ class GradientDescentOptimizer(Optimizer):
                 self.current_fitness = weighted_fitness
             else:
                 fitnesses[i] = weighted_fitness
-                dx[i] = np.array(dict_to_list(individual)) - self.current_individual
+                dx[i] = old_eval_pop.values[ind_index] - self.current_individual
         traj.v_idx = -1  # set the trajectory back to default
 
         # Performs descending arg-sort of weighted fitness
         fitness_sorting_indices = list(reversed(np.argsort(weighted_fitness_list)))
-        old_eval_pop_as_array = np.array([dict_to_list(x) for x in old_eval_pop])
+        old_eval_pop_as_array = old_eval_pop.values
 
         # Sorting the data according to fitness
         sorted_population = old_eval_pop_as_array[fitness_sorting_indices]
@@ -235,24 +233,14 @@ class GradientDescentOptimizer(Optimizer):
         if self.g < traj.n_iteration - 1 and traj.stop_criterion > self.current_fitness:
             # Create new individual using the appropriate gradient descent
             self.update_function(traj, np.dot(np.linalg.pinv(dx), fitnesses - self.current_fitness))
-            current_individual_dict = list_to_dict(self.current_individual, self.optimizee_individual_dict_spec)
+            current_individual_dict = self.optimizee_individual_codec.decode(self.current_individual)
             if self.optimizee_bounding_func is not None:
                 current_individual_dict = self.optimizee_bounding_func(current_individual_dict)
-            self.current_individual = np.array(dict_to_list(current_individual_dict))
+            self.current_individual = self.optimizee_individual_codec.encode(current_individual_dict)
 
             # Explore the neighbourhood in the parameter space of the current individual
-            new_individual_list = [
-                list_to_dict(self.current_individual + 
-                             self.random_state.normal(0.0, traj.exploration_step_size, self.current_individual.size),
-                             self.optimizee_individual_dict_spec)
-                for _ in range(traj.n_random_steps)
-            ]
-            if self.optimizee_bounding_func is not None:
-                new_individual_list = [self.optimizee_bounding_func(ind) for ind in new_individual_list]
-            new_individual_list.append(current_individual_dict)
-
             fitnesses_results.clear()
-            self.eval_pop = new_individual_list
+            self.eval_pop = self._explore_neighbourhood(traj.exploration_step_size, traj.n_random_steps)
             self.g += 1  # Update generation counter
             self._expand_trajectory(traj)
 
@@ -260,8 +248,7 @@ class GradientDescentOptimizer(Optimizer):
         """
         See :meth:`~l2l.optimizers.optimizer.Optimizer.end`
         """
-        best_last_indiv_dict = list_to_dict(self.current_individual.tolist(),
-                                            self.optimizee_individual_dict_spec)
+        best_last_indiv_dict = self.optimizee_individual_codec.decode(self.current_individual)
 
         traj.f_add_result('final_individual', best_last_indiv_dict)
         traj.f_add_result('final_fitness', self.current_fitness)
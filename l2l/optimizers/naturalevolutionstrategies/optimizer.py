@@ -3,8 +3,11 @@ from collections import namedtuple
 
 import numpy as np
 
-from l2l import dict_to_list, list_to_dict
+from l2l import dict_to_list, ParameterCodec
 from l2l.optimizers.optimizer import Optimizer
+from l2l.utils.noise_table import NoiseTablePopulation, SharedNoiseTable, default_noise_table_path, \
+    default_noise_table_base_path
+from l2l.utils.population import Population
 
 logger = logging.getLogger("optimizers.naturalevolutionstrategies")
 
@@ -19,7 +22,10 @@ NaturalEvolutionStrategiesParameters = namedtuple('NaturalEvolutionStrategiesPar
     'n_iteration',
     'stop_criterion',
     'seed',
+    'noise_table_size',
+    'noise_table_path',
 ])
+NaturalEvolutionStrategiesParameters.__new__.__defaults__ = (None, None)
 
 NaturalEvolutionStrategiesParameters.__doc__ = """
 :param learning_rate_mu: Learning rate for mean of distribution
@@ -33,6 +39,12 @@ NaturalEvolutionStrategiesParameters.__doc__ = """
 :param n_iteration: Number of iterations to perform
 :param stop_criterion: (Optional) Stop if this fitness is reached.
 :param seed: The random seed used for generating new individuals
+:param noise_table_size: (Optional) If set, the perturbations are taken from a
+    :class:`~l2l.utils.noise_table.SharedNoiseTable` of this many values, e.g. 25000000, and the individuals only carry
+    their offset into it. The optimizee_bounding_func is not applied in this mode
+:param noise_table_path: (Optional) Directory of the noise table. Default: see
+    :func:`~l2l.utils.noise_table.default_noise_table_path`. The versions of the search distribution are stored apart
+    from it, see :func:`~l2l.utils.noise_table.default_noise_table_base_path`
 """
 
 
@@ -144,11 +156,27 @@ class NaturalEvolutionStrategiesOptimizer(Optimizer):
             'stop_criterion', parameters.stop_criterion, comment='Stop if best individual reaches this fitness')
         traj.f_add_parameter(
             'seed', np.uint32(parameters.seed), comment='Seed used for random number generation in optimizer')
+        traj.f_add_parameter(
+            'noise_table_size', parameters.noise_table_size, comment='Number of values of the shared noise table')
 
         self.random_state = np.random.RandomState(traj.parameters.seed)
 
+        self.noise_table = None
+        self.noise_table_version = -1
+        if parameters.noise_table_size:
+            base_path = default_noise_table_base_path(traj)
+            self.noise_table = SharedNoiseTable(parameters.noise_table_path or default_noise_table_path(traj),
+                                                parameters.noise_table_size, seed=parameters.seed,
+                                                base_path=base_path)
+            # Without an experiment, no stored trajectory refers to the versions of the search distribution after the
+            # run, see end
+            self.remove_noise_table_bases = base_path is None
+            if optimizee_bounding_func is not None:
+                logger.warning("The individuals sampled from the noise table are not bounded")
+
         self.current_individual_arr, self.optimizee_individual_dict_spec = dict_to_list(
             self.optimizee_create_individual(), get_dict_spec=True)
+        self.optimizee_individual_codec = ParameterCodec(self.optimizee_individual_dict_spec)
 
         traj.f_add_derived_parameter(
             'dimension',
@@ -173,19 +201,35 @@ class NaturalEvolutionStrategiesOptimizer(Optimizer):
 
         # Generate initial distribution
         self.current_perturbations = self._get_perturbations(traj)
-        current_eval_pop_arr = (self.mu + self.sigma * self.current_perturbations).tolist()
+        self.eval_pop = self._get_eval_pop()
+        self.eval_pop_arr = self.eval_pop.values
 
-        self.eval_pop = [list_to_dict(ind, self.optimizee_individual_dict_spec) for ind in current_eval_pop_arr]
+        self._expand_trajectory(traj)
 
-        # Bounding function has to be applied AFTER the individual has been converted to a dict
-        if optimizee_bounding_func is not None:
-            self.eval_pop = [self.optimizee_bounding_func(ind) for ind in self.eval_pop]
+    def _get_eval_pop(self):
+        """
+        Returns the population to evaluate, sampled from the search distribution with the current perturbations
+        """
+        if self.noise_table is not None:
+            return self.noise_table_pop
 
-        self.eval_pop_arr = np.array([dict_to_list(ind) for ind in self.eval_pop])
+        eval_pop = Population(self.mu + self.sigma * self.current_perturbations, self.optimizee_individual_codec)
 
-        self._expand_trajectory(traj)
+        # Bounding function has to be applied AFTER the individual has been converted to a dict
+        if self.optimizee_bounding_func is not None:
+            eval_pop = eval_pop.bounded(self.optimizee_bounding_func)
+        return eval_pop
 
     def _get_perturbations(self, traj):
+        if self.noise_table is not None:
+            # The versions of the earlier generations are kept, as the individuals stored in the trajectory and its
+            # checkpoints are reconstructed from them
+            self.noise_table_version += 1
+            self.noise_table_pop = NoiseTablePopulation.sample(
+                self.noise_table, self.noise_table_version, self.mu, self.sigma, traj.pop_size,
+                traj.mirrored_sampling_enabled, self.random_state, self.optimizee_individual_codec)
+            return self.noise_table_pop.noise()
+
         perturbations = self.random_state.randn(traj.pop_size, *traj.dimension)
 
         if traj.mirrored_sampling_enabled:
@@ -296,20 +340,11 @@ class NaturalEvolutionStrategiesOptimizer(Optimizer):
         # **************************************************************************************************************
         # Note that this is only done in case the evaluated run is not the last run
 
-        self.eval_pop.clear()
-
         # check if to stop
         if self.g < n_iteration - 1 and self.best_fitness_in_run < stop_criterion:
             self.current_perturbations = self._get_perturbations(traj)
-            current_eval_pop_arr = (self.mu + self.sigma * self.current_perturbations).tolist()
-
-            self.eval_pop = [list_to_dict(ind, self.optimizee_individual_dict_spec) for ind in current_eval_pop_arr]
-
-            # Bounding function has to be applied AFTER the individual has been converted to a dict
-            if self.optimizee_bounding_func is not None:
-                self.eval_pop = [self.optimizee_bounding_func(ind) for ind in self.eval_pop]
-
-            self.eval_pop_arr = np.array([dict_to_list(ind) for ind in self.eval_pop])
+            self.eval_pop = self._get_eval_pop()
+            self.eval_pop_arr = self.eval_pop.values
 
             self.g += 1  # Update generation counter
             self._expand_trajectory(traj)
@@ -325,11 +360,14 @@ class NaturalEvolutionStrategiesOptimizer(Optimizer):
         """
         See :meth:`~l2l.optimizers.optimizer.Optimizer.end`
         """
-        best_last_indiv_dict = list_to_dict(self.best_individual_in_run.tolist(), self.optimizee_individual_dict_spec)
+        best_last_indiv_dict = self.optimizee_individual_codec.decode(self.best_individual_in_run)
 
         traj.f_add_result('final_individual', best_last_indiv_dict)
         traj.f_add_result('final_fitness', self.best_fitness_in_run)
         traj.f_add_result('n_iteration', self.g + 1)
 
+        if self.noise_table is not None and self.remove_noise_table_bases:
+            self.noise_table.remove_bases()
+
         # ------------ Finished all runs and print result --------------- #
         logger.info("-- End of (successful) ES optimization --")
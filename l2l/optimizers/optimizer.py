@@ -3,6 +3,9 @@ from collections import namedtuple
 from l2l.utils.tools import cartesian_product
 
 from l2l import get_grouped_dict
+from l2l.utils.individual import Individual
+from l2l.utils.noise_table import NoiseTablePopulation
+from l2l.utils.population import Population
 
 OptimizerParameters = namedtuple('OptimizerParamters', [])
 
@@ -24,8 +27,13 @@ class Optimizer:
 
     :param parameters: A named tuple containing the parameters for the Optimizer class
 
+    Optimizers which set :attr:`asynchronous` to True can be run in the asynchronous mode of the environment, see
+    :meth:`post_process_individual`.
     """
 
+    #: Whether the optimizer supports the asynchronous mode of the environment
+    asynchronous = False
+
     def __init__(self, traj,
                  optimizee_create_individual,
                  optimizee_fitness_weights,
@@ -45,8 +53,11 @@ class Optimizer:
 
         #: The current generation number
         self.g = None
-        #: The population (i.e. list of individuals) to be evaluated at the next iteration
+        #: The population (i.e. list of individuals, or a :class:`~l2l.utils.population.Population`) to be evaluated
+        #: at the next iteration
         self.eval_pop = None
+        # Index of the next individual added by _add_individuals in the asynchronous mode
+        self._next_ind_idx = 0
 
     def post_process(self, traj, fitnesses_results):
         """
@@ -69,6 +80,24 @@ class Optimizer:
         self.g += 1
         self._expand_trajectory(traj)
 
+    def post_process_individual(self, traj, individual, fitness):
+        """
+        Used instead of :meth:`post_process` in the asynchronous mode of the environment, where there is no barrier
+        between generations. It is called as soon as the fitness of a single individual is known, and returns the
+        individuals to be evaluated in its place, usually a single one, so that no worker is left idle. The run ends
+        once no individual is being evaluated anymore, i.e. when the optimizer stops returning new individuals.
+
+        The individuals evaluated first are those of :attr:`eval_pop` expanded in the constructor, as in the
+        synchronous mode. The new individuals have to be created with :meth:`_add_individuals`.
+
+        :param  ~l2l.utils.trajectory.Trajectory traj: The trajectory that contains the parameters and the
+            individuals
+        :param ~l2l.utils.individual.Individual individual: The individual which has been evaluated
+        :param fitness: The fitness of the individual, as returned by the optimizee
+        :return: list of the :class:`~l2l.utils.individual.Individual` to evaluate next
+        """
+        raise NotImplementedError("{} does not support the asynchronous mode".format(type(self).__name__))
+
     def end(self, traj):
         """
         Run any code required to clean-up, print final individuals etc.
@@ -91,6 +120,13 @@ class Optimizer:
 
         :return:
         """
+        # In the asynchronous mode only the first generation is expanded, and the individuals added afterwards are
+        # numbered after it
+        self._next_ind_idx = len(self.eval_pop)
+
+        if isinstance(self.eval_pop, (Population, NoiseTablePopulation)):
+            traj.f_expand_population(self.eval_pop, self.g)
+            return
 
         grouped_params_dict = get_grouped_dict(self.eval_pop)
         grouped_params_dict = {'individual.' + key: val for key, val in grouped_params_dict.items()}
@@ -105,3 +141,24 @@ class Optimizer:
         # unique index within a generation.
         traj.f_expand(cartesian_product(final_params_dict,
                                         [('ind_idx',) + tuple(grouped_params_dict.keys()), 'generation']))
+
+    def _add_individuals(self, traj, individual_dicts):
+        """
+        Adds individuals to the current generation :attr:`g` of the trajectory in the asynchronous mode. Unlike in the
+        synchronous mode, the indices of the individuals are unique in the whole run, not only in their generation.
+
+        :param  ~l2l.utils.trajectory.Trajectory traj: The trajectory that contains the parameters and the
+            individuals
+        :param individual_dicts: The Individual-Dicts of the new individuals
+        :return: list of the new :class:`~l2l.utils.individual.Individual`
+        """
+        if not isinstance(traj.individuals.get(self.g), list):
+            traj.individuals[self.g] = list(traj.individuals.get(self.g, []))
+        new_individuals = []
+        for individual_dict in individual_dicts:
+            ind = Individual(self.g, self._next_ind_idx)
+            self._next_ind_idx += 1
+            ind.params = {'individual.' + key: val for key, val in individual_dict.items()}
+            new_individuals.append(ind)
+        traj.individuals[self.g].extend(new_individuals)
+        return new_individuals
@@ -1,14 +1,13 @@
 
 import logging
-import random
 from collections import namedtuple
 
 import numpy as np
 from enum import Enum
 
 from l2l.optimizers.optimizer import Optimizer
-from l2l import dict_to_list
-from l2l import list_to_dict
+from l2l.utils.population import Population
+from l2l import dict_to_list, ParameterCodec
 
 logger = logging.getLogger("optimizers.paralleltempering")
 
@@ -113,21 +112,25 @@ class ParallelTemperingOptimizer(Optimizer):
     on it. 
     
     Note: For simplicity sake, not the positions, but the temperature and
-    the schedule are swapped, which ammounts to the exact same. The 
-    temperature and the schedules are each stored in lists, which are both 
-    indexed by 'compare_indices'. If the swap criterion between two schedules
-    are met, the respective entries for 'compare_indices' are swapped.
-    To get the parallel runs, 'n_parallel_runs" is used - each individual 
-    is one of the parallel runs..
-    
+    the schedule are swapped, which ammounts to the exact same. The
+    temperatures and the schedules are each stored in arrays, which are both
+    indexed by 'parallel_indices'. If the swap criterion between two runs
+    is met, their respective entries of 'parallel_indices' are swapped.
+    To get the parallel runs, 'n_parallel_runs" is used - each individual
+    is one of the parallel runs. The acceptance, cooling and swap steps are
+    computed for all the runs at once, so that thousands of runs can be
+    simulated in parallel.
+
     The algorithm does:
 
     For n iterations and each cooling schedule do:
         - Take a step of size noisy step in a random direction
         - If it reduces the cost, keep the solution
         - Otherwise keep with probability exp(- (f_new - f) / T)
-        - Swap positions between two randomly chosen schedules 
-          with probability exp(-((f_1 - f_2) * (1 / (k * T_1) - 1 / (k * T_2)))) with k being a constant
+        - Swap positions between runs with neighbouring temperatures
+          with probability exp(-|(f_1 - f_2) * (1 / (k * T_1) - 1 / (k * T_2))|) with k being a constant. The
+          runs are sorted by temperature, and the pairs (1, 2), (3, 4), ... are considered in even generations and
+          the pairs (2, 3), (4, 5), ... in odd ones
         
     NOTE: This expects all parameters of the system to be of floating point
 
@@ -191,180 +194,192 @@ class ParallelTemperingOptimizer(Optimizer):
                              comment='The used cooling schedule')
 
         _, self.optimizee_individual_dict_spec = dict_to_list(self.optimizee_create_individual(), get_dict_spec=True)
+        self.optimizee_individual_codec = ParameterCodec(self.optimizee_individual_dict_spec)
+
+        self.random_state = np.random.RandomState(parameters.seed)
 
         # Note that this array stores individuals as an np.array of floats as opposed to Individual-Dicts
         # This is because this array is used within the context of the simulated annealing algorithm and
-        # Thus needs to handle the optimizee individuals as vectors
-        self.current_individual_list = [np.array(dict_to_list(self.optimizee_create_individual()))
-                                        for _ in range(parameters.n_parallel_runs)]
+        # Thus needs to handle the optimizee individuals as vectors. Row i is the current individual of run i
+        self.current_individual_list = self.optimizee_individual_codec.encode_population(
+            [self.optimizee_create_individual() for _ in range(parameters.n_parallel_runs)])
 
         traj.f_add_result('fitnesses', [], comment='Fitnesses of all individuals')
 
-        self.T_all = parameters.temperature_bounds[:,0]  # Initialize temperature
-        self.T = 1
+        n_parallel_runs = parameters.n_parallel_runs
+        self.cooling_schedules = list(parameters.cooling_schedules[:n_parallel_runs])
+        self.decay_parameters = np.asarray(parameters.decay_parameters[:n_parallel_runs], dtype=np.float64)
+        self.temperature_bounds = np.asarray(parameters.temperature_bounds[:n_parallel_runs], dtype=np.float64)
+
+        # assert if all cooling schedules are among the known cooling schedules
+        assert all(schedule in AvailableCoolingSchedules for schedule in self.cooling_schedules), \
+            "Unknown cooling schedule"
+        self.available_cooling_schedules = AvailableCoolingSchedules
+        self.cooling_schedule_values = np.array([schedule.value for schedule in self.cooling_schedules])
+
+        # The temperature of each schedule
+        self.T_all = self.temperature_bounds[:, 0].copy()  # Initialize temperature
         self.g = 0  # the current generation
-        self.cooling_schedules = parameters.cooling_schedules
-        self.decay_parameters = parameters.decay_parameters
-        self.temperature_bounds = parameters.temperature_bounds
         # Keep track of current fitness value to decide whether we want the next individual to be accepted or not
-        self.current_fitness_value_list = [-np.Inf] * parameters.n_parallel_runs
+        self.current_fitness_value_list = np.full(n_parallel_runs, -np.inf)
 
-        new_individual_list = [
-            list_to_dict(ind_as_list + np.random.normal(0.0, parameters.noisy_step, ind_as_list.size) * traj.noisy_step,
-                         self.optimizee_individual_dict_spec)
-            for ind_as_list in self.current_individual_list
-        ]
-        if optimizee_bounding_func is not None:
-            new_individual_list = [self.optimizee_bounding_func(ind) for ind in new_individual_list]
+        # The index of the schedule of each run
+        self.parallel_indices = np.arange(n_parallel_runs)
 
-        self.eval_pop = new_individual_list
+        new_individuals = self.current_individual_list + \
+            self.random_state.normal(0.0, parameters.noisy_step, self.current_individual_list.shape) * traj.noisy_step
+        self.eval_pop = self._get_eval_pop(new_individuals)
         self._expand_trajectory(traj)
-        
-        #initialize container for the indices of the parallel runs
-        self.parallel_indices = []
-        for i in range(0,traj.n_parallel_runs):
-            self.parallel_indices.append(i)
-        
-        self.available_cooling_schedules = AvailableCoolingSchedules
-        
-        # assert if all cooling schedules are among the known cooling schedules
-        schedule_known = True  # start off as True - if any schdule is unknown gets False
-        for i in range(np.size(self.cooling_schedules)):
-            schedule_known = schedule_known and self.cooling_schedules[i] in AvailableCoolingSchedules
-        
-        assert schedule_known, print("Warning: Unknown cooling schedule")
-        
-    def cooling(self,temperature, cooling_schedule, decay_parameter, temperature_bounds, steps_total):        
-        
-        T0, temperature_end = temperature_bounds
-        
-        k = self.g + 1        
-        if cooling_schedule == AvailableCoolingSchedules.DEFAULT:
-            return temperature * decay_parameter
-      
-        # Simulated Annealing and Boltzmann Machines: 
-        # A Stochastic Approach to Combinatorial Optimization and Neural Computing (1989)
-        elif cooling_schedule == AvailableCoolingSchedules.LOGARITHMIC:
-            return T0 / (1 + np.log(1 + k))
-            
-        # Kirkpatrick, Gelatt and Vecchi (1983)
-        elif cooling_schedule == AvailableCoolingSchedules.EXPONENTIAL:
-            return T0 * (decay_parameter ** (k))
-        elif cooling_schedule == AvailableCoolingSchedules.LINEAR_MULTIPLICATIVE:
-            return T0 / (1 + decay_parameter * k)
-        elif cooling_schedule == AvailableCoolingSchedules.QUADRATIC_MULTIPLICATIVE:
-            return T0 / (1 + decay_parameter * np.square(k))
-            
-        # Additive monotonic cooling B. T. Luke (2005) 
-        elif cooling_schedule == AvailableCoolingSchedules.LINEAR_ADDAPTIVE:
-            return temperature_end + (T0 - temperature) * ((steps_total - k) / steps_total)
-        elif cooling_schedule == AvailableCoolingSchedules.QUADRATIC_ADDAPTIVE:
-            return temperature_end + (T0 - temperature) * np.square((steps_total - k) / steps_total)
-        elif cooling_schedule == AvailableCoolingSchedules.EXPONENTIAL_ADDAPTIVE: 
-            return temperature_end + (T0 - temperature) * (1 / (1 + np.exp((2 * np.log(T0 - temperature_end) / steps_total) * (k - steps_total / 2))))
-        elif cooling_schedule == AvailableCoolingSchedules.TRIGONOMETRIC_ADDAPTIVE:
-            return temperature_end + (T0 - temperature_end) * (1 + np.cos(k * 3.1415 / steps_total)) / 2
-        
-        return -1
+
+    def _get_eval_pop(self, new_individuals):
+        """
+        Returns the population to evaluate from the array of the new individuals of the runs
+        """
+        eval_pop = Population(new_individuals, self.optimizee_individual_codec)
+        if self.optimizee_bounding_func is not None:
+            eval_pop = eval_pop.bounded(self.optimizee_bounding_func)
+        return eval_pop
+
+    def cooling(self, temperature, cooling_schedule, decay_parameter, temperature_bounds, steps_total):
+        """
+        Returns the next temperatures of the schedules. All the arguments are arrays with one entry per schedule,
+        except the total number of steps. The temperature bounds have one row per schedule
+        """
+        temperature = np.asarray(temperature, dtype=np.float64)
+        T0, temperature_end = temperature_bounds[:, 0], temperature_bounds[:, 1]
+        new_temperature = np.full(temperature.shape, -1.)
+
+        k = self.g + 1
+
+        def cool(schedule, function):
+            # Only the entries of the schedules of the given type are computed
+            mask = cooling_schedule == schedule.value
+            if np.any(mask):
+                new_temperature[mask] = function(temperature[mask], T0[mask], temperature_end[mask],
+                                                 decay_parameter[mask])
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            cool(AvailableCoolingSchedules.DEFAULT,
+                 lambda temperature, T0, temperature_end, decay_parameter: temperature * decay_parameter)
+
+            # Simulated Annealing and Boltzmann Machines:
+            # A Stochastic Approach to Combinatorial Optimization and Neural Computing (1989)
+            cool(AvailableCoolingSchedules.LOGARITHMIC,
+                 lambda temperature, T0, temperature_end, decay_parameter: T0 / (1 + np.log(1 + k)))
+
+            # Kirkpatrick, Gelatt and Vecchi (1983)
+            cool(AvailableCoolingSchedules.EXPONENTIAL,
+                 lambda temperature, T0, temperature_end, decay_parameter: T0 * (decay_parameter ** k))
+            cool(AvailableCoolingSchedules.LINEAR_MULTIPLICATIVE,
+                 lambda temperature, T0, temperature_end, decay_parameter: T0 / (1 + decay_parameter * k))
+            cool(AvailableCoolingSchedules.QUADRATIC_MULTIPLICATIVE,
+                 lambda temperature, T0, temperature_end, decay_parameter: T0 / (1 + decay_parameter * np.square(k)))
+
+            # Additive monotonic cooling B. T. Luke (2005)
+            cool(AvailableCoolingSchedules.LINEAR_ADDAPTIVE,
+                 lambda temperature, T0, temperature_end, decay_parameter:
+                 temperature_end + (T0 - temperature) * ((steps_total - k) / steps_total))
+            cool(AvailableCoolingSchedules.QUADRATIC_ADDAPTIVE,
+                 lambda temperature, T0, temperature_end, decay_parameter:
+                 temperature_end + (T0 - temperature) * np.square((steps_total - k) / steps_total))
+            cool(AvailableCoolingSchedules.EXPONENTIAL_ADDAPTIVE,
+                 lambda temperature, T0, temperature_end, decay_parameter:
+                 temperature_end + (T0 - temperature) * (1 / (1 + np.exp(
+                     (2 * np.log(T0 - temperature_end) / steps_total) * (k - steps_total / 2)))))
+            cool(AvailableCoolingSchedules.TRIGONOMETRIC_ADDAPTIVE,
+                 lambda temperature, T0, temperature_end, decay_parameter:
+                 temperature_end + (T0 - temperature_end) * (1 + np.cos(k * 3.1415 / steps_total)) / 2)
+
+        return new_temperature
 
     # get tthe transistion probability between two simulated annealing systems with
     # tempereatures T and energies E
-    def metropolis_hasting(self,E1,E2,T1,T2):
+    def metropolis_hasting(self, E1, E2, T1, T2):
         # k = 1.387 * (10 ** -23)  # boltzmann konstant
         # Note: do not use real Blotzmann kosntant, because both energies and temperatures are divorced from any real physical representation
         k = 5
-        p = np.exp(-np.abs((E1 - E2) * (1 / (k * T1) - 1 / (k * T2))))
-        if p < 1:
-            return p
-            
-        return 1
-        
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            p = np.exp(-np.abs((E1 - E2) * (1 / (k * T1) - 1 / (k * T2))))
+        # The probability is undefined for equal temperatures and infinite energies, such runs are not swapped
+        return np.minimum(np.nan_to_num(p, nan=0.), 1.)
+
+    def _swap(self):
+        """
+        Swaps the temperatures and schedules of runs with neighbouring temperatures, see the class documentation
+        """
+        n_parallel_runs = len(self.parallel_indices)
+        run_temperatures = self.T_all[self.parallel_indices]
+        order = np.argsort(run_temperatures, kind='stable')
+        first = self.g % 2
+        n_pairs = (n_parallel_runs - first) // 2
+        runs_1 = order[first:first + 2 * n_pairs:2]
+        runs_2 = order[first + 1:first + 2 * n_pairs:2]
+
+        probabilities = self.metropolis_hasting(
+            self.current_fitness_value_list[runs_1], self.current_fitness_value_list[runs_2],
+            run_temperatures[runs_1], run_temperatures[runs_2])
+        swapped = self.random_state.rand(n_pairs) < probabilities
+        runs_1, runs_2 = runs_1[swapped], runs_2[swapped]
+        self.parallel_indices[runs_1], self.parallel_indices[runs_2] = \
+            self.parallel_indices[runs_2], self.parallel_indices[runs_1]
+        logger.debug("Swapped %d of %d pairs of runs", len(runs_1), n_pairs)
+
     def post_process(self, traj, fitnesses_results):
         """
         See :meth:`~l2l.optimizers.optimizer.Optimizer.post_process`
         """
         noisy_step, n_iteration, stop_criterion = \
             traj.noisy_step, traj.n_iteration, traj.stop_criterion
-        cooling_schedules = self.cooling_schedules
-        decay_parameters = self.decay_parameters
-        temperature_bounds = self.temperature_bounds
-        old_eval_pop = self.eval_pop.copy()
-        self.eval_pop.clear()
-        temperature = self.T_all
-        for i in range(0,traj.n_parallel_runs):
-            self.T_all[self.parallel_indices[i]] = self.cooling(temperature[self.parallel_indices[i]], cooling_schedules[self.parallel_indices[i]], decay_parameters[self.parallel_indices[i]], temperature_bounds[self.parallel_indices[i],:], n_iteration)
-        logger.info("  Evaluating %i individuals" % len(fitnesses_results))
-  
-        assert len(fitnesses_results) == traj.n_parallel_runs
-        weighted_fitness_list = []
-        for i, (run_index, fitness) in enumerate(fitnesses_results):
-            
-            self.T = self.T_all[self.parallel_indices[i]]
+        old_eval_pop = self.eval_pop
+        old_eval_pop_arr = old_eval_pop.values
 
-            weighted_fitness = sum(f * w for f, w in zip(fitness, self.optimizee_fitness_weights))
-            weighted_fitness_list.append(weighted_fitness)
+        self.T_all = self.cooling(self.T_all, self.cooling_schedule_values, self.decay_parameters,
+                                  self.temperature_bounds, n_iteration)
+        logger.info("  Evaluating %i individuals" % len(fitnesses_results))
 
+        assert len(fitnesses_results) == traj.n_parallel_runs
+        weighted_fitness_list = np.empty(traj.n_parallel_runs)
+        for run_index, fitness in fitnesses_results:
             # We need to convert the current run index into an ind_idx
             # (index of individual within one generation)
             traj.v_idx = run_index
             ind_index = traj.par.ind_idx
-            individual = old_eval_pop[ind_index]
 
-            # Accept or reject the new solution
-            current_fitness_value_i = self.current_fitness_value_list[i]
-            r = np.random.rand()
-            p = np.exp((weighted_fitness - current_fitness_value_i) / self.T)
-
-            # Accept
-            if r < p or weighted_fitness >= current_fitness_value_i:
-                self.current_fitness_value_list[i] = weighted_fitness
-                self.current_individual_list[i] = np.array(dict_to_list(individual))
+            weighted_fitness = sum(f * w for f, w in zip(fitness, self.optimizee_fitness_weights))
+            weighted_fitness_list[ind_index] = weighted_fitness
 
-            traj.f_add_result('$set.$.individual', individual)
+            traj.f_add_result('$set.$.individual', old_eval_pop[ind_index])
             # Watchout! if weighted fitness is a tuple/np array it should be converted to a list first here
             traj.f_add_result('$set.$.fitness', weighted_fitness)
 
-            current_individual = self.current_individual_list[i]
-            new_individual = list_to_dict(current_individual + np.random.randn(current_individual.size) * noisy_step * self.T,
-                                          self.optimizee_individual_dict_spec)
-            if self.optimizee_bounding_func is not None:
-                new_individual = self.optimizee_bounding_func(new_individual)
+        # Accept or reject the new solutions of all the runs
+        run_temperatures = self.T_all[self.parallel_indices]
+        r = self.random_state.rand(traj.n_parallel_runs)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            p = np.exp((weighted_fitness_list - self.current_fitness_value_list) / run_temperatures)
+        accepted = (r < p) | (weighted_fitness_list >= self.current_fitness_value_list)
+        self.current_fitness_value_list[accepted] = weighted_fitness_list[accepted]
+        self.current_individual_list[accepted] = old_eval_pop_arr[accepted]
+
+        new_individuals = self.current_individual_list + \
+            self.random_state.randn(*self.current_individual_list.shape) * noisy_step * run_temperatures[:, None]
+        self.eval_pop = self._get_eval_pop(new_individuals)
 
-            logger.debug("Current best fitness for individual %d is %.2f. New individual is %s", 
-                         i, self.current_fitness_value_list[i], new_individual)
-            self.eval_pop.append(new_individual)
-            
         # the parallel tempering swapping starts here
-        for i in range(0,traj.n_parallel_runs):
-            
-            #make a random choice from all the other parallel runs
-            compare_indices = []
-            for j in range(0,traj.n_parallel_runs):
-                compare_indices.append(i)
-            compare_indices.remove(i)
-            random_choice = random.choice(compare_indices)
-            
-            #random variable with unit distribution betwwen 0 and 1
-            random_variable = np.random.rand() 
-            
-            #swap if criterion is met
-            if (self.metropolis_hasting(self.current_fitness_value_list[i], self.current_fitness_value_list[random_choice], self.T_all[i], self.T_all[random_choice]) > random_variable):
-                temp = self.parallel_indices[i]
-                self.parallel_indices[i] = self.parallel_indices[random_choice]
-                self.parallel_indices[random_choice] = temp
-                
-        logger.debug("Current best fitness within population is %.2f", max(self.current_fitness_value_list))
+        self._swap()
+
+        logger.debug("Current best fitness within population is %.2f", np.max(self.current_fitness_value_list))
 
         traj.v_idx = -1  # set the trajectory back to default
         logger.info("-- End of generation {} --".format(self.g))
 
         # ------- Create the next generation by crossover and mutation -------- #
         # not necessary for the last generation
-        if self.g < n_iteration - 1 and stop_criterion > max(self.current_fitness_value_list):
+        if self.g < n_iteration - 1 and stop_criterion > np.max(self.current_fitness_value_list):
             fitnesses_results.clear()
             self.g += 1  # Update generation counter
             self._expand_trajectory(traj)
-        
+
     def end(self, traj):
         """
         See :meth:`~l2l.optimizers.optimizer.Optimizer.end`
@@ -374,7 +389,7 @@ class ParallelTemperingOptimizer(Optimizer):
         best_last_indiv = self.current_individual_list[best_last_indiv_index]
         best_last_fitness = self.current_fitness_value_list[best_last_indiv_index]
 
-        best_last_indiv_dict = list_to_dict(best_last_indiv.tolist(), self.optimizee_individual_dict_spec)
+        best_last_indiv_dict = self.optimizee_individual_codec.decode(best_last_indiv)
         traj.f_add_result('final_individual', best_last_indiv_dict)
         traj.f_add_result('final_fitness', best_last_fitness)
         traj.f_add_result('n_iteration', self.g + 1)
@@ -4,9 +4,9 @@ from collections import namedtuple
 import numpy as np
 from enum import Enum
 
-from l2l import dict_to_list
-from l2l import list_to_dict
+from l2l import dict_to_list, ParameterCodec
 from l2l.optimizers.optimizer import Optimizer
+from l2l.utils.population import Population
 
 logger = logging.getLogger("optimizers.simulatedannealing")
 
@@ -137,12 +137,13 @@ class SimulatedAnnealingOptimizer(Optimizer):
         traj.f_add_parameter('seed', np.uint32(parameters.seed), comment='Seed for RNG')
 
         _, self.optimizee_individual_dict_spec = dict_to_list(self.optimizee_create_individual(), get_dict_spec=True)
+        self.optimizee_individual_codec = ParameterCodec(self.optimizee_individual_dict_spec)
 
         # Note that this array stores individuals as an np.array of floats as opposed to Individual-Dicts
         # This is because this array is used within the context of the simulated annealing algorithm and
-        # Thus needs to handle the optimizee individuals as vectors
-        self.current_individual_list = [np.array(dict_to_list(self.optimizee_create_individual()))
-                                        for _ in range(parameters.n_parallel_runs)]
+        # Thus needs to handle the optimizee individuals as vectors. Row i is the current individual of run i
+        self.current_individual_list = self.optimizee_individual_codec.encode_population(
+            [self.optimizee_create_individual() for _ in range(parameters.n_parallel_runs)])
         self.random_state = np.random.RandomState(parameters.seed)
 
         # The following parameters are NOT recorded
@@ -150,22 +151,24 @@ class SimulatedAnnealingOptimizer(Optimizer):
         self.g = 0  # the current generation
 
         # Keep track of current fitness value to decide whether we want the next individual to be accepted or not
-        self.current_fitness_value_list = [-np.Inf] * parameters.n_parallel_runs
-
-        new_individual_list = [
-            list_to_dict(
-                ind_as_list + self.random_state.normal(0.0, parameters.noisy_step, ind_as_list.size) * traj.noisy_step * self.T,
-                self.optimizee_individual_dict_spec)
-            for ind_as_list in self.current_individual_list
-        ]
-        if optimizee_bounding_func is not None:
-            new_individual_list = [self.optimizee_bounding_func(ind) for ind in new_individual_list]
-
-        self.eval_pop = new_individual_list
+        self.current_fitness_value_list = np.full(parameters.n_parallel_runs, -np.inf)
+
+        new_individuals = self.current_individual_list + self.random_state.normal(
+            0.0, parameters.noisy_step, self.current_individual_list.shape) * traj.noisy_step * self.T
+        self.eval_pop = self._get_eval_pop(new_individuals)
         self._expand_trajectory(traj)
-        
+
         self.cooling_schedule = parameters.cooling_schedule
 
+    def _get_eval_pop(self, new_individuals):
+        """
+        Returns the population to evaluate from the array of the new individuals of the runs
+        """
+        eval_pop = Population(new_individuals, self.optimizee_individual_codec)
+        if self.optimizee_bounding_func is not None:
+            eval_pop = eval_pop.bounded(self.optimizee_bounding_func)
+        return eval_pop
+
     def cooling(self,temperature, cooling_schedule, temperature_decay, temperature_end, steps_total):        
         # assumes, that the temperature always starts at 1
         T0 = 1
@@ -208,59 +211,48 @@ class SimulatedAnnealingOptimizer(Optimizer):
         """
         noisy_step, temp_decay, n_iteration, stop_criterion = \
             traj.noisy_step, traj.temp_decay, traj.n_iteration, traj.stop_criterion
-        old_eval_pop = self.eval_pop.copy()
-        self.eval_pop.clear()
+        old_eval_pop = self.eval_pop
         temperature = self.T
         temperature_end = 0
         self.T = self.cooling(temperature, self.cooling_schedule, temp_decay, temperature_end, n_iteration)
         logger.info("  Evaluating %i individuals" % len(fitnesses_results))
 
         assert len(fitnesses_results) == traj.n_parallel_runs
-        weighted_fitness_list = []
-        for i, (run_index, fitness) in enumerate(fitnesses_results):
-
-            weighted_fitness = sum(f * w for f, w in zip(fitness, self.optimizee_fitness_weights))
-            weighted_fitness_list.append(weighted_fitness)
-
+        weighted_fitness_list = np.empty(traj.n_parallel_runs)
+        for run_index, fitness in fitnesses_results:
             # We need to convert the current run index into an ind_idx
             # (index of individual within one generation)
             traj.v_idx = run_index
             ind_index = traj.par.ind_idx
-            individual = old_eval_pop[ind_index]
 
-            # Accept or reject the new solution
-            current_fitness_value_i = self.current_fitness_value_list[i]
-            r = self.random_state.rand()
-            p = np.exp((weighted_fitness - current_fitness_value_i) / self.T)
-            
-            # Accept
-            if r < p or weighted_fitness >= current_fitness_value_i:
-                self.current_fitness_value_list[i] = weighted_fitness
-                self.current_individual_list[i] = np.array(dict_to_list(individual))
+            weighted_fitness = sum(f * w for f, w in zip(fitness, self.optimizee_fitness_weights))
+            weighted_fitness_list[ind_index] = weighted_fitness
 
-            traj.f_add_result('$set.$.individual', individual)
+            traj.f_add_result('$set.$.individual', old_eval_pop[ind_index])
             # Watchout! if weighted fitness is a tuple/np array it should be converted to a list first here
             traj.f_add_result('$set.$.fitness', weighted_fitness)
 
-            current_individual = self.current_individual_list[i]
-            new_individual = list_to_dict(
-                current_individual + self.random_state.randn(current_individual.size) * noisy_step * self.T,
-                self.optimizee_individual_dict_spec)
-            if self.optimizee_bounding_func is not None:
-                new_individual = self.optimizee_bounding_func(new_individual)
+        # Accept or reject the new solutions of all the runs
+        r = self.random_state.rand(traj.n_parallel_runs)
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+            p = np.exp((weighted_fitness_list - self.current_fitness_value_list) / self.T)
+        accepted = (r < p) | (weighted_fitness_list >= self.current_fitness_value_list)
+        self.current_fitness_value_list[accepted] = weighted_fitness_list[accepted]
+        self.current_individual_list[accepted] = old_eval_pop.values[accepted]
+        logger.debug("Accepted the new individuals of %d of %d runs", np.count_nonzero(accepted), len(accepted))
 
-            logger.debug("Current best fitness for individual %d is %.2f. New individual is %s",
-                         i, self.current_fitness_value_list[i], new_individual)
-            self.eval_pop.append(new_individual)
+        new_individuals = self.current_individual_list + \
+            self.random_state.randn(*self.current_individual_list.shape) * noisy_step * self.T
+        self.eval_pop = self._get_eval_pop(new_individuals)
 
-        logger.debug("Current best fitness within population is %.2f", max(self.current_fitness_value_list))
+        logger.debug("Current best fitness within population is %.2f", np.max(self.current_fitness_value_list))
 
         traj.v_idx = -1  # set the trajectory back to default
         logger.info("-- End of generation {} --".format(self.g))
 
         # ------- Create the next generation by crossover and mutation -------- #
         # not necessary for the last generation
-        if self.g < n_iteration - 1 and stop_criterion > max(self.current_fitness_value_list):
+        if self.g < n_iteration - 1 and stop_criterion > np.max(self.current_fitness_value_list):
             fitnesses_results.clear()
             self.g += 1  # Update generation counter
             self._expand_trajectory(traj)
@@ -274,7 +266,7 @@ class SimulatedAnnealingOptimizer(Optimizer):
         best_last_indiv = self.current_individual_list[best_last_indiv_index]
         best_last_fitness = self.current_fitness_value_list[best_last_indiv_index]
 
-        best_last_indiv_dict = list_to_dict(best_last_indiv.tolist(), self.optimizee_individual_dict_spec)
+        best_last_indiv_dict = self.optimizee_individual_codec.decode(best_last_indiv)
         traj.f_add_result('final_individual', best_last_indiv_dict)
         traj.f_add_result('final_fitness', best_last_fitness)
         traj.f_add_result('n_iteration', self.g + 1)
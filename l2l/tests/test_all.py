@@ -4,12 +4,21 @@ import shutil
 
 
 from l2l.tests import test_ce_optimizer
+from l2l.tests import test_cmaes_optimizer
+from l2l.tests import test_checkpoint
+from l2l.tests import test_environment
+from l2l.tests import test_evaluation_cache
+from l2l.tests import test_function_generator
 from l2l.tests import test_ga_optimizer
 from l2l.tests import test_sa_optimizer
 from l2l.tests import test_gd_optimizer
 from l2l.tests import test_innerloop
+from l2l.tests import test_mnist_optimizee
+from l2l.tests import test_noise_table
+from l2l.tests import test_population
 from l2l.tests import test_outerloop
 from l2l.tests import test_setup
+from l2l.tests import test_synthetic_optimizee
 
 
 def test_suite():
@@ -18,7 +27,16 @@ def test_suite():
     suite.addTest(test_setup.suite())
     suite.addTest(test_outerloop.suite())
     suite.addTest(test_innerloop.suite())
+    suite.addTest(test_environment.suite())
+    suite.addTest(test_checkpoint.suite())
+    suite.addTest(test_evaluation_cache.suite())
+    suite.addTest(test_function_generator.suite())
+    suite.addTest(test_mnist_optimizee.suite())
+    suite.addTest(test_synthetic_optimizee.suite())
+    suite.addTest(test_population.suite())
+    suite.addTest(test_noise_table.suite())
     suite.addTest(test_ce_optimizer.suite())
+    suite.addTest(test_cmaes_optimizer.suite())
     suite.addTest(test_sa_optimizer.suite())
     suite.addTest(test_gd_optimizer.suite())
     suite.addTest(test_ga_optimizer.suite())
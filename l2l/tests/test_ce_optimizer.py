@@ -2,7 +2,8 @@ import unittest
 
 import numpy as np
 from l2l.tests.test_optimizer import OptimizerTestCase
-from l2l.optimizers.crossentropy.distribution import NoisyGaussian
+from l2l.optimizers.crossentropy.distribution import NoisyGaussian, Gaussian, LowRankGaussian, DiagonalGaussian, \
+    NoisyLowRankGaussian
 from l2l.optimizers.crossentropy import CrossEntropyOptimizer, CrossEntropyParameters
 
 
@@ -35,6 +36,60 @@ class CEOptimizerTestCase(OptimizerTestCase):
         self.assertEqual(best[1], -1.9766742736816023)
         self.experiment.end_experiment(optimizer)
 
+    def test_low_rank_distribution(self):
+        random_state = np.random.RandomState(0)
+        data = np.dot(random_state.randn(500, 3), random_state.randn(3, 20)) + random_state.rand(20) * \
+            random_state.randn(500, 20)
+        gaussian = Gaussian()
+        gaussian.init_random_state(np.random.RandomState(1))
+        gaussian.fit(data)
+
+        # With a rank as large as the dimension, the covariance matrix is the full one
+        distribution = LowRankGaussian(rank=20)
+        distribution.init_random_state(np.random.RandomState(1))
+        params = distribution.fit(data)
+        np.testing.assert_allclose(params['mean'], gaussian.mean)
+        np.testing.assert_allclose(np.dot(params['factors'], params['factors'].T) + np.diag(params['diagonal']),
+                                   gaussian.cov, atol=1e-10)
+
+        # The variances are kept whatever the rank, and the correlations of the leading directions are kept too
+        distribution = LowRankGaussian(rank=3)
+        distribution.init_random_state(np.random.RandomState(1))
+        params = distribution.fit(data)
+        self.assertEqual(params['factors'].shape, (20, 3))
+        cov = np.dot(params['factors'], params['factors'].T) + np.diag(params['diagonal'])
+        np.testing.assert_allclose(np.diag(cov), np.diag(gaussian.cov))
+        self.assertLess(np.linalg.norm(cov - gaussian.cov), 0.1 * np.linalg.norm(gaussian.cov))
+        samples = distribution.sample(20000)
+        self.assertEqual(samples.shape, (20000, 20))
+        self.assertLess(np.linalg.norm(np.cov(samples, rowvar=False) - cov), 0.05 * np.linalg.norm(cov))
+
+        distribution = DiagonalGaussian()
+        distribution.init_random_state(np.random.RandomState(1))
+        params = distribution.fit(data)
+        np.testing.assert_allclose(params['variance'], np.diag(gaussian.cov))
+        params = distribution.fit(data[:10], smooth_update=0.5)
+        np.testing.assert_allclose(params['variance'],
+                                   0.5 * np.diag(gaussian.cov) + 0.5 * np.var(data[:10], axis=0, ddof=1))
+
+    def test_noisy_low_rank_distribution(self):
+        optimizer_parameters = CrossEntropyParameters(pop_size=10, rho=0.5, smoothing=0.2, temp_decay=0, n_iteration=3,
+                                                      distribution=NoisyLowRankGaussian(
+                                                          rank=1, noise_magnitude=1., noise_decay=0.99),
+                                                      stop_criterion=np.inf, seed=1)
+        optimizer = CrossEntropyOptimizer(self.trajectory, optimizee_create_individual=self.optimizee.create_individual,
+                                          optimizee_fitness_weights=(-0.1,),
+                                          parameters=optimizer_parameters,
+                                          optimizee_bounding_func=self.optimizee.bounding_func)
+        self.experiment.run_experiment(optimizee=self.optimizee,
+                                       optimizee_parameters=self.optimizee_parameters,
+                                       optimizer=optimizer,
+                                       optimizer_parameters=optimizer_parameters)
+        self.assertEqual(optimizer.g, 2)
+        self.assertEqual(optimizer.distribution_results['factors'].shape, (2, 1))
+        self.assertEqual(optimizer.distribution_results['noise_value'].shape, (2,))
+        self.experiment.end_experiment(optimizer)
+
 
 def suite():
     suite = unittest.makeSuite(CEOptimizerTestCase, 'test')
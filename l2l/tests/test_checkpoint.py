@@ -0,0 +1,168 @@
+import os
+import pickle
+import unittest
+
+import numpy as np
+from l2l.utils.checkpoint import load_trajectory
+from l2l.utils.experiment import Experiment
+from l2l.optimizees.functions.benchmarked_functions import BenchmarkedFunctions
+from l2l.optimizees.functions.optimizee import FunctionGeneratorOptimizee
+from l2l.optimizers.crossentropy.distribution import NoisyGaussian
+from l2l.optimizers.crossentropy import CrossEntropyOptimizer, CrossEntropyParameters
+
+
+class InterruptedOptimizee(FunctionGeneratorOptimizee):
+    """
+    Optimizee which fails in the given generation, as if the run had been interrupted
+    """
+
+    def __init__(self, traj, fg_instance, seed, interrupted_generation):
+        super().__init__(traj, fg_instance, seed)
+        self.interrupted_generation = interrupted_generation
+
+    def simulate(self, traj):
+        if traj.individual.generation == self.interrupted_generation:
+            raise RuntimeError("Interrupted")
+        return super().simulate(traj)
+
+    def simulate_batch(self, traj, individuals):
+        # The batched evaluation is kept, as its values may differ from those of simulate in the last bit
+        if any(ind.generation == self.interrupted_generation for ind in individuals):
+            raise RuntimeError("Interrupted")
+        return super().simulate_batch(traj, individuals)
+
+
+class RecordingOptimizee(FunctionGeneratorOptimizee):
+    """
+    Optimizee which records the generations it evaluates
+    """
+    evaluated_generations = set()
+
+    def simulate(self, traj):
+        RecordingOptimizee.evaluated_generations.add(traj.individual.generation)
+        return super().simulate(traj)
+
+    def simulate_batch(self, traj, individuals):
+        RecordingOptimizee.evaluated_generations.update(ind.generation for ind in individuals)
+        return super().simulate_batch(traj, individuals)
+
+
+class CheckpointTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.prepare(name='L2L')
+
+    def prepare(self, optimizee_class=FunctionGeneratorOptimizee, optimizee_args=(), **experiment_kwargs):
+        bench_functs = BenchmarkedFunctions()
+        (benchmark_name, benchmark_function), benchmark_parameters = \
+            bench_functs.get_function_by_index(14, noise=True)
+
+        self.experiment = Experiment(root_dir_path='../../results')
+        self.trajectory, _ = self.experiment.prepare_experiment(log_stdout=True, jube_parameter={},
+                                                                backend='serial', snapshot_interval=2,
+                                                                **experiment_kwargs)
+        self.optimizee = optimizee_class(self.trajectory, benchmark_function, 1, *optimizee_args)
+        self.optimizer_parameters = CrossEntropyParameters(pop_size=6, rho=0.5, smoothing=0.0, temp_decay=0,
+                                                           n_iteration=5,
+                                                           distribution=NoisyGaussian(noise_magnitude=1.,
+                                                                                      noise_decay=0.99),
+                                                           stop_criterion=np.inf, seed=1)
+        self.optimizer = CrossEntropyOptimizer(self.trajectory,
+                                               optimizee_create_individual=self.optimizee.create_individual,
+                                               optimizee_fitness_weights=(-0.1,),
+                                               parameters=self.optimizer_parameters,
+                                               optimizee_bounding_func=self.optimizee.bounding_func)
+
+    def run_experiment(self):
+        self.experiment.run_experiment(optimizee=self.optimizee, optimizer=self.optimizer,
+                                       optimizer_parameters=self.optimizer_parameters)
+        self.experiment.end_experiment(self.optimizer)
+
+    def fitness_history(self):
+        history = []
+        for generation in range(5):
+            params = self.trajectory.results.generation_params['generation_{}'.format(generation)]['algorithm_params']
+            history.append((params['best_fitness_in_run'], params['average_fitness_in_run']))
+        return history
+
+    def test_resume(self):
+        self.run_experiment()
+        uninterrupted_history = self.fitness_history()
+
+        self.prepare(name='L2L-resumed', optimizee_class=InterruptedOptimizee, optimizee_args=(3,))
+        with self.assertRaises(RuntimeError):
+            self.run_experiment()
+
+        RecordingOptimizee.evaluated_generations.clear()
+        self.prepare(name='L2L-resumed', optimizee_class=RecordingOptimizee, resume=True)
+        self.run_experiment()
+        self.assertEqual(RecordingOptimizee.evaluated_generations, {3, 4})
+        self.assertEqual(sorted(self.trajectory.individuals.keys()), list(range(5)))
+        self.assertEqual(self.fitness_history(), uninterrupted_history)
+
+        # A new run with the same name does not resume the state of the earlier one
+        resume_path = os.path.join(self.experiment.env.per_gen_path, 'resume_state.bin')
+        self.assertTrue(os.path.exists(resume_path))
+        self.prepare(name='L2L-resumed')
+        self.assertFalse(os.path.exists(resume_path))
+
+    def stale_snapshot(self, path):
+        # Writes a snapshot as left by an earlier, longer run with the same name
+        with open(os.path.join(path, 'Trajectory_final_{:020d}.bin'.format(220)), 'wb') as handle:
+            pickle.dump(self.trajectory, handle)
+
+    def test_load_trajectory(self):
+        path = self.experiment.env.per_gen_path
+        self.stale_snapshot(path)
+        self.experiment.run_experiment(optimizee=self.optimizee, optimizer=self.optimizer,
+                                       optimizer_parameters=self.optimizer_parameters)
+
+        for generation in range(5):
+            # Generations 0, 2 and 4 are snapshots, the others are reconstructed from the log
+            loaded = load_trajectory(path, generation)
+            self.assertEqual(loaded.par['generation'], generation)
+            self.assertEqual(sorted(loaded.individuals.keys()), list(range(generation + 1)))
+            for g in range(generation + 1):
+                self.assertEqual([r[0] for r in loaded.results.all_results[g]],
+                                 [ind.ind_idx for ind in self.trajectory.individuals[g]])
+                np.testing.assert_array_equal([ind.coords for ind in loaded.individuals[g]],
+                                              [ind.coords for ind in self.trajectory.individuals[g]])
+            # The parameters of a generation are added by the optimizer after the generation has been stored
+            self.assertEqual(sorted(loaded.results.generation_params._data.keys()),
+                             ['generation_{}'.format(g) for g in range(generation)])
+            for g in range(generation):
+                name = 'generation_{}'.format(g)
+                loaded_params = loaded.results.generation_params[name]['algorithm_params']
+                params = self.trajectory.results.generation_params[name]['algorithm_params']
+                self.assertEqual(loaded_params['best_fitness_in_run'], params['best_fitness_in_run'])
+                self.assertEqual(loaded_params['average_fitness_in_run'], params['average_fitness_in_run'])
+
+        self.assertEqual(load_trajectory(path).par['generation'], 4)
+        self.experiment.end_experiment(self.optimizer)
+        self.stale_snapshot(path)
+        with self.assertRaises(Exception):
+            load_trajectory(path)
+
+        # The resumed run only evaluates the generations after the interruption, the log holds all of them
+        self.prepare(name='L2L-resumed', optimizee_class=InterruptedOptimizee, optimizee_args=(3,))
+        with self.assertRaises(RuntimeError):
+            self.run_experiment()
+        self.prepare(name='L2L-resumed', resume=True)
+        self.run_experiment()
+        loaded = load_trajectory(self.experiment.env.per_gen_path)
+        self.assertEqual(sorted(loaded.individuals.keys()), list(range(5)))
+        self.assertEqual(sorted(loaded.results.all_results._data.keys()), list(range(5)))
+
+
+def suite():
+    suite = unittest.makeSuite(CheckpointTestCase, 'test')
+    return suite
+
+
+def run():
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,78 @@
+import unittest
+
+import numpy as np
+from l2l.tests.test_optimizer import OptimizerTestCase
+from l2l.optimizers.cmaes import CMAESParameters, CMAESOptimizer
+
+
+class CMAESOptimizerTestCase(OptimizerTestCase):
+
+    def test_setup(self):
+
+        optimizer_parameters = CMAESParameters(sigma=1., pop_size=4, n_iteration=2, stop_criterion=np.inf, seed=1)
+        optimizer = CMAESOptimizer(self.trajectory, optimizee_create_individual=self.optimizee.create_individual,
+                                   optimizee_fitness_weights=(-0.1,),
+                                   parameters=optimizer_parameters,
+                                   optimizee_bounding_func=self.optimizee.bounding_func)
+
+        self.assertIsNotNone(optimizer.parameters)
+        self.assertIsNotNone(self.experiment)
+
+        try:
+
+            self.experiment.run_experiment(optimizee=self.optimizee,
+                                           optimizee_parameters=self.optimizee_parameters,
+                                           optimizer=optimizer,
+                                           optimizer_parameters=optimizer_parameters)
+        except Exception as e:
+            self.fail(e.__name__)
+        self.assertEqual(len(self.experiment.optimizer.best_individual['coords']), 2)
+        self.experiment.end_experiment(optimizer)
+
+    def run_cmaes(self, function_name, **parameters):
+        self.prepare(function_name, noise=False, backend='serial')
+        optimizer_parameters = CMAESParameters(sigma=1., pop_size=None, seed=1, **parameters)
+        optimizer = CMAESOptimizer(self.trajectory, optimizee_create_individual=self.optimizee.create_individual,
+                                   optimizee_fitness_weights=(-1.,),
+                                   parameters=optimizer_parameters,
+                                   optimizee_bounding_func=self.optimizee.bounding_func)
+        self.experiment.run_experiment(optimizee=self.optimizee, optimizer=optimizer,
+                                       optimizer_parameters=optimizer_parameters)
+        self.experiment.end_experiment(optimizer)
+        return self.trajectory, optimizer
+
+    def test_convergence(self):
+        # The optimum of the Rosenbrock function is at the end of a curved, badly conditioned valley
+        trajectory, optimizer = self.run_cmaes('Rosenbrock2d', n_iteration=300, stop_criterion=-1e-8)
+        self.assertGreater(optimizer.best_fitness, -1e-8)
+        np.testing.assert_allclose(optimizer.best_individual['coords'], [1., 1.], atol=1e-3)
+        # The run stops once the stop criterion is reached
+        self.assertLess(optimizer.g, 299)
+        self.assertEqual(len(trajectory.individuals), optimizer.g + 1)
+
+        # Only the diagonal is adapted, which still finds the optimum of the separable Ackley function
+        trajectory, optimizer = self.run_cmaes('Ackley10d', n_iteration=300, stop_criterion=-1e-8, separable=True)
+        self.assertGreater(optimizer.best_fitness, -1e-8)
+        self.assertEqual(optimizer.cov.shape, (10, ))
+
+    def test_restarts(self):
+        trajectory, optimizer = self.run_cmaes('Rastrigin2d', n_iteration=300, stop_criterion=np.inf, n_restarts=2,
+                                               tol_fun=1e-8)
+        self.assertEqual(optimizer.restart, 2)
+        pop_sizes = [len(trajectory.individuals[g]) for g in sorted(trajectory.individuals)]
+        self.assertEqual(sorted(set(pop_sizes)), [6, 12, 24])
+        self.assertEqual(pop_sizes, sorted(pop_sizes))
+
+
+def suite():
+    suite = unittest.makeSuite(CMAESOptimizerTestCase, 'test')
+    return suite
+
+
+def run():
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,356 @@
+import csv
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+
+import numpy as np
+from l2l.utils.experiment import Experiment
+from l2l.optimizees.functions.benchmarked_functions import BenchmarkedFunctions
+from l2l.optimizees.functions.optimizee import FunctionGeneratorOptimizee
+from l2l.optimizers.crossentropy.distribution import NoisyGaussian
+from l2l.optimizers.crossentropy import CrossEntropyOptimizer, CrossEntropyParameters
+from l2l.optimizers.evolution import GeneticAlgorithmOptimizer, GeneticAlgorithmParameters, \
+    SteadyStateGeneticAlgorithmOptimizer
+from l2l.optimizers.evolutionstrategies import EvolutionStrategiesParameters, AsynchronousEvolutionStrategiesOptimizer
+
+from l2l.utils.evaluation_scheduler import EvaluationError, EvaluationTimeout
+from l2l.utils.phase_timings import export_timings_csv, export_timings_json
+from l2l.utils.trajectory import Trajectory
+from l2l.utils.worker_runner import WorkerRunner
+
+
+class SlowOptimizee(FunctionGeneratorOptimizee):
+    """
+    Takes a minute to evaluate the first individual of the first generation. If a marker path is given, this only
+    happens the first time, and the marker file is created then.
+    """
+
+    def __init__(self, traj, fg_instance, seed, marker_path=None):
+        super().__init__(traj, fg_instance, seed)
+        self.marker_path = marker_path
+
+    def simulate(self, traj):
+        if traj.individual.generation == 0 and traj.individual.ind_idx == 0:
+            if self.marker_path is None or not os.path.exists(self.marker_path):
+                if self.marker_path is not None:
+                    open(self.marker_path, 'w').close()
+                time.sleep(60)
+        return super().simulate(traj)
+
+    def simulate_batch(self, traj, individuals):
+        raise NotImplementedError()
+
+
+class FlakyOptimizee(FunctionGeneratorOptimizee):
+    """
+    Fails to evaluate the first individual of the first generation. If a marker path is given, this only happens the
+    first time, and the marker file is created then.
+    """
+
+    def __init__(self, traj, fg_instance, seed, marker_path=None):
+        super().__init__(traj, fg_instance, seed)
+        self.marker_path = marker_path
+
+    def simulate(self, traj):
+        if traj.individual.generation == 0 and traj.individual.ind_idx == 0:
+            if self.marker_path is None or not os.path.exists(self.marker_path):
+                if self.marker_path is not None:
+                    open(self.marker_path, 'w').close()
+                raise RuntimeError("Simulated failure")
+        return super().simulate(traj)
+
+    def simulate_batch(self, traj, individuals):
+        raise NotImplementedError()
+
+
+class CrashingOptimizee(FunctionGeneratorOptimizee):
+    """
+    Kills its process while evaluating the first individual of the first generation. If a marker path is given, this
+    only happens the first time, and the marker file is created then.
+    """
+
+    def __init__(self, traj, fg_instance, seed, marker_path=None):
+        super().__init__(traj, fg_instance, seed)
+        self.marker_path = marker_path
+
+    def simulate(self, traj):
+        if traj.individual.generation == 0 and traj.individual.ind_idx == 0:
+            if self.marker_path is None or not os.path.exists(self.marker_path):
+                if self.marker_path is not None:
+                    open(self.marker_path, 'w').close()
+                os._exit(1)
+        return super().simulate(traj)
+
+    def simulate_batch(self, traj, individuals):
+        raise NotImplementedError()
+
+
+class BrokenWorkerRunner(WorkerRunner):
+    """
+    Starts local worker processes which exit before connecting, as they do e.g. if they cannot import the optimizee
+    """
+
+    def _start_local_worker(self, authkey):
+        process = subprocess.Popen([sys.executable, '-c', 'import sys; sys.exit(3)'])
+        self.processes[process.pid] = process
+
+
+class EnvironmentTestCase(unittest.TestCase):
+
+    def run_ce(self, **experiment_kwargs):
+        # The function is used without noise, so that all backends have to produce the same results
+        bench_functs = BenchmarkedFunctions()
+        (benchmark_name, benchmark_function), benchmark_parameters = \
+            bench_functs.get_function_by_index(14, noise=False)
+
+        experiment = Experiment(root_dir_path='../../results')
+        trajectory, _ = experiment.prepare_experiment(name='L2L', log_stdout=True, jube_parameter={},
+                                                      **experiment_kwargs)
+        optimizee = FunctionGeneratorOptimizee(trajectory, benchmark_function, seed=1)
+        optimizer_parameters = CrossEntropyParameters(pop_size=8, rho=0.5, smoothing=0.0, temp_decay=0, n_iteration=3,
+                                                      distribution=NoisyGaussian(noise_magnitude=1., noise_decay=0.99),
+                                                      stop_criterion=np.inf, seed=1)
+        optimizer = CrossEntropyOptimizer(trajectory, optimizee_create_individual=optimizee.create_individual,
+                                          optimizee_fitness_weights=(-0.1,),
+                                          parameters=optimizer_parameters,
+                                          optimizee_bounding_func=optimizee.bounding_func)
+        experiment.run_experiment(optimizee=optimizee, optimizer=optimizer,
+                                  optimizer_parameters=optimizer_parameters)
+        experiment.end_experiment(optimizer)
+        return trajectory
+
+    def run_asynchronous(self, optimizer_class, optimizer_parameters, **experiment_kwargs):
+        bench_functs = BenchmarkedFunctions()
+        (benchmark_name, benchmark_function), benchmark_parameters = \
+            bench_functs.get_function_by_index(14, noise=False)
+
+        experiment = Experiment(root_dir_path='../../results')
+        trajectory, _ = experiment.prepare_experiment(name='L2L', log_stdout=True, jube_parameter={},
+                                                      asynchronous=True, **experiment_kwargs)
+        optimizee = FunctionGeneratorOptimizee(trajectory, benchmark_function, seed=1)
+        optimizer = optimizer_class(trajectory, optimizee_create_individual=optimizee.create_individual,
+                                    optimizee_fitness_weights=(-0.1,),
+                                    parameters=optimizer_parameters,
+                                    optimizee_bounding_func=optimizee.bounding_func)
+        experiment.run_experiment(optimizee=optimizee, optimizer=optimizer,
+                                  optimizer_parameters=optimizer_parameters)
+        experiment.end_experiment(optimizer)
+        return trajectory, optimizer
+
+    def run_slow_ga(self, marker_path=None, optimizee_class=SlowOptimizee, n_iteration=1, **experiment_kwargs):
+        bench_functs = BenchmarkedFunctions()
+        (benchmark_name, benchmark_function), benchmark_parameters = \
+            bench_functs.get_function_by_index(14, noise=False)
+
+        experiment = Experiment(root_dir_path='../../results')
+        trajectory, _ = experiment.prepare_experiment(name='L2L', log_stdout=True, jube_parameter={},
+                                                      **experiment_kwargs)
+        optimizee = optimizee_class(trajectory, benchmark_function, seed=1, marker_path=marker_path)
+        optimizer_parameters = GeneticAlgorithmParameters(seed=0, pop_size=4, cx_prob=0.5, mut_prob=0.3,
+                                                          n_iteration=n_iteration, ind_prob=0.02, tourn_size=2,
+                                                          mate_par=0.5, mut_par=1)
+        optimizer = GeneticAlgorithmOptimizer(trajectory, optimizee_create_individual=optimizee.create_individual,
+                                              optimizee_fitness_weights=(-0.1,),
+                                              parameters=optimizer_parameters)
+        start = time.time()
+        experiment.run_experiment(optimizee=optimizee, optimizer=optimizer,
+                                  optimizer_parameters=optimizer_parameters)
+        duration = time.time() - start
+        experiment.end_experiment(optimizer)
+        self.failures = trajectory.results.evaluation_failures._data.get(0, [])
+        self.trajectory = trajectory
+        return dict(trajectory.results.all_results[0]), duration
+
+    def fitness_history(self, trajectory):
+        # The optimizer empties the lists of fitnesses it is given, so the fitnesses are taken from its results
+        history = []
+        for generation in range(3):
+            params = trajectory.results.generation_params['generation_{}'.format(generation)]['algorithm_params']
+            history.append((params['best_fitness_in_run'], params['average_fitness_in_run']))
+        return history
+
+    def test_pool_backend(self):
+        serial_traj = self.run_ce(backend='serial')
+        pool_traj = self.run_ce(backend='pool', n_workers=2)
+
+        np.testing.assert_allclose(self.fitness_history(serial_traj), self.fitness_history(pool_traj))
+
+    def test_worker_backend(self):
+        serial_traj = self.run_ce(backend='serial')
+        worker_traj = self.run_ce(backend='workers', n_workers=2)
+
+        np.testing.assert_allclose(self.fitness_history(serial_traj), self.fitness_history(worker_traj))
+
+    def test_worker_exits_before_connecting(self):
+        start = time.time()
+        with self.assertRaises(Exception) as context:
+            BrokenWorkerRunner(print, Trajectory(name='test'), n_workers=2)
+        self.assertLess(time.time() - start, 30)
+        self.assertIn("exited with code 3 before connecting", str(context.exception))
+
+    def test_phase_timings(self):
+        trajectory = self.run_ce(backend='pool', n_workers=2)
+
+        timings = trajectory.results.timings._data
+        self.assertEqual(sorted(timings), [0, 1, 2])
+        # The individuals of the next generation are created in the post-processing, except after the last one
+        self.assertIn('f_expand', timings[0]['phases'])
+        self.assertNotIn('f_expand', timings[2]['phases'])
+        for generation in range(3):
+            self.assertTrue({'evaluation', 'checkpoint', 'post_process'} <= set(timings[generation]['phases']))
+            self.assertEqual(sorted(timings[generation]['evaluation_times']), list(range(8)))
+
+        with tempfile.TemporaryDirectory() as directory:
+            export_timings_csv(trajectory, os.path.join(directory, 'timings.csv'))
+            export_timings_json(trajectory, os.path.join(directory, 'timings.json'))
+            with open(os.path.join(directory, 'timings.csv')) as f:
+                rows = list(csv.DictReader(f))
+            with open(os.path.join(directory, 'timings.json')) as f:
+                exported = json.load(f)
+        self.assertEqual(len([row for row in rows if row['phase'] == 'individual_evaluation']), 24)
+        self.assertEqual([entry['generation'] for entry in exported], [0, 1, 2])
+        self.assertEqual(len(exported[0]['evaluation_times']), 8)
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            self.run_ce(backend='unknown')
+
+    def test_asynchronous_steady_state_ga(self):
+        optimizer_parameters = GeneticAlgorithmParameters(seed=0, pop_size=6, cx_prob=0.5, mut_prob=0.3, n_iteration=4,
+                                                          ind_prob=0.02, tourn_size=3, mate_par=0.5, mut_par=1)
+        for backend in ('serial', 'pool'):
+            trajectory, optimizer = self.run_asynchronous(SteadyStateGeneticAlgorithmOptimizer, optimizer_parameters,
+                                                          backend=backend, n_workers=2)
+            results = trajectory.results.all_results
+            # Every pop_size evaluations count as a generation, and the budget of the synchronous GA is kept
+            self.assertEqual(sorted(results._data.keys()), list(range(4)))
+            ind_indices = [ind_idx for generation in range(4) for ind_idx, _ in results[generation]]
+            self.assertEqual(sorted(ind_indices), list(range(24)))
+            self.assertEqual(len(optimizer.pop), 6)
+            self.assertFalse(optimizer.pending)
+            self.assertIsNotNone(optimizer.best_individual)
+
+    def test_asynchronous_es(self):
+        optimizer_parameters = EvolutionStrategiesParameters(learning_rate=0.1, noise_std=1.0,
+                                                             mirrored_sampling_enabled=True,
+                                                             fitness_shaping_enabled=True, pop_size=3, n_iteration=3,
+                                                             stop_criterion=np.inf, seed=1)
+        for backend in ('serial', 'workers'):
+            trajectory, optimizer = self.run_asynchronous(AsynchronousEvolutionStrategiesOptimizer,
+                                                          optimizer_parameters, backend=backend, n_workers=2)
+            # 6 perturbations per update, and the current individual once per generation
+            n_evaluated = sum(len(trajectory.results.all_results[g]) for g in trajectory.results.all_results._data)
+            self.assertEqual(n_evaluated, 3 * 6 + 3)
+            self.assertEqual(optimizer.g, 2)
+            self.assertTrue(optimizer.finished)
+            self.assertEqual(len(trajectory.results.generation_params._data), 3)
+
+    def test_asynchronous_unsupported(self):
+        # The cross entropy optimizer needs whole generations
+        with self.assertRaises(ValueError):
+            self.run_ce(backend='serial', asynchronous=True)
+        with self.assertRaises(ValueError):
+            self.run_ce(backend='jube', asynchronous=True)
+
+    def test_timeout_penalty(self):
+        for backend in ('serial', 'pool', 'workers'):
+            fitnesses, duration = self.run_slow_ga(backend=backend, n_workers=2, timeout=1, penalty_fitness=(1e6,))
+            self.assertLess(duration, 30)
+            self.assertEqual(fitnesses[0], (1e6,))
+            self.assertEqual(sorted(fitnesses), [0, 1, 2, 3])
+            for ind_idx in (1, 2, 3):
+                self.assertNotEqual(fitnesses[ind_idx], (1e6,))
+
+    def test_timeout_frees_worker(self):
+        # The only worker is stuck with the individual which timed out, unless its evaluation is stopped
+        for backend in ('serial', 'pool', 'workers'):
+            fitnesses, duration = self.run_slow_ga(backend=backend, n_workers=1, timeout=1, penalty_fitness=(1e6,),
+                                                   n_iteration=2)
+            self.assertLess(duration, 30)
+            self.assertEqual(fitnesses[0], (1e6,))
+            self.assertEqual([failure.ind_idx for failure in self.failures], [0])
+            next_fitnesses = dict(self.trajectory.results.all_results[1])
+            self.assertTrue(next_fitnesses)
+            self.assertEqual(sorted(next_fitnesses), [ind.ind_idx for ind in self.trajectory.individuals[1]])
+            for fitness in next_fitnesses.values():
+                self.assertNotEqual(fitness, (1e6,))
+            self.assertNotIn(1, self.trajectory.results.evaluation_failures._data)
+
+    def test_timeout_without_penalty(self):
+        with self.assertRaises(EvaluationTimeout):
+            self.run_slow_ga(backend='serial', timeout=1)
+
+    def test_speculative_evaluation(self):
+        # Only the first evaluation of the individual is slow, so its second evaluation is used
+        with tempfile.TemporaryDirectory() as directory:
+            marker_path = os.path.join(directory, 'slow_evaluation')
+            fitnesses, duration = self.run_slow_ga(marker_path, backend='workers', n_workers=2,
+                                                   speculation_threshold=0.5, timeout=30)
+        self.assertLess(duration, 30)
+        self.assertEqual(sorted(fitnesses), [0, 1, 2, 3])
+        self.assertNotEqual(fitnesses[0], None)
+
+    def test_retry_failed_individual(self):
+        for backend in ('serial', 'pool', 'workers', 'jube'):
+            with tempfile.TemporaryDirectory() as directory:
+                marker_path = os.path.join(directory, 'failed_evaluation')
+                fitnesses, _ = self.run_slow_ga(marker_path, FlakyOptimizee, backend=backend, n_workers=2,
+                                                max_retries=1)
+            self.assertEqual(sorted(fitnesses), [0, 1, 2, 3])
+            self.assertLess(fitnesses[0][0], 1e6)
+            self.assertEqual(len(self.failures), 1)
+            self.assertEqual(self.failures[0].ind_idx, 0)
+            self.assertEqual(self.failures[0].attempt, 0)
+            self.assertEqual(self.failures[0].reason, 'error')
+            self.assertIn("Simulated failure", self.failures[0].details)
+
+    def test_retry_crashed_individual(self):
+        for backend in ('pool', 'workers'):
+            with tempfile.TemporaryDirectory() as directory:
+                marker_path = os.path.join(directory, 'crashed_evaluation')
+                fitnesses, duration = self.run_slow_ga(marker_path, CrashingOptimizee, backend=backend, n_workers=2,
+                                                       max_retries=1)
+            self.assertLess(duration, 30)
+            self.assertEqual(sorted(fitnesses), [0, 1, 2, 3])
+            self.assertEqual([(failure.ind_idx, failure.reason) for failure in self.failures], [(0, 'crash')])
+        with self.assertRaises(EvaluationError) as context:
+            self.run_slow_ga(None, CrashingOptimizee, backend='pool', n_workers=2)
+        self.assertEqual(context.exception.reason, 'crash')
+
+    def test_stale_jube_outputs(self):
+        # The error file of the failed individual is left in the results directory of the experiment
+        self.run_slow_ga(None, FlakyOptimizee, backend='jube', penalty_fitness=(1e6,))
+        self.assertEqual(len(self.failures), 1)
+        with tempfile.TemporaryDirectory() as directory:
+            marker_path = os.path.join(directory, 'failed_evaluation')
+            open(marker_path, 'w').close()
+            fitnesses, _ = self.run_slow_ga(marker_path, FlakyOptimizee, backend='jube')
+        self.assertEqual(self.failures, [])
+        self.assertLess(fitnesses[0][0], 1e6)
+
+    def test_failure_penalty(self):
+        for backend in ('serial', 'workers', 'jube'):
+            fitnesses, _ = self.run_slow_ga(None, FlakyOptimizee, backend=backend, n_workers=2, max_retries=2,
+                                            penalty_fitness=(1e6,))
+            self.assertEqual(fitnesses[0], (1e6,))
+            self.assertEqual([failure.attempt for failure in self.failures], [0, 1, 2])
+        with self.assertRaises(EvaluationError):
+            self.run_slow_ga(None, FlakyOptimizee, backend='pool', n_workers=2, max_retries=1)
+
+
+def suite():
+    suite = unittest.makeSuite(EnvironmentTestCase, 'test')
+    return suite
+
+
+def run():
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
+
+
+if __name__ == "__main__":
+    run()
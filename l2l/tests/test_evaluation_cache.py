@@ -0,0 +1,116 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+from l2l.optimizees.functions.benchmarked_functions import BenchmarkedFunctions
+from l2l.optimizees.functions.optimizee import FunctionGeneratorOptimizee
+from l2l.utils.evaluation_cache import EvaluationCache, CachedOptimizee
+from l2l.utils.individual import Individual
+from l2l.utils.trajectory import Trajectory
+
+
+class EvaluationCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache_path = os.path.join(self.tmp_dir.name, 'cache.sqlite')
+        (_, self.function), self.function_parameters = BenchmarkedFunctions().get_function_by_index(0, noise=False)
+        self.trajectory = Trajectory(name='test')
+        self.optimizee = FunctionGeneratorOptimizee(self.trajectory, self.function, seed=1)
+        self.individuals = [Individual(0, ind_idx, [{'individual.coords': coords}])
+                            for ind_idx, coords in enumerate(np.random.RandomState(0).uniform(-5, 5, size=(5, 2)))]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_cached_optimizee(self):
+        expected = self.optimizee.simulate_batch(self.trajectory, self.individuals)
+
+        cached_optimizee = CachedOptimizee(self.optimizee, EvaluationCache(self.cache_path), self.function_parameters)
+        self.assertEqual(cached_optimizee.simulate_batch(self.trajectory, self.individuals[:3]), expected[:3])
+        self.assertEqual(cached_optimizee.n_cache_hits, 0)
+        self.assertEqual(cached_optimizee.simulate_batch(self.trajectory, self.individuals), expected)
+        self.assertEqual(cached_optimizee.n_cache_hits, 3)
+
+        # The cache persists across runs and processes
+        cached_optimizee = pickle.loads(pickle.dumps(
+            CachedOptimizee(self.optimizee, EvaluationCache(self.cache_path), self.function_parameters)))
+        for ind, fitness in zip(self.individuals, expected):
+            self.trajectory.individual = ind
+            self.assertEqual(cached_optimizee.simulate(self.trajectory), fitness)
+        self.assertEqual(cached_optimizee.n_cache_hits, 5)
+
+        # Another optimizee does not get the fitnesses of the first one
+        cached_optimizee = CachedOptimizee(self.optimizee, EvaluationCache(self.cache_path), 'other optimizee')
+        cached_optimizee.simulate_batch(self.trajectory, self.individuals)
+        self.assertEqual(cached_optimizee.n_cache_hits, 0)
+
+    def test_eviction(self):
+        cache = EvaluationCache(self.cache_path, max_entries=3)
+        keys = [cache.make_key(self.function_parameters, ind) for ind in self.individuals]
+        for i, key in enumerate(keys[:3]):
+            cache.put(key, (i, ))
+        # Using the first entry makes the second one the least recently used
+        self.assertEqual(cache.get(keys[0]), (0, ))
+        cache.put(keys[3], (3, ))
+        self.assertEqual(len(cache), 3)
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertEqual(cache.get(keys[0]), (0, ))
+        self.assertEqual(cache.get(keys[3]), (3, ))
+        # Storing a fitness again replaces it
+        cache.put(keys[3], (4, ))
+        self.assertEqual(len(cache), 3)
+        self.assertEqual(cache.get(keys[3]), (4, ))
+        cache.close()
+
+    def test_entry_count(self):
+        # A database created without the count of its entries is counted when it is opened
+        connection = sqlite3.connect(self.cache_path)
+        connection.execute("CREATE TABLE evaluations "
+                           "(key TEXT PRIMARY KEY, fitness BLOB NOT NULL, last_used REAL NOT NULL)")
+        connection.executemany("INSERT INTO evaluations VALUES (?, ?, ?)",
+                               [(str(i), pickle.dumps(i), i) for i in range(4)])
+        connection.commit()
+        connection.close()
+        cache = EvaluationCache(self.cache_path, max_entries=4)
+        self.assertEqual(len(cache), 4)
+        cache.put('4', 4)
+        self.assertEqual(len(cache), 4)
+        self.assertIsNone(cache.get('0'))
+        cache.close()
+
+    def test_batch_transaction(self):
+        cache = EvaluationCache(self.cache_path)
+        cached_optimizee = CachedOptimizee(self.optimizee, cache, self.function_parameters)
+        cached_optimizee.simulate_batch(self.trajectory, self.individuals[:3])
+
+        statements = []
+        cache._connect().set_trace_callback(statements.append)
+        cached_optimizee.simulate_batch(self.trajectory, self.individuals)
+        # The entries are not counted, and the hits and new fitnesses of the batch are written in one transaction
+        self.assertFalse([sql for sql in statements if 'COUNT' in sql])
+        writes = [i for i, sql in enumerate(statements) if sql.startswith(('INSERT', 'UPDATE', 'DELETE'))]
+        # The statements which fire triggers are traced once more for each of them
+        self.assertEqual(len({statements[i] for i in writes}), 5)
+        self.assertEqual([sql for sql in statements if sql in ('BEGIN IMMEDIATE', 'COMMIT')],
+                         ['BEGIN IMMEDIATE', 'COMMIT'])
+        self.assertLess(statements.index('BEGIN IMMEDIATE'), writes[0])
+        self.assertGreater(statements.index('COMMIT'), writes[-1])
+        cache.close()
+
+
+def suite():
+    suite = unittest.makeSuite(EvaluationCacheTestCase, 'test')
+    return suite
+
+
+def run():
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
+
+
+if __name__ == "__main__":
+    run()
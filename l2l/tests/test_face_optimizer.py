@@ -2,7 +2,7 @@ import unittest
 
 import numpy as np
 from l2l.tests.test_optimizer import OptimizerTestCase
-from l2l.optimizers.crossentropy.distribution import Gaussian
+from l2l.optimizers.crossentropy.distribution import Gaussian, NoisyDiagonalGaussian
 from l2l.optimizers.face import FACEOptimizer, FACEParameters
 
 
@@ -33,6 +33,21 @@ class FACEOptimizerTestCase(OptimizerTestCase):
         self.assertEqual(best[1], -1.9766742736816023)
         self.experiment.end_experiment(optimizer)
 
+    def test_diagonal_distribution(self):
+        optimizer_parameters = FACEParameters(min_pop_size=4, max_pop_size=6, n_elite=2, smoothing=0.2, temp_decay=0,
+                                              n_iteration=3, distribution=NoisyDiagonalGaussian(noise_magnitude=0.1),
+                                              n_expand=5, stop_criterion=np.inf, seed=1)
+        optimizer = FACEOptimizer(self.trajectory, optimizee_create_individual=self.optimizee.create_individual,
+                                  optimizee_fitness_weights=(-0.1,),
+                                  parameters=optimizer_parameters,
+                                  optimizee_bounding_func=self.optimizee.bounding_func)
+        self.experiment.run_experiment(optimizee=self.optimizee,
+                                       optimizee_parameters=self.optimizee_parameters,
+                                       optimizer=optimizer,
+                                       optimizer_parameters=optimizer_parameters)
+        self.assertEqual(sorted(optimizer.distribution_results), ['mean', 'noise_value', 'variance'])
+        self.experiment.end_experiment(optimizer)
+
 
 def suite():
     suite = unittest.makeSuite(FACEOptimizerTestCase, 'test')
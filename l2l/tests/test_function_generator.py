@@ -0,0 +1,54 @@
+import unittest
+
+import numpy as np
+from l2l.optimizees.functions.benchmarked_functions import BenchmarkedFunctions
+from l2l.optimizees.functions.optimizee import FunctionGeneratorOptimizee
+from l2l.utils.individual import Individual
+from l2l.utils.trajectory import Trajectory
+
+
+class FunctionGeneratorTestCase(unittest.TestCase):
+
+    def test_cost_function_batch(self):
+        bench_functs = BenchmarkedFunctions()
+        for index, (name, _) in enumerate(bench_functs.function_name_map):
+            for noise in (False, True):
+                (_, function), _ = bench_functs.get_function_by_index(index, noise=noise)
+                points = np.random.RandomState(0).uniform(function.bound[0], function.bound[1],
+                                                          size=(20, function.dims))
+                random_state = np.random.RandomState(1)
+                expected = [function.cost_function(x, random_state=random_state) for x in points]
+                random_state = np.random.RandomState(1)
+                values = function.cost_function_batch(points, random_state=random_state)
+                np.testing.assert_allclose(values, expected, rtol=1e-10, atol=1e-12, err_msg=name)
+
+    def test_simulate_batch(self):
+        (_, function), _ = BenchmarkedFunctions().get_function_by_index(14, noise=True)
+        individuals = []
+        for ind_idx, coords in enumerate(np.random.RandomState(0).uniform(-5, 5, size=(10, 2))):
+            individuals.append(Individual(0, ind_idx, [{'individual.coords': coords}]))
+
+        trajectory = Trajectory(name='test')
+        optimizee = FunctionGeneratorOptimizee(trajectory, function, seed=1)
+        expected = []
+        for ind in individuals:
+            trajectory.individual = ind
+            expected.append(optimizee.simulate(trajectory))
+
+        trajectory = Trajectory(name='test')
+        optimizee = FunctionGeneratorOptimizee(trajectory, function, seed=1)
+        np.testing.assert_allclose(optimizee.simulate_batch(trajectory, individuals), expected)
+
+
+def suite():
+    suite = unittest.makeSuite(FunctionGeneratorTestCase, 'test')
+    return suite
+
+
+def run():
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
+
+
+if __name__ == "__main__":
+    run()
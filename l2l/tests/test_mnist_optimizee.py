@@ -0,0 +1,77 @@
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+from l2l.optimizees.mnist import MNISTOptimizee, MNISTOptimizeeParameters
+from l2l.utils.individual import Individual
+from l2l.utils.trajectory import Trajectory
+
+
+class MNISTOptimizeeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.trajectory = Trajectory(name='test')
+        parameters = MNISTOptimizeeParameters(n_hidden=10, seed=1, use_small_mnist=True, score_chunk_size=500)
+        self.optimizee = MNISTOptimizee(self.trajectory, parameters)
+        self.individuals = []
+        for ind_idx in range(8):
+            weights = self.optimizee.create_individual()['weights']
+            self.individuals.append(Individual(0, ind_idx, [{'individual.weights': weights}]))
+
+    def test_simulate_batch(self):
+        expected = []
+        for ind in self.individuals:
+            self.trajectory.individual = ind
+            expected.append(self.optimizee.simulate(self.trajectory))
+
+        self.assertEqual(self.optimizee.simulate_batch(self.trajectory, self.individuals), expected)
+
+        self.optimizee.score_dtype = np.dtype('float32')
+        np.testing.assert_allclose(self.optimizee.simulate_batch(self.trajectory, self.individuals), expected,
+                                   atol=0.01)
+
+    def test_minibatch(self):
+        full_scores = self.optimizee.simulate_batch(self.trajectory, self.individuals)
+        self.optimizee.minibatch_size = 200
+
+        scores = self.optimizee.simulate_batch(self.trajectory, self.individuals)
+        self.assertNotEqual(scores, full_scores)
+        for ind, score in zip(self.individuals, scores):
+            self.trajectory.individual = ind
+            # The minibatch only depends on the generation, so that all the individuals are scored on the same images
+            self.assertEqual(self.optimizee.simulate(self.trajectory), score)
+            self.assertEqual(self.optimizee.validate(ind.weights), full_scores[ind.ind_idx])
+
+        self.individuals[0].generation = 1
+        self.assertNotEqual(self.optimizee.simulate_batch(self.trajectory, self.individuals[:1]), scores[:1])
+
+    def test_dataset_cache(self):
+        expected = self.optimizee.simulate_batch(self.trajectory, self.individuals)
+        with tempfile.TemporaryDirectory() as cache_path:
+            parameters = MNISTOptimizeeParameters(n_hidden=10, seed=1, use_small_mnist=True,
+                                                  dataset_cache_path=cache_path)
+            optimizee = MNISTOptimizee(Trajectory(name='test'), parameters)
+            self.assertIsInstance(optimizee.data_images, np.memmap)
+            self.assertEqual(optimizee.simulate_batch(self.trajectory, self.individuals), expected)
+
+            # The pickled optimizee does not contain the dataset, which is opened again from the cache
+            dumped = pickle.dumps(optimizee)
+            self.assertLess(len(dumped), optimizee.data_images.nbytes)
+            optimizee = pickle.loads(dumped)
+            self.assertIsInstance(optimizee.data_images, np.memmap)
+            self.assertEqual(optimizee.simulate_batch(self.trajectory, self.individuals), expected)
+
+
+def suite():
+    suite = unittest.makeSuite(MNISTOptimizeeTestCase, 'test')
+    return suite
+
+
+def run():
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,184 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+import numpy as np
+from l2l import ParameterCodec
+from l2l.utils.checkpoint import load_trajectory
+from l2l.utils.experiment import Experiment
+from l2l.utils.noise_table import SharedNoiseTable, NoiseTablePopulation
+from l2l.utils.population import Population
+from l2l.utils.trajectory import Trajectory
+from l2l.optimizees.functions.benchmarked_functions import BenchmarkedFunctions
+from l2l.optimizees.functions.optimizee import FunctionGeneratorOptimizee
+from l2l.optimizers.evolutionstrategies import EvolutionStrategiesParameters, EvolutionStrategiesOptimizer
+from l2l.optimizers.naturalevolutionstrategies import NaturalEvolutionStrategiesParameters, \
+    NaturalEvolutionStrategiesOptimizer
+
+
+class NoiseTableTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.table = SharedNoiseTable(self.directory.name, 10000, seed=1)
+        self.codec = ParameterCodec.from_individual({'coords': np.zeros(40), 'scale': 0.})
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_table(self):
+        self.assertEqual(self.table.noise.shape, (10000,))
+        self.assertEqual(self.table.noise.dtype, np.float32)
+        self.assertAlmostEqual(float(np.std(self.table.noise)), 1., delta=0.05)
+        # The table is created once and shared by every table with the same seed and size
+        self.assertEqual(os.listdir(self.directory.name), [os.path.basename(self.table.filename)])
+        table = SharedNoiseTable(self.directory.name, 10000, seed=1)
+        np.testing.assert_array_equal(table.noise, self.table.noise)
+        self.assertFalse(np.array_equal(SharedNoiseTable(self.directory.name, 10000, seed=2).noise,
+                                        self.table.noise))
+        np.testing.assert_array_equal(pickle.loads(pickle.dumps(self.table)).get(5, 3), self.table.noise[5:8])
+
+        offsets = self.table.sample_offsets(np.random.RandomState(0), 1000, 41)
+        self.assertTrue(np.all((offsets >= 0) & (offsets <= 10000 - 41)))
+        with self.assertRaises(ValueError):
+            self.table.sample_offsets(np.random.RandomState(0), 1, 10001)
+
+    def test_population(self):
+        center = np.arange(41.)
+        population = NoiseTablePopulation.sample(self.table, 0, center, 0.1, 5, True, np.random.RandomState(0),
+                                                 self.codec, include_center=True)
+        self.assertEqual(len(population), 11)
+        noise = population.noise()
+        np.testing.assert_array_equal(noise[5:10], -noise[:5])
+        np.testing.assert_array_equal(noise[10], np.zeros(41))
+        values = population.values
+        np.testing.assert_allclose(values, center + 0.1 * noise)
+
+        individuals = population.individuals(3)
+        self.assertEqual([ind.ind_idx for ind in individuals], list(range(11)))
+        for ind, ind_values in zip(individuals, values):
+            # The individuals are reconstructed from the table after being sent to another process
+            ind = pickle.loads(pickle.dumps(ind))
+            self.assertEqual(ind.generation, 3)
+            np.testing.assert_allclose(ind.coords, ind_values[:40])
+            self.assertAlmostEqual(ind.scale, ind_values[40])
+            np.testing.assert_allclose(ind.todict_unprefixed()['coords'], population[ind.ind_idx]['coords'])
+
+        # Unlike a Population, the size of a pickled individual does not depend on its number of parameters
+        dense_individual = Population(values, self.codec).individuals(3)[0]
+        self.assertLess(len(pickle.dumps(individuals[0])), len(pickle.dumps(dense_individual)))
+        self.assertIsNone(individuals[0].__getstate__()['_params'])
+
+        self.table.remove_base(0)
+        self.assertEqual(os.listdir(self.table.base_path), [])
+        self.table.store_base(1, center, 0.1)
+        self.table.remove_bases()
+        self.assertEqual(os.listdir(self.directory.name), [os.path.basename(self.table.filename)])
+
+
+class NoiseTableOptimizerTestCase(unittest.TestCase):
+
+    def run_optimizer(self, optimizer_class, optimizer_parameters, **experiment_kwargs):
+        bench_functs = BenchmarkedFunctions()
+        (benchmark_name, benchmark_function), benchmark_parameters = \
+            bench_functs.get_function_by_index(14, noise=False)
+
+        experiment = Experiment(root_dir_path='../../results')
+        trajectory, _ = experiment.prepare_experiment(name='L2L', log_stdout=True, jube_parameter={},
+                                                      **experiment_kwargs)
+        optimizee = FunctionGeneratorOptimizee(trajectory, benchmark_function, seed=1)
+        optimizer = optimizer_class(trajectory, optimizee_create_individual=optimizee.create_individual,
+                                    optimizee_fitness_weights=(-0.1,),
+                                    parameters=optimizer_parameters)
+        experiment.run_experiment(optimizee=optimizee, optimizer=optimizer,
+                                  optimizer_parameters=optimizer_parameters)
+        experiment.end_experiment(optimizer)
+        self.per_gen_path = experiment.env.per_gen_path
+        return trajectory, optimizer
+
+    def assert_stored_individuals(self, trajectory):
+        # The individuals of every stored generation can still be reconstructed after the run
+        for generation in range(3):
+            stored = load_trajectory(self.per_gen_path, generation)
+            np.testing.assert_allclose([ind.coords for ind in stored.individuals[generation]],
+                                       [ind.coords for ind in trajectory.individuals[generation]])
+
+    def fitness_history(self, trajectory):
+        return [trajectory.results.generation_params['generation_{}'.format(g)].algorithm_params['best_fitness_in_run']
+                for g in range(3)]
+
+    def assert_bases(self, directory, optimizer, n_versions):
+        # Only the noise is in the shared directory, the versions of the search distribution are kept with the
+        # experiment, and replaced by the next run of the same experiment
+        self.assertEqual(os.listdir(directory), [os.path.basename(optimizer.noise_table.filename)])
+        self.assertEqual(len(os.listdir(optimizer.noise_table.base_path)), n_versions)
+
+    def test_es(self):
+        with tempfile.TemporaryDirectory() as directory:
+            fitnesses = []
+            for backend in ('serial', 'pool'):
+                optimizer_parameters = EvolutionStrategiesParameters(
+                    learning_rate=0.1, noise_std=0.1, mirrored_sampling_enabled=True, fitness_shaping_enabled=True,
+                    pop_size=4, n_iteration=3, stop_criterion=np.inf, seed=1, noise_table_size=10000,
+                    noise_table_path=directory)
+                trajectory, optimizer = self.run_optimizer(EvolutionStrategiesOptimizer, optimizer_parameters,
+                                                           backend=backend, n_workers=2)
+                self.assertEqual(len(trajectory.individuals[2]), 9)
+                # The stored individuals are the same as the evaluated ones
+                np.testing.assert_allclose([ind.coords for ind in trajectory.individuals[2]], optimizer.eval_pop_arr)
+                fitnesses.append(self.fitness_history(trajectory))
+                self.assert_stored_individuals(trajectory)
+                self.assert_bases(directory, optimizer, 3)
+            np.testing.assert_allclose(fitnesses[0], fitnesses[1])
+
+    def test_nes(self):
+        with tempfile.TemporaryDirectory() as directory:
+            optimizer_parameters = NaturalEvolutionStrategiesParameters(
+                learning_rate_mu=0.1, learning_rate_sigma=0.1, mu=np.zeros(2), sigma=np.ones(2),
+                mirrored_sampling_enabled=True, fitness_shaping_enabled=True, pop_size=4, n_iteration=3,
+                stop_criterion=np.inf, seed=1, noise_table_size=10000, noise_table_path=directory)
+            trajectory, optimizer = self.run_optimizer(NaturalEvolutionStrategiesOptimizer, optimizer_parameters,
+                                                       backend='pool', n_workers=2)
+            self.assertEqual(len(trajectory.individuals[2]), 8)
+            np.testing.assert_allclose([ind.coords for ind in trajectory.individuals[2]], optimizer.eval_pop_arr)
+            self.assert_stored_individuals(trajectory)
+            self.assert_bases(directory, optimizer, 3)
+
+    def test_without_experiment(self):
+        # Nothing refers to the versions of the search distribution after a run without experiment
+        bench_functs = BenchmarkedFunctions()
+        (benchmark_name, benchmark_function), benchmark_parameters = \
+            bench_functs.get_function_by_index(14, noise=False)
+        trajectory = Trajectory(name='test')
+        optimizee = FunctionGeneratorOptimizee(trajectory, benchmark_function, seed=1)
+        with tempfile.TemporaryDirectory() as directory:
+            optimizer_parameters = EvolutionStrategiesParameters(
+                learning_rate=0.1, noise_std=0.1, mirrored_sampling_enabled=True, fitness_shaping_enabled=True,
+                pop_size=4, n_iteration=3, stop_criterion=np.inf, seed=1, noise_table_size=10000,
+                noise_table_path=directory)
+            optimizer = EvolutionStrategiesOptimizer(trajectory,
+                                                     optimizee_create_individual=optimizee.create_individual,
+                                                     optimizee_fitness_weights=(-0.1,),
+                                                     parameters=optimizer_parameters)
+            self.assertEqual(os.path.dirname(optimizer.noise_table.base_path), directory)
+            self.assertEqual(len(os.listdir(optimizer.noise_table.base_path)), 1)
+            optimizer.best_individual_in_run = optimizer.current_individual_arr
+            optimizer.end(trajectory)
+            self.assertEqual(os.listdir(directory), [os.path.basename(optimizer.noise_table.filename)])
+
+
+def suite():
+    suite = unittest.TestSuite()
+    suite.addTest(unittest.makeSuite(NoiseTableTestCase, 'test'))
+    suite.addTest(unittest.makeSuite(NoiseTableOptimizerTestCase, 'test'))
+    return suite
+
+
+def run():
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
+
+
+if __name__ == "__main__":
+    run()
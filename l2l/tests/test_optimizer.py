@@ -10,17 +10,32 @@ from collections import namedtuple
 class OptimizerTestCase(unittest.TestCase):
 
     def setUp(self):
-        # Test function
-        function_id = 14
+        self.prepare()
+
+    def prepare(self, function=14, noise=True, **experiment_kwargs):
+        """
+        Prepares the experiment, the trajectory and the optimizee of a test. Tests which need another benchmark
+        function or backend than the default ones prepare them again, which replaces those of setUp
+        :param function: Index or name of the benchmark function
+        :param noise: Whether the benchmark function is noisy
+        :param experiment_kwargs: Further arguments of prepare_experiment, e.g. backend='serial' for tests which
+            evaluate many individuals
+        """
         bench_functs = BenchmarkedFunctions()
-        (benchmark_name, benchmark_function), benchmark_parameters = \
-            bench_functs.get_function_by_index(function_id, noise=True)
+        if isinstance(function, str):
+            (benchmark_name, benchmark_function), benchmark_parameters = \
+                bench_functs.get_function_by_name(function, noise=noise)
+        else:
+            (benchmark_name, benchmark_function), benchmark_parameters = \
+                bench_functs.get_function_by_index(function, noise=noise)
+        self.benchmark_function = benchmark_function
 
         self.experiment = Experiment(root_dir_path='../../results')
         jube_params = {}
         self.trajectory, all_jube_params = self.experiment.prepare_experiment(name='L2L',
                                                                               log_stdout=True,
-                                                                              jube_parameter=jube_params)
+                                                                              jube_parameter=jube_params,
+                                                                              **experiment_kwargs)
         self.optimizee_parameters = namedtuple('OptimizeeParameters', [])
         self.optimizee = FunctionGeneratorOptimizee(
             self.trajectory, benchmark_function, seed=1)
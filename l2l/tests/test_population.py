@@ -0,0 +1,97 @@
+import pickle
+import unittest
+
+import numpy as np
+from l2l import dict_to_list, list_to_dict, ParameterCodec
+from l2l.optimizers.optimizer import Optimizer
+from l2l.utils.population import Population, stack_parameter
+from l2l.utils.trajectory import Trajectory
+
+
+class PopulationTestCase(unittest.TestCase):
+
+    def setUp(self):
+        random_state = np.random.RandomState(0)
+        self.individual_dicts = [{'coords': random_state.rand(3), 'scale': random_state.rand()} for _ in range(4)]
+        self.population = Population.from_dicts(self.individual_dicts)
+
+    def assert_same_individuals(self, individual_dicts, expected_dicts):
+        self.assertEqual(len(individual_dicts), len(expected_dicts))
+        for ind, expected in zip(individual_dicts, expected_dicts):
+            self.assertEqual(sorted(ind.keys()), sorted(expected.keys()))
+            for key in expected:
+                np.testing.assert_array_equal(ind[key], expected[key])
+
+    def test_codec(self):
+        codec = ParameterCodec.from_individual(self.individual_dicts[0])
+        for ind in self.individual_dicts:
+            values, dict_spec = dict_to_list(ind, get_dict_spec=True)
+            np.testing.assert_array_equal(codec.encode(ind), values)
+            self.assert_same_individuals([codec.decode(values)], [list_to_dict(values, dict_spec)])
+
+        values = codec.encode_population(self.individual_dicts)
+        np.testing.assert_array_equal(values, [dict_to_list(ind) for ind in self.individual_dicts])
+        decoded = codec.decode_population(values)
+        self.assert_same_individuals(decoded, self.individual_dicts)
+        self.assertTrue(np.shares_memory(decoded[2]['coords'], values))
+        self.assertEqual(codec.encode_population([]).shape, (0, 4))
+
+    def test_conversion(self):
+        self.assertEqual(self.population.values.shape, (4, 4))
+        self.assert_same_individuals(self.population.to_dicts(), self.individual_dicts)
+        np.testing.assert_array_equal(self.population.parameter('coords'),
+                                      [ind['coords'] for ind in self.individual_dicts])
+        # The parameters are views into the population
+        self.assertTrue(np.shares_memory(self.population[1]['coords'], self.population.values))
+
+        bounded = self.population.bounded(lambda ind: {'coords': np.clip(ind['coords'], 0.2, 0.8),
+                                                       'scale': ind['scale']})
+        np.testing.assert_array_equal(bounded.parameter('coords'), np.clip(self.population.parameter('coords'),
+                                                                           0.2, 0.8))
+
+        with self.assertRaises(ValueError):
+            Population(np.zeros((4, 3)), self.population.dict_spec)
+
+    def test_trajectory_expansion(self):
+        # The trajectory holds the same individuals whether the optimizer expands it with a list of Individual-Dicts
+        # or with a population
+        trajectories = []
+        for eval_pop in (self.individual_dicts, self.population):
+            trajectory = Trajectory(name='test')
+            optimizer = Optimizer(trajectory, optimizee_create_individual=None, optimizee_fitness_weights=(1.,),
+                                  optimizee_bounding_func=None, parameters=None)
+            optimizer.g = 0
+            optimizer.eval_pop = eval_pop
+            optimizer._expand_trajectory(trajectory)
+            trajectories.append(trajectory)
+
+        expected_individuals, individuals = (traj.individuals[0] for traj in trajectories)
+        self.assertEqual(len(individuals), len(expected_individuals))
+        for ind, expected in zip(individuals, expected_individuals):
+            self.assertEqual((ind.generation, ind.ind_idx), (expected.generation, expected.ind_idx))
+            self.assert_same_individuals([ind.params], [expected.params])
+        self.assertEqual(individuals[-1].ind_idx, 3)
+        self.assertEqual([ind.ind_idx for ind in individuals[1:3]], [1, 2])
+
+        np.testing.assert_array_equal(stack_parameter(individuals, 'coords'),
+                                      stack_parameter(expected_individuals, 'coords'))
+        self.assertTrue(np.shares_memory(stack_parameter(individuals, 'coords'), self.population.values))
+
+        # An individual sent to another process only carries its own parameters
+        individual = pickle.loads(pickle.dumps(individuals[2]))
+        np.testing.assert_array_equal(individual.coords, self.individual_dicts[2]['coords'])
+        self.assertIsNone(individual.coords.base)
+
+
+def suite():
+    suite = unittest.makeSuite(PopulationTestCase, 'test')
+    return suite
+
+
+def run():
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
+
+
+if __name__ == "__main__":
+    run()
@@ -50,6 +50,42 @@ class PTOptimizerTestCase(OptimizerTestCase):
         except Exception as e:
             self.fail(e.__name__)
 
+    def test_many_replicas(self):
+        self.prepare('Rastrigin2d', noise=False, backend='serial')
+
+        n_parallel_runs = 60
+        cooling_schedules = [AvailableCoolingSchedules.EXPONENTIAL, AvailableCoolingSchedules.LINEAR_MULTIPLICATIVE,
+                             AvailableCoolingSchedules.TRIGONOMETRIC_ADDAPTIVE] * (n_parallel_runs // 3)
+        temperature_bounds = np.column_stack((np.linspace(1., 0.1, n_parallel_runs), np.zeros(n_parallel_runs)))
+        decay_parameters = np.full(n_parallel_runs, 0.9)
+        optimizer_parameters = ParallelTemperingParameters(n_parallel_runs=n_parallel_runs, noisy_step=.03,
+                                                           n_iteration=3, stop_criterion=np.inf, seed=1,
+                                                           cooling_schedules=cooling_schedules,
+                                                           temperature_bounds=temperature_bounds,
+                                                           decay_parameters=decay_parameters)
+        optimizer = ParallelTemperingOptimizer(self.trajectory,
+                                               optimizee_create_individual=self.optimizee.create_individual,
+                                               optimizee_fitness_weights=(-1,),
+                                               parameters=optimizer_parameters,
+                                               optimizee_bounding_func=self.optimizee.bounding_func)
+        self.experiment.run_experiment(optimizee=self.optimizee, optimizer=optimizer,
+                                       optimizer_parameters=optimizer_parameters)
+        self.assertEqual(len(self.trajectory.individuals[2]), n_parallel_runs)
+
+        # Every schedule is cooled according to its own type
+        k = 3
+        np.testing.assert_allclose(optimizer.T_all[0::3], temperature_bounds[0::3, 0] * 0.9 ** k)
+        np.testing.assert_allclose(optimizer.T_all[1::3], temperature_bounds[1::3, 0] / (1 + 0.9 * k))
+        np.testing.assert_allclose(optimizer.T_all[2::3],
+                                   temperature_bounds[2::3, 0] * (1 + np.cos(k * 3.1415 / 3)) / 2)
+        # The runs exchanged their schedules, which are still assigned to one run each
+        self.assertEqual(sorted(optimizer.parallel_indices), list(range(n_parallel_runs)))
+        self.assertTrue(np.any(optimizer.parallel_indices != np.arange(n_parallel_runs)))
+        self.assertEqual(optimizer.current_individual_list.shape, (n_parallel_runs, 2))
+        self.assertTrue(np.all(np.isfinite(optimizer.current_fitness_value_list)))
+        self.experiment.end_experiment(optimizer)
+
+
 def suite():
     suite = unittest.makeSuite(PTOptimizerTestCase, 'test')
     return suite
@@ -28,6 +28,37 @@ class SAOptimizerTestCase(OptimizerTestCase):
         except Exception as e:
             self.fail(e.__name__)
 
+    def test_many_chains(self):
+        self.prepare('Rastrigin2d', noise=False, backend='serial')
+
+        n_parallel_runs = 200
+        optimizer_parameters = SimulatedAnnealingParameters(n_parallel_runs=n_parallel_runs, noisy_step=.03,
+                                                            temp_decay=.99, n_iteration=3, stop_criterion=np.inf,
+                                                            seed=1,
+                                                            cooling_schedule=AvailableCoolingSchedules.EXPONENTIAL)
+        optimizer = SimulatedAnnealingOptimizer(self.trajectory,
+                                                optimizee_create_individual=self.optimizee.create_individual,
+                                                optimizee_fitness_weights=(-1,),
+                                                parameters=optimizer_parameters,
+                                                optimizee_bounding_func=self.optimizee.bounding_func)
+        self.experiment.run_experiment(optimizee=self.optimizee, optimizer=optimizer,
+                                       optimizer_parameters=optimizer_parameters)
+        self.assertEqual(len(self.trajectory.individuals[2]), n_parallel_runs)
+        self.assertEqual(optimizer.current_individual_list.shape, (n_parallel_runs, 2))
+        self.assertTrue(np.all(np.isfinite(optimizer.current_fitness_value_list)))
+
+        # Each chain holds one of the individuals it evaluated, with the fitness of that individual
+        evaluated = {}
+        for generation in range(3):
+            for ind in self.trajectory.individuals[generation]:
+                evaluated.setdefault(ind.ind_idx, []).append(ind.coords)
+        fitnesses = -self.benchmark_function.cost_function_batch(optimizer.current_individual_list)
+        np.testing.assert_allclose(optimizer.current_fitness_value_list, fitnesses)
+        for ind_idx, coords in enumerate(optimizer.current_individual_list):
+            self.assertTrue(any(np.allclose(coords, c) for c in evaluated[ind_idx]))
+        self.experiment.end_experiment(optimizer)
+
+
 def suite():
     suite = unittest.makeSuite(SAOptimizerTestCase, 'test')
     return suite
@@ -0,0 +1,60 @@
+import time
+import unittest
+
+import numpy as np
+from l2l.optimizees.synthetic import SyntheticOptimizee, SyntheticOptimizeeParameters
+from l2l.utils.individual import Individual
+from l2l.utils.trajectory import Trajectory
+
+
+class SyntheticOptimizeeTestCase(unittest.TestCase):
+
+    def create_optimizee(self, **parameters):
+        self.trajectory = Trajectory(name='test')
+        return SyntheticOptimizee(self.trajectory, SyntheticOptimizeeParameters(dims=3, seed=1, **parameters))
+
+    def simulate(self, optimizee, generation, ind_idx, coords):
+        self.trajectory.individual = Individual(generation, ind_idx, [{'individual.coords': coords}])
+        return optimizee.simulate(self.trajectory)
+
+    def test_fitness(self):
+        optimizee = self.create_optimizee()
+        coords = optimizee.create_individual()['coords']
+        self.assertEqual(coords.shape, (3,))
+        self.assertTrue(np.all(np.abs(coords) <= 1))
+        self.assertEqual(self.simulate(optimizee, 0, 0, np.array([1., 2., 3.])), (14., ))
+
+    def test_fixed_latency(self):
+        optimizee = self.create_optimizee(latency=0.2, memory=2 ** 20)
+        start = time.time()
+        self.simulate(optimizee, 0, 0, np.zeros(3))
+        self.assertGreaterEqual(time.time() - start, 0.2)
+
+    def test_latency_distributions(self):
+        for distribution in ['lognormal', 'pareto']:
+            optimizee = self.create_optimizee(latency=1., latency_distribution=distribution, latency_shape=1.5,
+                                              max_latency=50.)
+            latencies = [optimizee.get_latency(0, ind_idx) for ind_idx in range(1000)]
+            # The latencies are drawn anew for every individual, but the same for the same individual
+            self.assertEqual(latencies, [optimizee.get_latency(0, ind_idx) for ind_idx in range(1000)])
+            self.assertNotEqual(latencies, [optimizee.get_latency(1, ind_idx) for ind_idx in range(1000)])
+            self.assertLessEqual(max(latencies), 50.)
+            self.assertGreater(max(latencies), 5.)
+        self.assertGreaterEqual(min(latencies), 1.)
+
+        with self.assertRaises(ValueError):
+            self.create_optimizee(latency_distribution='uniform')
+
+
+def suite():
+    suite = unittest.makeSuite(SyntheticOptimizeeTestCase, 'test')
+    return suite
+
+
+def run():
+    runner = unittest.TextTestRunner(verbosity=2)
+    runner.run(suite())
+
+
+if __name__ == "__main__":
+    run()
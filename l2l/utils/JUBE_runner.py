@@ -4,6 +4,10 @@ import pickle
 import time
 import logging
 
+from l2l import timed
+
+from l2l.utils.evaluation_scheduler import EvaluationError, EvaluationTimeout, get_penalty_fitness
+
 logger = logging.getLogger("JUBERunner")
 
 
@@ -44,6 +48,9 @@ class JUBERunner():
             'tasks_per_job': args.get('tasks_per_job', "1"),
             'cpu_pp': args.get('cpu_pp', "1"),
         }
+        # Bounds in seconds of the adaptive polling interval used to wait for the ready files
+        self.min_poll_interval = float(args.get('min_poll_interval', 0.05))
+        self.max_poll_interval = float(args.get('max_poll_interval', 10))
         self.scheduler = "None"
         if 'scheduler' in args.keys():
             self.scheduler = args.get('scheduler'),
@@ -61,18 +68,24 @@ class JUBERunner():
             os.makedirs(self.work_paths[dir], exist_ok=True)
 
         self.zeepath = os.path.join(self.path, "optimizee.bin")
+        # Failed evaluations of the last run, as EvaluationFailure records
+        self.failures = []
 
 
-    def write_pop_for_jube(self, trajectory, generation):
+    def write_pop_for_jube(self, trajectory, generation, individuals=None, attempt=0):
         """
         Writes an XML file which contains the parameters for JUBE
         :param trajectory: A trajectory object holding the parameters to generate the JUBE XML file for each generation
         :param generation: Id of the current generation
+        :param individuals: The individuals to run. Defaults to all the individuals of the generation
+        :param attempt: Number of the attempt, 0 for the first run of the generation and 1 for the first retry of the
+            individuals which failed
         """
         self.trajectory = trajectory
-        eval_pop = trajectory.individuals[generation]
+        eval_pop = trajectory.individuals[generation] if individuals is None else individuals
         self.generation = generation
-        fname = "_jube_%s.xml" % str(self.generation)
+        self.run_name = self._get_run_name(generation, attempt)
+        fname = "_jube_%s.xml" % self.run_name
         self.filename = os.path.join(self.work_paths['jube_xml'], fname)
 
         f = open(self.filename, 'w')
@@ -130,11 +143,11 @@ class JUBERunner():
         if self.scheduler != 'None':
             f.write('    <use>files,sub_job</use>\n')
             f.write('    <do done_file="' +
-                    os.path.join(self.work_paths['ready_files'], 'ready_w_%s' % self.generation) +
+                    os.path.join(self.work_paths['ready_files'], 'ready_w_%s' % self.run_name) +
                     '">$submit_cmd $job_file </do> <!-- shell command -->\n')
         else:
             f.write('    <do done_file="' +
-                    os.path.join(self.work_paths['ready_files'], 'ready_w_%s' % self.generation) +
+                    os.path.join(self.work_paths['ready_files'], 'ready_w_%s' % self.run_name) +
                     '">$exec $index ' + str(self.generation) +
                     ' -n $tasks_per_job </do> <!-- shell command -->\n')
 
@@ -146,6 +159,13 @@ class JUBERunner():
         f.close()
         logger.info('Generated JUBE XML file for generation: ' + str(self.generation))
 
+    @staticmethod
+    def _get_run_name(generation, attempt):
+        """
+        Returns the name of the JUBE run of the given attempt of a generation
+        """
+        return str(generation) if attempt == 0 else "%s_retry%d" % (generation, attempt)
+
     def write_scheduler_file(self, f):
         """
         Writes the scheduler specific part of the JUBE XML specification file
@@ -173,107 +193,223 @@ class JUBERunner():
     def collect_results_from_run(self, generation, individuals):
         """
         Collects the results generated by each individual in the generation. Results are, for the moment, stored
-        in individual binary files.
+        in individual binary files. A failed individual does not prevent the results of the others from being
+        collected.
         :param generation: generation id
         :param individuals: list of individuals which were executed in this generation
-        :return results: a list containing objects produced as results of the execution of each individual
+        :return results: a tuple (results, errors) with a list of tuples (ind_idx, result) for the individuals whose
+            result could be read, and a list of :class:`~l2l.utils.evaluation_scheduler.EvaluationError` for the others
         """
         results = []
+        errors = []
         for ind in individuals:
             indfname = "results_%s_%s.bin" % (ind.ind_idx, generation)
-            handle = open(os.path.join(self.work_paths["results"], indfname), "rb")
-            results.append((ind.ind_idx, pickle.load(handle)))
-            handle.close()
-
-        return results
-
-    def run(self, trajectory, generation):
+            errfname = "error_%s_%s.txt" % (ind.ind_idx, generation)
+            respath = os.path.join(self.work_paths["results"], indfname)
+            errpath = os.path.join(self.work_paths["results"], errfname)
+            if os.path.isfile(errpath):
+                with open(errpath) as handle:
+                    errors.append(EvaluationError(ind, 'error', handle.read()))
+                continue
+            try:
+                with open(respath, "rb") as handle:
+                    results.append((ind.ind_idx, pickle.load(handle)))
+            except FileNotFoundError:
+                errors.append(EvaluationError(ind, 'missing', "No result file {}".format(respath)))
+            except Exception as e:
+                errors.append(EvaluationError(ind, 'corrupt', "Could not read {}: {!r}".format(respath, e)))
+
+        return results, errors
+
+    def run(self, trajectory, generation, timeout=None, penalty_fitness=None, max_retries=0):
         """
         Takes care of running the generation by preparing the JUBE configuration files and, waiting for the execution
         by JUBE and gathering the results.
+        The individuals which fail are run again in a new JUBE run, up to max_retries times. The failures are recorded
+        in :attr:`failures`.
         This is the main function of the JUBE_runner
         :param trajectory: trajectory object storing individual parameters for each generation
         :param generation: id of the generation
+        :param timeout: Time in seconds to wait for the ready files once JUBE has been started, or None to wait until
+            all of them are present. The individuals which are not ready then are not run again
+        :param penalty_fitness: The fitness of the individuals which are not ready after the timeout or which still fail
+            after the retries, or a function taking the individual and returning its fitness, see
+            :func:`~l2l.utils.evaluation_scheduler.get_penalty_fitness`
+        :param max_retries: Number of times the failed individuals are run again
         :return results: a list containing objects produced as results of the execution of each individual
+
+        The time spent in the phases 'jube_files' (writing the run file and the XML files of the retries),
+        'trajectory_dump', 'evaluation' (running JUBE and waiting for the ready files), 'dispatch' (running JUBE, part
+        of 'evaluation') and 'result_collection' is added to the `phase_timings` of the trajectory.
         """
-        args = []
-        args.append("run")
-        args.append(self.filename)
         self.done = False
-        ready_files = []
+        timings = trajectory.phase_timings
         path_ready = os.path.join(self.work_paths["ready_files"],
                                   "ready_%d_" % generation)
-        self.prepare_run_file(path_ready)
-
-        # Dump all trajectories for each optimizee run in the generation
-        for ind in self.trajectory.individuals[generation]:
-            trajectory.individual = ind
-            trajfname = "trajectory_%s_%s.bin" % (ind.ind_idx, generation)
-            handle = open(os.path.join(self.work_paths["trajectories"], trajfname),
-                          "wb")
-            pickle.dump(trajectory, handle, pickle.HIGHEST_PROTOCOL)
+        with timed(None, 'jube_files', timings):
+            self.prepare_run_file(path_ready)
+
+        # Dump a single file for the whole generation which holds a lean trajectory, i.e. without the history of the
+        # run, and the individuals. Each optimizee run picks its own individual from it
+        individuals = self.trajectory.individuals[generation]
+        trajfname = "trajectory_%s.bin" % generation
+        with timed(None, 'trajectory_dump', timings):
+            handle = open(os.path.join(self.work_paths["trajectories"], trajfname), "wb")
+            pickle.dump((trajectory.lean_copy(), {ind.ind_idx: ind for ind in individuals}),
+                        handle, pickle.HIGHEST_PROTOCOL)
             handle.close()
-            ready_files.append(path_ready + str(ind.ind_idx))
+        for ind in individuals:
+            # The trajectory is left pointing to the last individual, as some optimizers rely on it
+            trajectory.individual = ind
 
-        # Call the main function from JUBE
-        logger.info("JUBE running generation: " + str(self.generation))
-        main(args)
+        fitnesses = {}
+        failed = []
+        pending = list(individuals)
+        for attempt in range(max_retries + 1):
+            # Outputs left by an earlier attempt or by an earlier run with the same name would otherwise be taken for
+            # the ones of this attempt
+            self.remove_outputs(generation, pending, path_ready)
+            if attempt > 0:
+                logger.warning("Running {} failed individuals of generation {} again".format(len(pending), generation))
+                with timed(None, 'jube_files', timings):
+                    self.write_pop_for_jube(trajectory, generation, pending, attempt)
+            ready_files = [path_ready + str(ind.ind_idx) for ind in pending]
+
+            # Call the main function from JUBE
+            logger.info("JUBE running generation: " + str(self.generation))
+            with timed(None, 'evaluation', timings):
+                with timed(None, 'dispatch', timings):
+                    main(["run", self.filename])
+
+                # Wait for ready files to be written
+                self.wait_for_ready_files(ready_files, timeout)
+
+            # Touch done generation
+            logger.info("JUBE finished generation: " + str(self.generation))
+            fname = "ready_w_%s" % self.run_name
+            f = open(os.path.join(self.work_paths["ready_files"], fname), "w")
+            f.close()
+
+            ready = [ind for ind, ready_file in zip(pending, ready_files) if os.path.isfile(ready_file)]
+            with timed(None, 'result_collection', timings):
+                results, errors = self.collect_results_from_run(generation, ready)
+            fitnesses.update(results)
+            # The individuals which did not finish in time may still be running, so they are not run again
+            timed_out = [EvaluationTimeout(ind, timeout) for ind in pending if ind not in ready]
+            for error in timed_out + errors:
+                self.failures.append(error.to_failure(attempt))
+            failed += timed_out
+            pending = [error.individual for error in errors]
+            if not pending:
+                break
+        else:
+            failed += errors
 
-        # Wait for ready files to be written
-        while not self.is_done(ready_files):
-            time.sleep(20)
+        for error in failed:
+            fitnesses[error.individual.ind_idx] = get_penalty_fitness(penalty_fitness, error)
+        self.done = True
+        return [(ind.ind_idx, fitnesses[ind.ind_idx]) for ind in individuals]
 
-        # Touch done generation
-        logger.info("JUBE finished generation: " + str(self.generation))
-        fname = "ready_w_%s" % generation
-        f = open(os.path.join(self.work_paths["ready_files"], fname), "w")
-        f.close()
+    def remove_outputs(self, generation, individuals, path_ready):
+        """
+        Removes the ready, result and error files of the individuals, so that they can be run (again)
+        :param generation: generation id
+        :param individuals: list of the individuals
+        :param path_ready: path of the ready files, without the index of the individual
+        """
+        for ind in individuals:
+            for path in (path_ready + str(ind.ind_idx),
+                         os.path.join(self.work_paths["results"], "results_%s_%s.bin" % (ind.ind_idx, generation)),
+                         os.path.join(self.work_paths["results"], "error_%s_%s.txt" % (ind.ind_idx, generation))):
+                if os.path.isfile(path):
+                    os.remove(path)
 
-        self.done = True
-        results = self.collect_results_from_run(generation, self.trajectory.individuals[generation])
-        return results
+    def wait_for_ready_files(self, files, timeout=None):
+        """
+        Waits until all the ready files are present. The directories are polled with an interval that starts at
+        min_poll_interval and doubles after every unsuccessful check up to max_poll_interval, so that short
+        generations are picked up almost immediately while long ones do not keep the file system busy.
+        :param files: list of ready files to wait for
+        :param timeout: Maximal time to wait in seconds, or None to wait until all the files are present
+        :return true if all files are present, false if the timeout expired before
+        """
+        interval = self.min_poll_interval
+        deadline = None if timeout is None else time.time() + timeout
+        while not self.is_done(files):
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    logger.warning("Timeout expired while waiting for the ready files of generation {}".format(
+                        self.generation))
+                    return False
+                interval = min(interval, remaining)
+            time.sleep(interval)
+            interval = min(2 * interval, self.max_poll_interval)
+        return True
 
     def is_done(self, files):
         """
         Identifies if all files marking the end of the execution of individuals in a generation are present or not.
+        Each directory containing ready files is listed only once instead of checking every file on its own.
         :param files: list of ready files to check
         :return true if all files are present, false otherwise
         """
-        done = True
+        files_per_dir = {}
         for f in files:
-            if not os.path.isfile(f):  # self.scheduler_config['ready_file']
-                done = False
-        return done
+            files_per_dir.setdefault(os.path.dirname(f), set()).add(os.path.basename(f))
+        for dir_name, file_names in files_per_dir.items():
+            try:
+                with os.scandir(dir_name) as entries:
+                    present = {entry.name for entry in entries if entry.is_file()}
+            except FileNotFoundError:
+                return False
+            if not file_names <= present:
+                return False
+        return True
 
     def prepare_run_file(self, path_ready):
         """
-        Writes a python run file which takes care of loading the optimizee from a binary file, the trajectory object
-        of each individual. Then executes the 'simulate' function of the optimizee using the trajectory and
-        writes the results in a binary file.
+        Writes a python run file which takes care of loading the optimizee and the lean trajectory of the generation
+        from binary files and of setting the individual to run in the trajectory. Then executes the 'simulate' function of the optimizee using the trajectory and
+        writes the results in a binary file. If the simulation fails, the traceback is written in an error file
+        instead. The ready file is written in both cases.
         :param path_ready: path to store the ready files
         :return true if all files are present, false otherwise
         """
         trajpath = os.path.join(self.work_paths["trajectories"],
-                                'trajectory_" + str(idx) + "_" + str(iteration) + ".bin')
+                                'trajectory_" + str(iteration) + ".bin')
         respath = os.path.join(self.work_paths['results'],
                                'results_" + str(idx) + "_" + str(iteration) + ".bin')
+        errpath = os.path.join(self.work_paths['results'],
+                               'error_" + str(idx) + "_" + str(iteration) + ".txt')
         f = open(os.path.join(self.work_paths["run_files"], "run_optimizee.py"), "w")
         f.write('import pickle\n' +
                 'import sys\n' +
+                'import traceback\n' +
                 'idx = sys.argv[1]\n' +
                 'iteration = sys.argv[2]\n' +
-                'handle_trajectory = open("' + trajpath + '", "rb")\n' +
-                'trajectory = pickle.load(handle_trajectory)\n' +
-                'handle_trajectory.close()\n' +
-                'handle_optimizee = open("' + self.zeepath + '", "rb")\n' +
-                'optimizee = pickle.load(handle_optimizee)\n' +
-                'handle_optimizee.close()\n\n' +
-                'res = optimizee.simulate(trajectory)\n\n' +
-                'handle_res = open("' + respath + '", "wb")\n' +
-                'pickle.dump(res, handle_res, pickle.HIGHEST_PROTOCOL)\n' +
-                'handle_res.close()\n\n' +
+                'exit_code = 0\n' +
+                'try:\n' +
+                '    handle_trajectory = open("' + trajpath + '", "rb")\n' +
+                '    trajectory, individuals = pickle.load(handle_trajectory)\n' +
+                '    handle_trajectory.close()\n' +
+                '    trajectory.individual = individuals[int(idx)]\n' +
+                '    handle_optimizee = open("' + self.zeepath + '", "rb")\n' +
+                '    optimizee = pickle.load(handle_optimizee)\n' +
+                '    handle_optimizee.close()\n\n' +
+                '    res = optimizee.simulate(trajectory)\n\n' +
+                '    handle_res = open("' + respath + '", "wb")\n' +
+                '    pickle.dump(res, handle_res, pickle.HIGHEST_PROTOCOL)\n' +
+                '    handle_res.close()\n' +
+                'except Exception:\n' +
+                '    # The error is reported to the JUBERunner, which runs the individual again if it has retries left\n' +
+                '    handle_err = open("' + errpath + '", "w")\n' +
+                '    handle_err.write(traceback.format_exc())\n' +
+                '    handle_err.close()\n' +
+                '    exit_code = 1\n\n' +
                 'handle_res = open("' + path_ready + '" + str(idx), "wb")\n' +
-                'handle_res.close()')
+                'handle_res.close()\n' +
+                'sys.exit(exit_code)\n')
         f.close()
 
 
@@ -0,0 +1,333 @@
+import glob
+import logging
+import os
+import pickle
+import re
+
+from l2l.utils.groups import ResultGroup
+
+logger = logging.getLogger("utils.Checkpoint")
+
+LOG_FILE_NAME = "trajectory_log.bin"
+RESUME_FILE_NAME = "resume_state.bin"
+SNAPSHOT_FILE_PATTERN = "Trajectory_final_{:020d}.bin"
+
+
+class TrajectoryCheckpointer:
+    """
+    Stores the trajectory incrementally while a run progresses. Every generation only the changes since the previous
+    one are appended to a log: the individuals and results of the generation, and the new or replaced entries of the
+    other result groups (e.g. generation_params) and of the top level results. Every snapshot_interval generations a
+    full snapshot of the trajectory is written in addition, so that loading does not have to replay the whole log.
+    Use :func:`load_trajectory` to reconstruct the trajectory of any stored generation. The log and the snapshots of an
+    earlier run in the same directory are replaced when a new run stores its first generation.
+
+    In addition, the state needed to resume an interrupted run is kept in a separate file, which is overwritten after
+    every generation, see :meth:`store_resume_state` and :func:`load_resume_state`. It only holds the changes of the
+    trajectory since the last record of the log, the trajectory itself is rebuilt from the log.
+    """
+
+    def __init__(self, path, snapshot_interval=10):
+        """
+        Initializes the checkpointer
+        :param path: Directory where the log and the snapshots are written
+        :param snapshot_interval: Number of generations between two full snapshots of the trajectory
+        """
+        self.path = path
+        self.snapshot_interval = snapshot_interval
+        self.log_path = os.path.join(path, LOG_FILE_NAME)
+        # References to the values which have already been logged, to find out what changed since then
+        self._logged_results = {}
+        self._logged_top_results = {}
+        self._log_started = False
+        self._resume_state_enabled = True
+
+    def store(self, trajectory, generation):
+        """
+        Appends the changes of the given generation to the log and writes a snapshot if it is due
+        :param trajectory: The trajectory to store
+        :param generation: Id of the generation which has just been run
+        """
+        record = {
+            'generation': generation,
+            'individuals': trajectory.individuals.get(generation, []),
+            'all_results': trajectory.results.all_results[generation],
+            'current_results': trajectory.current_results,
+            'results': _changed_items(_flatten_results(trajectory.results), self._logged_results),
+            'top_results': _changed_items(trajectory._results, self._logged_top_results),
+        }
+        if not self._log_started:
+            # The log of an earlier run in the same directory is overwritten by the first record, and its snapshots
+            # would otherwise be taken for the ones of this run
+            self._remove_snapshots()
+        with open(self.log_path, "ab" if self._log_started else "wb") as handle:
+            pickle.dump(record, handle, pickle.HIGHEST_PROTOCOL)
+        self._log_started = True
+
+        if generation % self.snapshot_interval == 0:
+            snapshot_path = os.path.join(self.path, SNAPSHOT_FILE_PATTERN.format(generation))
+            # Write to a temporary file first, so that a crash never leaves a truncated snapshot behind
+            with open(snapshot_path + ".tmp", "wb") as handle:
+                pickle.dump(trajectory, handle, pickle.HIGHEST_PROTOCOL)
+            os.replace(snapshot_path + ".tmp", snapshot_path)
+            logger.info("Stored snapshot of the trajectory for generation {}".format(generation))
+
+    def _remove_snapshots(self):
+        for fname in glob.glob(os.path.join(self.path, "Trajectory_final_*.bin")):
+            os.remove(fname)
+
+    def remove_resume_state(self):
+        """
+        Removes the resume state of an earlier run in the same directory, so that it is not resumed by mistake
+        """
+        resume_path = os.path.join(self.path, RESUME_FILE_NAME)
+        if os.path.exists(resume_path):
+            os.remove(resume_path)
+
+    def store_resume_state(self, generation, objects):
+        """
+        Stores the state of the trajectory, optimizer and optimizee so that the run can be continued from the given
+        generation. The objects are stored together, so that references between them are restored on loading.
+        Of the trajectory, only its parameters, the individuals of the given generation and the results which changed
+        since the last record of the log are stored, so that the size of the state does not grow with the length of
+        the run.
+        If the state cannot be pickled, a warning is logged and no resume state is stored for the rest of the run.
+        :param generation: Id of the next generation to be run. It is the generation after the last one stored with
+            :meth:`store`
+        :param objects: dictionary of the objects to store by name, e.g. trajectory, optimizer and optimizee
+        """
+        if not self._resume_state_enabled:
+            return
+        resume_path = os.path.join(self.path, RESUME_FILE_NAME)
+        states = {name: _get_state(obj) for name, obj in objects.items() if name != 'trajectory'}
+        if 'trajectory' in objects:
+            trajectory = objects['trajectory']
+            states['trajectory'] = {
+                'parameters': {key: val for key, val in trajectory._parameters._data.items() if key != 'trajectory'},
+                'individuals': trajectory.individuals.get(generation, []),
+                'individual': trajectory.individual,
+                'v_idx': trajectory.v_idx,
+                'results': _changed_items(_flatten_results(trajectory.results), self._logged_results, remember=False),
+                'top_results': _changed_items(trajectory._results, self._logged_top_results, remember=False),
+            }
+        try:
+            with open(resume_path + ".tmp", "wb") as handle:
+                _StatePickler(handle, objects).dump((generation, states))
+        except (pickle.PicklingError, TypeError, AttributeError) as e:
+            logger.warning("The state of the run cannot be stored, it will not be possible to resume it: {}".format(e))
+            self._resume_state_enabled = False
+            os.remove(resume_path + ".tmp")
+            return
+        os.replace(resume_path + ".tmp", resume_path)
+
+    def resume(self, generation):
+        """
+        Prepares the checkpointer to continue an interrupted run at the given generation. The records of the log from
+        this generation on, which were written before the interruption, are dropped.
+        :param generation: Id of the generation at which the run is continued
+        """
+        records = [record for record in _read_log(self.log_path) if record['generation'] < generation]
+        with open(self.log_path + ".tmp", "wb") as handle:
+            for record in records:
+                pickle.dump(record, handle, pickle.HIGHEST_PROTOCOL)
+        os.replace(self.log_path + ".tmp", self.log_path)
+        self._log_started = True
+
+
+class _StatePickler(pickle.Pickler):
+    """
+    Pickler which stores references to the given objects by name, so that the states of these objects can be stored
+    separately and be loaded into existing objects
+    """
+
+    def __init__(self, file, objects):
+        super().__init__(file, pickle.HIGHEST_PROTOCOL)
+        self._names = {id(obj): name for name, obj in objects.items()}
+
+    def persistent_id(self, obj):
+        return self._names.get(id(obj))
+
+
+class _StateUnpickler(pickle.Unpickler):
+    """
+    Unpickler which resolves the references stored by :class:`_StatePickler` to the given objects
+    """
+
+    def __init__(self, file, objects):
+        super().__init__(file)
+        self._objects = objects
+
+    def persistent_load(self, pid):
+        return self._objects[pid]
+
+
+def load_resume_state(path, objects):
+    """
+    Loads the state stored by :meth:`TrajectoryCheckpointer.store_resume_state` into the given objects
+    :param path: Directory where the resume state, the log and the snapshots were written
+    :param objects: dictionary of the objects to restore by name, the same names as used for storing the state.
+        Their attributes are replaced by the stored ones, with their __setstate__ function if they have one. The
+        trajectory is rebuilt from the log with :func:`load_trajectory` and the stored changes are applied to it
+    :return: the id of the generation at which the run has to be continued, or None if there is no resume state
+    """
+    resume_path = os.path.join(path, RESUME_FILE_NAME)
+    if not os.path.exists(resume_path):
+        return None
+    with open(resume_path, "rb") as handle:
+        generation, states = _StateUnpickler(handle, objects).load()
+    if 'trajectory' in states:
+        _restore_trajectory(objects['trajectory'], load_trajectory(path, generation - 1), generation,
+                            states.pop('trajectory'))
+    for name, state in states.items():
+        obj = objects[name]
+        if hasattr(obj, '__setstate__'):
+            obj.__setstate__(state)
+        else:
+            vars(obj).update(state)
+    return generation
+
+
+def _restore_trajectory(trajectory, loaded, generation, changes):
+    """
+    Replaces the contents of the trajectory by the ones of the trajectory loaded from the log, and applies the changes
+    stored with the resume state
+    :param trajectory: The trajectory to restore. It keeps its own parameter dictionary, which refers to it
+    :param loaded: The trajectory of the last generation stored in the log
+    :param generation: Id of the generation at which the run is continued
+    :param changes: The changes of the trajectory stored by :meth:`TrajectoryCheckpointer.store_resume_state`
+    """
+    parameters = trajectory._parameters
+    vars(trajectory).update(vars(loaded))
+    trajectory._parameters = parameters
+    parameters._data.update(changes['parameters'])
+    trajectory.individuals[generation] = changes['individuals']
+    trajectory.individual = changes['individual']
+    trajectory.v_idx = changes['v_idx']
+    _apply_results(trajectory, changes['results'], changes['top_results'])
+
+
+def _get_state(obj):
+    """
+    Returns the state of the object to store, as returned by its __getstate__ function if it also defines __setstate__
+    """
+    if hasattr(obj, '__setstate__'):
+        return obj.__getstate__()
+    return dict(vars(obj))
+
+
+def _read_log(log_path):
+    """
+    Yields the records of the log one after the other
+    :param log_path: path of the log file
+    """
+    if not os.path.exists(log_path):
+        return
+    with open(log_path, "rb") as handle:
+        while True:
+            try:
+                yield pickle.load(handle)
+            except EOFError:
+                break
+            except pickle.UnpicklingError:
+                # The last record may be truncated if the run was interrupted while writing it
+                logger.warning("Ignoring truncated record at the end of {}".format(log_path))
+                break
+
+
+def _flatten_results(results):
+    """
+    Returns a dictionary of all the entries of the result groups of the trajectory, except for all_results, keyed by
+    their path
+    :param results: The results (ResultGroup) of the trajectory
+    """
+    flat = {}
+    for key, val in results._data.items():
+        if key == 'all_results':
+            continue
+        if isinstance(val, ResultGroup):
+            for subkey, subval in val._data.items():
+                flat[(key, subkey)] = subval
+        else:
+            flat[(key,)] = val
+    return flat
+
+
+def _changed_items(items, logged, remember=True):
+    """
+    Returns the items which are new or have been replaced since they were last logged, and remembers them as logged
+    :param items: dictionary of the current items
+    :param logged: dictionary of the items as they were logged, updated in place
+    :param remember: If False, the logged items are left unchanged
+    """
+    changed = {key: val for key, val in items.items() if key not in logged or logged[key] is not val}
+    if remember:
+        logged.update(changed)
+    return changed
+
+
+def _apply_record(trajectory, record):
+    """
+    Applies a record of the log on a trajectory
+    """
+    generation = record['generation']
+    trajectory.individuals[generation] = record['individuals']
+    trajectory.results.f_add_result_to_group('all_results', generation, record['all_results'])
+    trajectory.current_results = record['current_results']
+    _apply_results(trajectory, record['results'], record['top_results'])
+    trajectory.par['generation'] = generation
+
+
+def _apply_results(trajectory, results, top_results):
+    """
+    Applies the changed entries of the result groups and of the top level results on a trajectory
+    """
+    for path, val in results.items():
+        if len(path) == 1:
+            trajectory.results._data[path[0]] = val
+        else:
+            if path[0] not in trajectory.results._data:
+                trajectory.results.f_add_result_group(path[0])
+            trajectory.results._data[path[0]]._data[path[1]] = val
+    trajectory._results.update(top_results)
+
+
+def load_trajectory(path, generation=None):
+    """
+    Reconstructs the trajectory as it was stored for the given generation, from the latest snapshot up to that
+    generation and the log written by :class:`TrajectoryCheckpointer`
+    :param path: Directory where the log and the snapshots were written
+    :param generation: Id of the generation to reconstruct. Defaults to the last stored generation
+    :return: the trajectory
+    """
+    snapshots = {}
+    for fname in glob.glob(os.path.join(path, "Trajectory_final_*.bin")):
+        match = re.match(r"Trajectory_final_(\d+)\.bin$", os.path.basename(fname))
+        if match:
+            snapshots[int(match.group(1))] = fname
+    candidates = [g for g in snapshots if generation is None or g <= generation]
+    if not candidates:
+        raise Exception("No snapshot of the trajectory found in {} for generation {}".format(path, generation))
+    snapshot_generation = max(candidates)
+    with open(snapshots[snapshot_generation], "rb") as handle:
+        trajectory = pickle.load(handle)
+
+    last_generation = None
+    for record in _read_log(os.path.join(path, LOG_FILE_NAME)):
+        if generation is not None and record['generation'] > generation:
+            break
+        last_generation = record['generation']
+        if record['generation'] <= snapshot_generation:
+            # Optimizers empty the lists of fitnesses after processing them, so the snapshot only holds the ones of
+            # its own generation. The log keeps all of them
+            trajectory.results.f_add_result_to_group('all_results', record['generation'], record['all_results'])
+        else:
+            _apply_record(trajectory, record)
+
+    loaded_generation = trajectory.par['generation']
+    if generation is not None and loaded_generation != generation:
+        raise Exception("Generation {} is not stored in {}".format(generation, path))
+    # A snapshot which does not belong to the log, e.g. of another run, is beyond its last generation
+    if last_generation is not None and snapshot_generation > last_generation:
+        raise Exception("The snapshot of generation {} in {} does not match the log, which ends at generation {}"
+                        .format(snapshot_generation, path, last_generation))
+    return trajectory
@@ -1,10 +1,19 @@
 import inspect
 import logging
 import os
-import pickle
+import signal
+import time
+import traceback
+from collections import deque
 
+from l2l import timed
+from l2l.utils.checkpoint import TrajectoryCheckpointer, load_resume_state
+from l2l.utils.evaluation_scheduler import EvaluationError, EvaluationScheduler
+from l2l.optimizees.optimizee import get_simulate_batch
 from l2l.utils.JUBE_runner import JUBERunner
+from l2l.utils.pool_runner import PoolRunner
 from l2l.utils.trajectory import Trajectory
+from l2l.utils.worker_runner import WorkerRunner
 
 logger = logging.getLogger("utils.Environment")
 
@@ -13,8 +22,9 @@ class Environment:
     """
     The Environment class takes the place of the pypet Environment and provides
     the required functionality to execute the inner loop. This means it uses
-    either JUBE or sequential calls in order to execute all individuals in a
-    generation. Based on the pypet environment concept:
+    either JUBE, a pool of local worker processes, persistent worker daemons
+    or sequential calls in order to execute all individuals in a generation. Based on the pypet environment
+    concept:
     https://github.com/SmokinCaterpillar/pypet
     """
 
@@ -23,9 +33,69 @@ class Environment:
         Initializes an Environment
         :param args: arguments passed to the environment initialization
         :param keyword_args: arguments by keyword. Relevant keywords are
-                             trajectory and filename.
+                             trajectory, filename, automatic_storing,
+                             multiprocessing, backend, n_workers,
+                             worker_address, snapshot_interval, resume,
+                             asynchronous, timeout, speculation_threshold,
+                             penalty_fitness and max_retries.
         The trajectory object holds individual parameters and history per
         generation of the exploration process.
+        The backend selects how the individuals are executed: 'jube' runs
+        them through JUBE, 'pool' on a pool of n_workers local processes
+        (defaults to the number of CPUs), 'workers' on n_workers persistent
+        worker daemons connected through sockets and 'serial' in this
+        process, in a single call to the simulate_batch function of the
+        optimizee if it overrides it and one after the other otherwise.
+        The worker daemons are started locally unless
+        a worker_address (host, port) is given, in which case they have to be
+        started by the user, see
+        :class:`~l2l.utils.worker_runner.WorkerRunner`. If no backend is
+        given, it is 'jube' if multiprocessing is enabled and 'serial'
+        otherwise.
+        With automatic_storing, the changes of the trajectory are appended to
+        a log every generation and a full snapshot is written every
+        snapshot_interval generations (default 10), see
+        :class:`~l2l.utils.checkpoint.TrajectoryCheckpointer`. The state of
+        the optimizer and the optimizee is stored as well after every
+        generation, with the changes of the trajectory since its last record
+        in the log. If resume is True and such a state exists, the run
+        continues where it was interrupted, see :meth:`restore_checkpoint`.
+        Otherwise, the state stored by an earlier run with the same name is
+        removed.
+        If asynchronous is True, there is no barrier between generations: the
+        fitness of every individual is passed to the optimizer as soon as it
+        is available, and the individuals the optimizer returns in exchange
+        are evaluated right away, see
+        :meth:`~l2l.optimizers.optimizer.Optimizer.post_process_individual`.
+        This keeps all the workers busy when the evaluation times vary. It is
+        not available with the 'jube' backend, and such runs cannot be
+        resumed.
+        The timeout limits the wall-clock time in seconds of the evaluation of
+        one individual. An individual which does not finish in time is
+        stopped and gets the penalty_fitness, which may also be a function
+        taking the individual and returning its fitness. Without a
+        penalty_fitness, the run fails instead. With the 'pool' and 'workers'
+        backends, once the fraction speculation_threshold (e.g. 0.9) of a
+        generation is evaluated, the outstanding individuals are evaluated a
+        second time on the idle workers and the first result is used, see
+        :class:`~l2l.utils.evaluation_scheduler.EvaluationScheduler`. With the
+        'serial' backend, the timeout relies on SIGALRM and the individuals
+        are evaluated one by one even if the optimizee provides
+        simulate_batch. With the 'jube' backend, the timeout applies to the
+        whole generation.
+        An individual whose evaluation fails, e.g. because the optimizee
+        raises an exception, a worker dies or its result file is missing or
+        corrupt, is evaluated again up to max_retries times (default 0),
+        failed worker daemons being replaced first. If it still fails, it gets
+        the penalty_fitness, or the run fails if there is none. Every failure
+        is recorded as an
+        :class:`~l2l.utils.evaluation_scheduler.EvaluationFailure` in the
+        result group evaluation_failures of the trajectory, in a list for the
+        generation of the individual.
+        The time spent in each phase of a generation is stored in the result
+        group timings of the trajectory, see :meth:`_record_timings`, and can
+        be exported with :func:`~l2l.utils.phase_timings.export_timings_csv`
+        and :func:`~l2l.utils.phase_timings.export_timings_json`.
         """
         if 'trajectory' in keyword_args:
             traj = keyword_args['trajectory']
@@ -46,11 +116,37 @@ class Environment:
         os.makedirs(self.per_gen_path, exist_ok=True)
 
         self.automatic_storing = keyword_args.get('automatic_storing', True)
+        self.checkpointer = TrajectoryCheckpointer(
+            self.per_gen_path, keyword_args.get('snapshot_interval', 10))
+        self.resume = keyword_args.get('resume', False)
+        if not self.resume:
+            # The state of an earlier run with the same name must not be
+            # resumed once this run has started to replace its log
+            self.checkpointer.remove_resume_state()
 
         self.postprocessing = None
         self.multiprocessing = True
         if 'multiprocessing' in keyword_args:
             self.multiprocessing = keyword_args['multiprocessing']
+        self.backend = keyword_args.get('backend')
+        if self.backend is None:
+            self.backend = 'jube' if self.multiprocessing else 'serial'
+        if self.backend not in ('jube', 'pool', 'workers', 'serial'):
+            raise ValueError("Unknown backend: {}".format(self.backend))
+        self.n_workers = keyword_args.get('n_workers')
+        self.worker_address = keyword_args.get('worker_address')
+        self.asynchronous = keyword_args.get('asynchronous', False)
+        if self.asynchronous and self.backend == 'jube':
+            raise ValueError("The asynchronous mode is not available with "
+                             "the 'jube' backend")
+        self.timeout = keyword_args.get('timeout')
+        self.speculation_threshold = keyword_args.get('speculation_threshold')
+        self.penalty_fitness = keyword_args.get('penalty_fitness')
+        self.max_retries = keyword_args.get('max_retries', 0)
+        if (self.timeout is not None and self.backend == 'serial'
+                and not hasattr(signal, 'SIGALRM')):
+            raise ValueError("The timeout of the 'serial' backend is not "
+                             "available on this platform")
         self.run_id = 0
 
         self.logging = False
@@ -60,17 +156,103 @@ class Environment:
 
     def run(self, runfunc):
         """
-        Runs the optimizees using either JUBE or sequential calls.
+        Runs the optimizees using either JUBE, a local process pool, worker
+        daemons or sequential calls.
         :param runfunc: The function to be called from the optimizee
         :return: the results of running a whole generation. Dictionary
                  indexed by generation id.
         """
+        if self.asynchronous:
+            optimizer = getattr(self.postprocessing, '__self__', None)
+            if not getattr(optimizer, 'asynchronous', False):
+                raise ValueError("The optimizer does not support the "
+                                 "asynchronous mode")
+        if self.resume:
+            self.restore_checkpoint(runfunc)
         result = {}
+        # Trajectories stored by earlier versions have no phase timings
+        if self.trajectory.phase_timings is None:
+            self.trajectory.phase_timings = {}
         gen = self.trajectory.par['generation']
         n_loops = self.trajectory.par['n_iteration']
+        runner = None
+        # The pool and the worker daemons live for the whole run so that the
+        # optimizee stays resident in the workers across generations
+        if self.backend == 'pool':
+            runner = PoolRunner(runfunc, self.trajectory, self.n_workers)
+        elif self.backend == 'workers':
+            runner = WorkerRunner(runfunc, self.trajectory, self.n_workers,
+                                  self.worker_address)
+        # The individuals are dispatched one by one only if needed, as the
+        # pool and the serial backend evaluate whole generations faster
+        use_scheduler = (self.asynchronous or self.timeout is not None or
+                         self.speculation_threshold is not None or
+                         self.penalty_fitness is not None or
+                         self.max_retries > 0)
+        if self.backend == 'serial' and use_scheduler:
+            runner = _SerialRunner(runfunc, self.trajectory)
+        scheduler = None
+        if runner is not None and use_scheduler:
+            scheduler = EvaluationScheduler(runner, self.timeout,
+                                            self.speculation_threshold,
+                                            self.penalty_fitness,
+                                            self.max_retries)
+            scheduler.timings = self.trajectory.phase_timings
+        try:
+            if self.asynchronous:
+                self._run_asynchronous(result, scheduler)
+            else:
+                self._run_generations(runfunc, result, gen, n_loops, runner,
+                                      scheduler)
+        finally:
+            if scheduler is not None:
+                self._record_failures(scheduler.failures)
+            if runner is not None:
+                runner.close()
+
+        return result
+
+    def _run_generations(self, runfunc, result, gen, n_loops, runner,
+                         scheduler):
+        """
+        Runs the generations from gen up to n_loops, see :meth:`run`
+        """
+        evaluation_times = []
+        if runner is not None:
+            evaluation_times = runner.evaluation_times
         for it in range(gen, n_loops):
+            # The optimizer did not create this generation as it stopped
+            # early, e.g. because the stop criterion was reached
+            if it not in self.trajectory.individuals:
+                break
             result[it] = []
-            if self.multiprocessing:
+            timings = self.trajectory.phase_timings
+            if scheduler is not None:
+                scheduler.timings = timings
+            if runner is not None:
+                logging.info("Environment run starting {} for generation: "
+                             "{}".format(type(runner).__name__, it))
+                try:
+                    with timed(None, 'evaluation', timings):
+                        if scheduler is not None:
+                            result[it][:] = scheduler.run(
+                                self.trajectory.individuals[it])
+                        else:
+                            result[it][:] = runner.run(self.trajectory, it)
+                    if self.backend == 'serial':
+                        self.run_id = self.run_id + len(result[it])
+                    if scheduler is not None:
+                        self._record_failures(scheduler.failures)
+                except Exception as e:
+                    if self.logging:
+                        logger.exception(
+                            "Error during {} execution "
+                            "of individuals: {}".format(self.backend,
+                                                        e.__cause__)
+                        )
+                    raise e
+
+            elif self.backend == 'jube':
                 # Multiprocessing is done through JUBE, either with or
                 # without scheduler
                 logging.info(
@@ -79,21 +261,54 @@ class Environment:
                 jube = JUBERunner(self.trajectory)
                 # Initialize new JUBE run and execute it
                 try:
-                    jube.write_pop_for_jube(self.trajectory, it)
-                    result[it][:] = jube.run(self.trajectory, it)
+                    with timed(None, 'jube_files', timings):
+                        jube.write_pop_for_jube(self.trajectory, it)
+                    result[it][:] = jube.run(
+                        self.trajectory, it, timeout=self.timeout,
+                        penalty_fitness=self.penalty_fitness,
+                        max_retries=self.max_retries)
+                    self._record_failures(jube.failures)
                 except Exception as e:
+                    self._record_failures(jube.failures)
                     if self.logging:
                         logger.exception(
                             "Error launching JUBE run: %s" % str(e.__cause__))
                     raise e
 
+            elif get_simulate_batch(runfunc) is not None:
+                # The optimizee evaluates the whole generation in one call
+                try:
+                    individuals = self.trajectory.individuals[it]
+                    with timed(None, 'evaluation', timings):
+                        fitnesses = get_simulate_batch(runfunc)(
+                            self.trajectory, individuals)
+                    result[it][:] = [(ind.ind_idx, fitness) for ind, fitness
+                                     in zip(individuals, fitnesses)]
+                    self.run_id = self.run_id + len(individuals)
+                    # Leave the trajectory pointing to the last individual,
+                    # as after the sequential calls
+                    if individuals:
+                        self.trajectory.individual = individuals[-1]
+                except Exception as e:
+                    if self.logging:
+                        logger.exception(
+                            "Error during batch execution "
+                            "of individuals: {}".format(e.__cause__)
+                        )
+                    raise e
+
             else:
                 # Sequential calls to the runfunc in the optimizee
                 # Call runfunc on each individual from the trajectory
                 try:
                     for ind in self.trajectory.individuals[it]:
                         self.trajectory.individual = ind
+                        start = time.time()
                         fitness = runfunc(self.trajectory)
+                        seconds = time.time() - start
+                        timings['evaluation'] = \
+                            timings.get('evaluation', 0.) + seconds
+                        evaluation_times.append((it, ind.ind_idx, seconds))
                         result[it].append((ind.ind_idx, fitness))
                         self.run_id = self.run_id + 1
 
@@ -115,17 +330,166 @@ class Environment:
             self.trajectory.par['generation'] = it
 
             if self.automatic_storing:
-                trajfname = "Trajectory_{}_{:020d}.bin".format('final', it)
-                traj_path = os.path.join(self.per_gen_path, trajfname)
-                with open(traj_path, "wb") as handle:
-                    pickle.dump(
-                        self.trajectory, handle, pickle.HIGHEST_PROTOCOL)
+                with timed(None, 'checkpoint', timings):
+                    self.checkpointer.store(self.trajectory, it)
 
             # Perform the postprocessing step in order to generate the new
             # parameter set
-            self.postprocessing(self.trajectory, result[it])
+            with timed(None, 'post_process', timings):
+                self.postprocessing(self.trajectory, result[it])
 
-        return result
+            if self.automatic_storing:
+                with timed(None, 'checkpoint', timings):
+                    self.checkpointer.store_resume_state(
+                        it + 1, self._checkpoint_objects(runfunc))
+            self._record_timings(it, evaluation_times)
+
+    def _run_asynchronous(self, result, scheduler):
+        """
+        Runs the optimization without a barrier between generations, see
+        :meth:`run`. The results are grouped by the generation of the
+        individuals, in the order in which they are completed.
+        """
+        optimizer = self.postprocessing.__self__
+        traj = self.trajectory
+        for ind in traj.individuals[traj.par['generation']]:
+            scheduler.submit(ind)
+        logging.info("Environment run starting {} in asynchronous mode with "
+                     "{} individuals".format(type(scheduler.runner).__name__,
+                                             len(scheduler)))
+        while len(scheduler):
+            try:
+                ind, fitness = scheduler.next_result()
+            except Exception as e:
+                if self.logging:
+                    logger.exception(
+                        "Error during asynchronous execution of individuals: "
+                        "{}".format(e.__cause__))
+                raise e
+            if ind.generation not in result:
+                result[ind.generation] = []
+                traj.results.f_add_result_to_group(
+                    "all_results", ind.generation, result[ind.generation])
+            result[ind.generation].append((ind.ind_idx, fitness))
+            self.run_id = self.run_id + 1
+            traj.individual = ind
+            traj.current_results = result[ind.generation]
+
+            generation = optimizer.g
+            with timed(None, 'post_process', traj.phase_timings):
+                new_individuals = optimizer.post_process_individual(
+                    traj, ind, fitness)
+            for new_ind in new_individuals:
+                scheduler.submit(new_ind)
+            traj.par['generation'] = optimizer.g
+            if optimizer.g != generation:
+                if self.automatic_storing:
+                    with timed(None, 'checkpoint', traj.phase_timings):
+                        self.checkpointer.store(traj, generation)
+                self._record_timings(generation,
+                                     scheduler.runner.evaluation_times)
+                scheduler.timings = traj.phase_timings
+
+        self._record_timings(optimizer.g, scheduler.runner.evaluation_times)
+        if self.automatic_storing:
+            self.checkpointer.store(traj, optimizer.g)
+
+    def _record_failures(self, failures):
+        """
+        Moves the failures of evaluations to the result group
+        evaluation_failures of the trajectory
+        :param failures: list of
+            :class:`~l2l.utils.evaluation_scheduler.EvaluationFailure`, which
+            is emptied
+        """
+        if not failures:
+            return
+        # Trajectories stored by earlier versions have no such group
+        if 'evaluation_failures' not in self.trajectory.results._data:
+            self.trajectory.results.f_add_result_group('evaluation_failures')
+        group = self.trajectory.results.evaluation_failures
+        for failure in failures:
+            # A new list is stored every time, so that the checkpointer sees
+            # the change
+            group._data[failure.generation] = \
+                group._data.get(failure.generation, []) + [failure]
+        failures.clear()
+
+    def _record_timings(self, generation, evaluation_times):
+        """
+        Moves the phase timings of a generation to the result group timings
+        of the trajectory and starts new ones for the next generation. The
+        entry of a generation is a dictionary with the items 'phases', the
+        seconds spent in each phase, and 'evaluation_times', the seconds
+        taken by the evaluation of each individual indexed by ind_idx.
+        The phases are 'evaluation' (evaluating the individuals, including
+        their 'dispatch' to the workers), 'checkpoint' (storing the
+        trajectory and the state of the run), 'post_process' (updating the
+        optimizer and sampling the next generation, including 'f_expand')
+        and, with the 'jube' backend, 'jube_files', 'trajectory_dump' and
+        'result_collection', see :meth:`~l2l.utils.JUBE_runner.JUBERunner.run`.
+        No evaluation times are recorded when the individuals are evaluated
+        by JUBE or by the simulate_batch function of the optimizee.
+        :param generation: Id of the generation
+        :param evaluation_times: list of tuples (generation, ind_idx,
+            seconds), which is emptied
+        """
+        traj = self.trajectory
+        # Trajectories stored by earlier versions have no such group
+        if 'timings' not in traj.results._data:
+            traj.results.f_add_result_group('timings')
+        group = traj.results.timings
+        times = {generation: {}}
+        for gen, ind_idx, seconds in evaluation_times:
+            times.setdefault(gen, {})[ind_idx] = seconds
+        evaluation_times.clear()
+        for gen, gen_times in times.items():
+            # A new dictionary is stored every time, so that the checkpointer
+            # sees the change
+            entry = group._data.get(gen, {'phases': {},
+                                          'evaluation_times': {}})
+            phases = entry['phases']
+            if gen == generation:
+                phases = traj.phase_timings
+            group._data[gen] = {
+                'phases': phases,
+                'evaluation_times': {**entry['evaluation_times'], **gen_times}}
+        traj.phase_timings = {}
+
+    def restore_checkpoint(self, runfunc):
+        """
+        Restores the trajectory, the optimizer and the optimizee of an
+        interrupted run from the state stored after its last completed
+        generation, so that run() continues with the next generation. The
+        optimizer and the optimizee are the objects the postprocessing
+        function and runfunc are bound to. Their attributes are replaced by
+        the stored ones. Does nothing if resume is not enabled or no state has
+        been stored yet.
+        :param runfunc: The function to be called from the optimizee
+        """
+        if not self.resume:
+            return
+        self.resume = False
+        generation = load_resume_state(self.per_gen_path,
+                                       self._checkpoint_objects(runfunc))
+        if generation is None:
+            logger.info("No stored state found, starting a new run")
+            return
+        self.trajectory.par['generation'] = generation
+        self.trajectory.phase_timings = {}
+        self.checkpointer.resume(generation)
+        logger.info("Resuming run at generation {}".format(generation))
+
+    def _checkpoint_objects(self, runfunc):
+        """
+        Returns the objects whose state is needed to resume a run
+        """
+        objects = {'trajectory': self.trajectory}
+        if hasattr(self.postprocessing, '__self__'):
+            objects['optimizer'] = self.postprocessing.__self__
+        if hasattr(runfunc, '__self__'):
+            objects['optimizee'] = runfunc.__self__
+        return objects
 
     def add_postprocessing(self, func):
         """
@@ -149,3 +513,76 @@ class Environment:
         Function to enable logging
         """
         self.logging = False
+
+
+class _SerialRunner:
+    """
+    Evaluates the submitted individuals one after the other in this process,
+    in the order in which they are submitted. It provides the interface of
+    the runners used by the
+    :class:`~l2l.utils.evaluation_scheduler.EvaluationScheduler`, whose
+    timeout is enforced with SIGALRM.
+    """
+
+    def __init__(self, runfunc, trajectory):
+        self.runfunc = runfunc
+        self.trajectory = trajectory
+        self._queued = deque()
+        self.evaluation_times = []
+
+    @property
+    def n_idle(self):
+        return 0 if self._queued else 1
+
+    def submit(self, individual):
+        self._queued.append(individual)
+
+    def wait_result(self, timeout=None):
+        if timeout is not None and timeout <= 0:
+            return None
+        individual = self._queued.popleft()
+        self.trajectory.individual = individual
+        if timeout is None:
+            return individual, self._evaluate(individual)
+
+        def on_alarm(signum, frame):
+            raise _EvaluationInterrupted()
+
+        previous_handler = signal.signal(signal.SIGALRM, on_alarm)
+        try:
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+            try:
+                return individual, self._evaluate(individual)
+            finally:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        except _EvaluationInterrupted:
+            return None
+        finally:
+            signal.signal(signal.SIGALRM, previous_handler)
+
+    def _evaluate(self, individual):
+        start = time.time()
+        try:
+            fitness = self.runfunc(self.trajectory)
+        except Exception:
+            raise EvaluationError(individual, 'error', traceback.format_exc())
+        self.evaluation_times.append((individual.generation,
+                                      individual.ind_idx,
+                                      time.time() - start))
+        return fitness
+
+    def cancel(self, individual):
+        self._queued = deque(
+            ind for ind in self._queued
+            if (ind.generation, ind.ind_idx) !=
+            (individual.generation, individual.ind_idx))
+
+    def close(self):
+        pass
+
+
+class _EvaluationInterrupted(BaseException):
+    """
+    Raised by SIGALRM in the evaluation of an individual which exceeds its
+    time limit. It is not an Exception so that the optimizee does not catch it
+    """
@@ -0,0 +1,224 @@
+import contextlib
+import hashlib
+import logging
+import pickle
+import sqlite3
+import time
+
+import numpy as np
+
+from l2l.optimizees.optimizee import Optimizee, get_simulate_batch
+
+logger = logging.getLogger("utils.EvaluationCache")
+
+
+class EvaluationCache:
+    """
+    Persistent store of the fitnesses of already evaluated individuals, backed by an SQLite database. It can be shared
+    by several runs, and by several processes of the same run. When it holds more than max_entries fitnesses, the least
+    recently used ones are evicted.
+
+    The number of fitnesses is kept up to date by triggers of the database, so that it is not counted at each put.
+    Statements executed in a :meth:`transaction` context are committed together.
+    """
+
+    def __init__(self, path, max_entries=1000000):
+        """
+        Initializes the cache
+        :param path: Path of the SQLite database file. It is created if it does not exist
+        :param max_entries: Maximal number of fitnesses kept in the cache
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._connection = None
+        self._transaction_depth = 0
+        with self.transaction():
+            self._execute("CREATE TABLE IF NOT EXISTS evaluations "
+                          "(key TEXT PRIMARY KEY, fitness BLOB NOT NULL, last_used REAL NOT NULL)")
+            self._execute("CREATE INDEX IF NOT EXISTS evaluations_last_used ON evaluations (last_used)")
+            # Databases created without the count are counted once
+            self._execute("CREATE TABLE IF NOT EXISTS entry_count (id INTEGER PRIMARY KEY, n INTEGER NOT NULL)")
+            self._execute("INSERT OR IGNORE INTO entry_count (id, n) SELECT 0, COUNT(*) FROM evaluations")
+            self._execute("CREATE TRIGGER IF NOT EXISTS evaluations_insert AFTER INSERT ON evaluations "
+                          "BEGIN UPDATE entry_count SET n = n + 1 WHERE id = 0; END")
+            self._execute("CREATE TRIGGER IF NOT EXISTS evaluations_delete AFTER DELETE ON evaluations "
+                          "BEGIN UPDATE entry_count SET n = n - 1 WHERE id = 0; END")
+
+    def _connect(self):
+        # The connection is opened lazily, so that it is opened again in each process the cache is sent to
+        if self._connection is None:
+            self._connection = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        return self._connection
+
+    def _execute(self, sql, args=()):
+        return self._connect().execute(sql, args)
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Context in which the statements of the cache are executed in a single transaction, which is committed at the
+        end of the outermost context, or rolled back if it raises
+        """
+        if self._transaction_depth == 0:
+            # The database is locked for writing right away, so that concurrent transactions wait for each other
+            # instead of failing when they start writing
+            self._execute("BEGIN IMMEDIATE")
+        self._transaction_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self._execute("ROLLBACK")
+            raise
+        self._transaction_depth -= 1
+        if self._transaction_depth == 0:
+            self._execute("COMMIT")
+
+    def get(self, key, touch=True):
+        """
+        Returns the fitness stored for the key, or None if there is none
+        :param key: Key of the evaluation, see :meth:`make_key`
+        :param touch: Whether the fitness is marked as used. Otherwise it is up to the caller to :meth:`touch` it
+        """
+        row = self._execute("SELECT fitness FROM evaluations WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        if touch:
+            self.touch([key])
+        return pickle.loads(row[0])
+
+    def touch(self, keys):
+        """
+        Marks the fitnesses stored for the keys as used, so that they are evicted last
+        :param keys: Keys of the evaluations, see :meth:`make_key`
+        """
+        now = time.time()
+        self._connect().executemany("UPDATE evaluations SET last_used = ? WHERE key = ?",
+                                    [(now, key) for key in keys])
+
+    def put(self, key, fitness):
+        """
+        Stores the fitness for the key, evicting the least recently used fitnesses if the cache is full
+        :param key: Key of the evaluation, see :meth:`make_key`
+        :param fitness: The fitness to store
+        """
+        with self.transaction():
+            # An upsert rather than a replace, which would delete the row without firing the delete trigger
+            self._execute("INSERT INTO evaluations (key, fitness, last_used) VALUES (?, ?, ?) "
+                          "ON CONFLICT (key) DO UPDATE SET fitness = excluded.fitness, last_used = excluded.last_used",
+                          (key, pickle.dumps(fitness, pickle.HIGHEST_PROTOCOL), time.time()))
+            n_entries = len(self)
+            if n_entries > self.max_entries:
+                self._execute("DELETE FROM evaluations WHERE key IN "
+                              "(SELECT key FROM evaluations ORDER BY last_used LIMIT ?)",
+                              (n_entries - self.max_entries,))
+
+    def __len__(self):
+        return self._execute("SELECT n FROM entry_count WHERE id = 0").fetchone()[0]
+
+    @staticmethod
+    def make_key(fingerprint, individual):
+        """
+        Returns a key which only depends on the fingerprint and on the values of the parameters of the individual,
+        and which is stable across runs
+        :param fingerprint: Description of the optimizee, see :class:`CachedOptimizee`
+        :param individual: The individual
+        """
+        digest = hashlib.sha256(repr(fingerprint).encode())
+        for name in sorted(individual.params):
+            value = np.asarray(individual.params[name])
+            digest.update(name.encode())
+            digest.update(str(value.dtype).encode())
+            digest.update(str(value.shape).encode())
+            digest.update(value.tobytes())
+        return digest.hexdigest()
+
+    def close(self):
+        """
+        Closes the connection to the database
+        """
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_connection'] = None
+        state['_transaction_depth'] = 0
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+
+class CachedOptimizee(Optimizee):
+    """
+    Wraps an optimizee so that the fitness of each individual is looked up in an :class:`EvaluationCache` before the
+    optimizee is simulated, and stored in it afterwards. Individuals are identified by the values of their parameters
+    together with a fingerprint of the optimizee, so that the cache can be shared by runs of different optimizees.
+
+    NOTE: The cache is only correct for deterministic optimizees, e.g. functions without noise.
+
+    :param optimizee: The optimizee to wrap
+    :param cache: The :class:`EvaluationCache` to use
+    :param fingerprint: Any object whose repr identifies the optimizee and everything its fitness depends on apart from
+        the individual, e.g. the parameters returned by
+        :meth:`~l2l.optimizees.functions.benchmarked_functions.BenchmarkedFunctions.get_function_by_index`
+    """
+
+    def __init__(self, optimizee, cache, fingerprint):
+        # The wrapped optimizee has already added its parameters to the trajectory, so the base class is not
+        # initialized again
+        self.optimizee = optimizee
+        self.cache = cache
+        self.fingerprint = fingerprint
+        self.n_cache_hits = 0
+
+    def create_individual(self):
+        return self.optimizee.create_individual()
+
+    def bounding_func(self, individual):
+        return self.optimizee.bounding_func(individual)
+
+    def simulate(self, traj):
+        """
+        Returns the cached fitness of the individual of the trajectory, or simulates it with the wrapped optimizee
+        """
+        key = self.cache.make_key(self.fingerprint, traj.individual)
+        fitness = self.cache.get(key)
+        if fitness is None:
+            fitness = self.optimizee.simulate(traj)
+            self.cache.put(key, fitness)
+        else:
+            self.n_cache_hits += 1
+        return fitness
+
+    def simulate_batch(self, traj, individuals):
+        """
+        Returns the cached fitnesses of the individuals, and simulates all the others with the wrapped optimizee,
+        with a single call to its simulate_batch function if it has one
+        """
+        keys = [self.cache.make_key(self.fingerprint, ind) for ind in individuals]
+        fitnesses = [self.cache.get(key, touch=False) for key in keys]
+        missing = [i for i, fitness in enumerate(fitnesses) if fitness is None]
+        self.n_cache_hits += len(individuals) - len(missing)
+
+        simulate_batch = get_simulate_batch(self.optimizee.simulate)
+        if not missing:
+            new_fitnesses = []
+        elif simulate_batch is not None:
+            new_fitnesses = simulate_batch(traj, [individuals[i] for i in missing])
+        else:
+            new_fitnesses = []
+            for i in missing:
+                traj.individual = individuals[i]
+                new_fitnesses.append(self.optimizee.simulate(traj))
+        # The hits are marked as used and the new fitnesses stored in a single transaction, which is only started
+        # after the simulation so that other processes are not kept waiting for it
+        with self.cache.transaction():
+            self.cache.touch([key for key, fitness in zip(keys, fitnesses) if fitness is not None])
+            for i, fitness in zip(missing, new_fitnesses):
+                self.cache.put(keys[i], fitness)
+                fitnesses[i] = fitness
+        return fitnesses
@@ -0,0 +1,255 @@
+import logging
+import time
+from collections import deque, namedtuple
+
+from l2l import timed
+
+logger = logging.getLogger("utils.EvaluationScheduler")
+
+EvaluationFailure = namedtuple('EvaluationFailure', ['generation', 'ind_idx', 'attempt', 'reason', 'details'])
+EvaluationFailure.__doc__ = """
+Record of a failed evaluation of an individual, as stored in the result group `evaluation_failures` of the trajectory
+:param generation: Generation of the individual
+:param ind_idx: Index of the individual
+:param attempt: Number of the attempt which failed, 0 for the first evaluation and 1 for the first retry
+:param reason: One of 'error' (the optimizee raised an exception or exited with an error), 'crash' (the worker died),
+    'missing' (no result was written), 'corrupt' (the result could not be read) or 'timeout'
+:param details: Traceback or description of the failure
+"""
+
+
+class EvaluationError(Exception):
+    """
+    Raised when the evaluation of an individual fails
+
+    :param individual: The individual whose evaluation failed
+    :param reason: The kind of failure, see :class:`EvaluationFailure`
+    :param details: Traceback or description of the failure
+    """
+
+    def __init__(self, individual, reason, details):
+        super().__init__("Evaluation of individual {} of generation {} failed ({}):\n{}".format(
+            individual.ind_idx, individual.generation, reason, details))
+        self.individual = individual
+        self.reason = reason
+        self.details = details
+
+    def __reduce__(self):
+        return type(self), (self.individual, self.reason, self.details)
+
+    def to_failure(self, attempt):
+        """
+        Returns the :class:`EvaluationFailure` record of this failure
+        :param attempt: Number of the attempt which failed
+        """
+        return EvaluationFailure(self.individual.generation, self.individual.ind_idx, attempt, self.reason,
+                                 self.details)
+
+
+class EvaluationTimeout(EvaluationError):
+    """
+    Raised when the evaluation of an individual exceeds its time limit and no penalty fitness is given
+    """
+
+    def __init__(self, individual, timeout):
+        super().__init__(individual, 'timeout', "Did not finish within {} seconds".format(timeout))
+        self.timeout = timeout
+
+    def __reduce__(self):
+        return type(self), (self.individual, self.timeout)
+
+
+def get_penalty_fitness(penalty_fitness, error):
+    """
+    Returns the fitness assigned to an individual whose evaluation failed or did not finish in time
+    :param penalty_fitness: The fitness to assign, or a function taking the individual and returning its fitness. If
+        None, the error is raised instead
+    :param error: The :class:`EvaluationError` of the individual
+    """
+    if penalty_fitness is None:
+        raise error
+    individual = error.individual
+    fitness = penalty_fitness(individual) if callable(penalty_fitness) else penalty_fitness
+    logger.warning("Evaluation of individual {} of generation {} failed ({}), assigning the fitness {}".format(
+        individual.ind_idx, individual.generation, error.reason, fitness))
+    return fitness
+
+
+class EvaluationScheduler:
+    """
+    Dispatches the individuals to a runner (see :class:`~l2l.utils.pool_runner.PoolRunner` and
+    :class:`~l2l.utils.worker_runner.WorkerRunner`) so that slow individuals do not dictate the time of a generation:
+
+    * An individual is only sent to the runner when one of its workers is idle, so that its evaluation starts right
+      away. Its evaluation is stopped after `timeout` seconds.
+    * Once the fraction `speculation_threshold` of the individuals submitted since the last :meth:`run` is evaluated
+      and nothing is left to submit, the outstanding individuals are submitted a second time to the idle workers,
+      the slowest first. The first copy to finish is used, the other one is stopped.
+    * An individual whose evaluation fails is submitted again, up to `max_retries` times. A failed worker daemon is
+      replaced by a new one before that.
+    * An individual which does not finish in time, or which still fails after the retries, gets the
+      `penalty_fitness`, see :func:`get_penalty_fitness`.
+
+    All the failures, including the timeouts, are recorded in :attr:`failures` as :class:`EvaluationFailure`.
+
+    :param runner: The runner evaluating the individuals. It has to provide `submit`, `wait_result`, `cancel` and
+        `n_idle`
+    :param timeout: Time limit in seconds of the evaluation of one individual, or None for no limit
+    :param speculation_threshold: Fraction of the individuals which have to be evaluated before the outstanding ones
+        are evaluated a second time, or None to disable the speculative evaluations
+    :param penalty_fitness: The fitness of the individuals which do not finish in time or fail, or a function taking
+        the individual and returning its fitness. If None, the :class:`EvaluationError` is raised instead
+    :param max_retries: Number of times a failed evaluation is retried
+
+    If :attr:`timings` is set to a dictionary, the time spent submitting individuals to the runner is added to its
+    entry 'dispatch'.
+    """
+
+    def __init__(self, runner, timeout=None, speculation_threshold=None, penalty_fitness=None, max_retries=0):
+        self.runner = runner
+        self.timeout = timeout
+        self.speculation_threshold = speculation_threshold
+        self.penalty_fitness = penalty_fitness
+        self.max_retries = max_retries
+        self.failures = []
+        self.timings = None
+        # Number of failed attempts of the individuals, indexed by (generation, ind_idx)
+        self._attempts = {}
+        self._queued = deque()
+        # Start time and number of copies of the individuals being evaluated, indexed by (generation, ind_idx)
+        self._running = {}
+        self._n_submitted = 0
+        self._n_completed = 0
+
+    def __len__(self):
+        """
+        Number of individuals submitted and not yet returned by :meth:`next_result`
+        """
+        return len(self._queued) + len(self._running)
+
+    def submit(self, individual):
+        """
+        Schedules the evaluation of an individual
+        :param individual: The individual to evaluate
+        """
+        self._queued.append(individual)
+        self._n_submitted += 1
+
+    def next_result(self):
+        """
+        Waits until the evaluation of one of the submitted individuals is completed or has timed out
+        :return: a tuple (individual, fitness)
+        """
+        if not len(self):
+            raise Exception("No individual has been submitted")
+        while True:
+            self._dispatch()
+            self._speculate()
+            wait_timeout = None
+            if self.timeout is not None:
+                first_start = min(start for _, start, _ in self._running.values())
+                wait_timeout = max(0., first_start + self.timeout - time.time())
+            try:
+                result = self.runner.wait_result(wait_timeout)
+            except EvaluationError as error:
+                result = None
+                penalty = self._failed(error)
+                if penalty is not None:
+                    return penalty
+            if result is not None:
+                individual, fitness = result
+                key = (individual.generation, individual.ind_idx)
+                # Results of copies which have been superseded or timed out are ignored
+                if key in self._running:
+                    _, _, n_copies = self._running.pop(key)
+                    self._attempts.pop(key, None)
+                    if n_copies > 1:
+                        self.runner.cancel(individual)
+                    self._n_completed += 1
+                    return individual, fitness
+            expired = self._expired()
+            if expired is not None:
+                key = (expired.generation, expired.ind_idx)
+                self._running.pop(key)
+                self.runner.cancel(expired)
+                self._n_completed += 1
+                error = EvaluationTimeout(expired, self.timeout)
+                self.failures.append(error.to_failure(self._attempts.pop(key, 0)))
+                return expired, get_penalty_fitness(self.penalty_fitness, error)
+
+    def run(self, individuals):
+        """
+        Evaluates the individuals
+        :param individuals: The individuals to evaluate
+        :return: a list of tuples (ind_idx, fitness), one for each individual in the given order
+        """
+        self._n_submitted = self._n_completed = 0
+        for individual in individuals:
+            self.submit(individual)
+        fitnesses = {}
+        for _ in individuals:
+            individual, fitness = self.next_result()
+            fitnesses[individual.ind_idx] = fitness
+        return [(ind.ind_idx, fitnesses[ind.ind_idx]) for ind in individuals]
+
+    def _failed(self, error):
+        """
+        Records a failed evaluation and submits the individual again if it has retries left
+        :return: a tuple (individual, penalty fitness) if the individual has no retries left, None otherwise
+        """
+        individual = error.individual
+        key = (individual.generation, individual.ind_idx)
+        if key not in self._running:
+            # A copy of an individual which has already been given up
+            return None
+        attempt = self._attempts.get(key, 0)
+        self.failures.append(error.to_failure(attempt))
+        entry = self._running[key]
+        if entry[2] > 1:
+            # Another copy is still being evaluated
+            entry[2] -= 1
+            return None
+        del self._running[key]
+        if attempt < self.max_retries:
+            logger.warning("Evaluation of individual {} of generation {} failed ({}), retrying it".format(
+                individual.ind_idx, individual.generation, error.reason))
+            self._attempts[key] = attempt + 1
+            self._queued.appendleft(individual)
+            return None
+        self._attempts.pop(key, None)
+        self._n_completed += 1
+        return individual, get_penalty_fitness(self.penalty_fitness, error)
+
+    def _dispatch(self):
+        # If all the workers are busy with evaluations which have been given up, the individuals are submitted anyway
+        # so that the runner queues them
+        while self._queued and (self.runner.n_idle > 0 or not self._running):
+            individual = self._queued.popleft()
+            with timed(None, 'dispatch', self.timings):
+                self.runner.submit(individual)
+            self._running[(individual.generation, individual.ind_idx)] = [individual, time.time(), 1]
+
+    def _speculate(self):
+        if self.speculation_threshold is None or self._queued:
+            return
+        if self._n_completed < self.speculation_threshold * self._n_submitted:
+            return
+        for entry in sorted(self._running.values(), key=lambda entry: entry[1]):
+            if self.runner.n_idle <= 0:
+                break
+            individual, _, n_copies = entry
+            if n_copies == 1:
+                logger.info("Evaluating individual {} of generation {} a second time".format(
+                    individual.ind_idx, individual.generation))
+                with timed(None, 'dispatch', self.timings):
+                    self.runner.submit(individual)
+                entry[2] += 1
+
+    def _expired(self):
+        if self.timeout is None:
+            return None
+        now = time.time()
+        for individual, start, _ in self._running.values():
+            if now - start >= self.timeout:
+                return individual
+        return None
@@ -2,6 +2,7 @@ import logging.config
 import os
 
 from l2l.utils.environment import Environment
+from l2l.utils.phase_timings import export_timings_csv, export_timings_json
 
 from l2l.logging_tools import create_shared_logger_data, configure_loggers
 from l2l.paths import Paths
@@ -36,6 +37,37 @@ class Experiment(object):
             - jube_parameter: dict, User specified parameter for jube.
                 See notes section for default jube parameter
             - multiprocessing, bool, enable multiprocessing, Default: False
+            - backend: str, how the individuals are executed, one of 'jube',
+                'pool' (local process pool), 'workers' (persistent worker
+                daemons) or 'serial'. Default: 'jube' if multiprocessing is
+                enabled, 'serial' otherwise
+            - n_workers: int, number of worker processes used by the 'pool'
+                and 'workers' backends, Default: number of CPUs
+            - worker_address: tuple, (host, port) on which the 'workers'
+                backend waits for externally started workers, Default: None,
+                i.e. the workers are started locally
+            - snapshot_interval: int, number of generations between two full
+                snapshots of the stored trajectory, Default: 10
+            - resume: bool, continue an interrupted run of the same name with
+                the state stored after its last completed generation. The
+                optimizee and optimizer have to be created as for the original
+                run, their state is restored in run_experiment, Default: False
+            - asynchronous: bool, evaluate the individuals without a barrier
+                between generations, each result being passed to the
+                optimizer as soon as it is available. Only for optimizers
+                supporting it and not for the 'jube' backend, Default: False
+            - timeout: float, wall-clock limit in seconds of the evaluation of
+                one individual, Default: None, i.e. no limit
+            - speculation_threshold: float, fraction of a generation after
+                which the outstanding individuals are evaluated a second time
+                on the idle workers of the 'pool' and 'workers' backends,
+                Default: None, i.e. no speculative evaluations
+            - penalty_fitness: fitness of the individuals which do not finish
+                within the timeout, or function taking the individual and
+                returning it, or which still fail after max_retries,
+                Default: None, i.e. the run fails instead
+            - max_retries: int, number of times a failed evaluation of an
+                individual is retried, Default: 0
         :return traj, trajectory object
         :return all_jube_params, dict, a dictionary with all parameters for jube
             given by the user and default ones
@@ -84,7 +116,17 @@ class Experiment(object):
             add_time=True,
             automatic_storing=True,
             log_stdout=kwargs.get('log_stdout', False),  # Sends stdout to logs
-            multiprocessing=kwargs.get('multiprocessing', True)
+            multiprocessing=kwargs.get('multiprocessing', True),
+            backend=kwargs.get('backend'),
+            n_workers=kwargs.get('n_workers'),
+            worker_address=kwargs.get('worker_address'),
+            snapshot_interval=kwargs.get('snapshot_interval', 10),
+            resume=kwargs.get('resume', False),
+            asynchronous=kwargs.get('asynchronous', False),
+            timeout=kwargs.get('timeout'),
+            speculation_threshold=kwargs.get('speculation_threshold'),
+            penalty_fitness=kwargs.get('penalty_fitness'),
+            max_retries=kwargs.get('max_retries', 0)
         )
 
         create_shared_logger_data(
@@ -163,15 +205,20 @@ class Experiment(object):
         self.optimizer = optimizer
         self.logger.info("Optimizee parameters: %s", optimizee_parameters)
         self.logger.info("Optimizer parameters: %s", optimizer_parameters)
-        jube.prepare_optimizee(optimizee, self.paths.simulation_path)
         # Add post processing
         self.env.add_postprocessing(optimizer.post_process)
+        # The state of a resumed run has to be restored before the optimizee
+        # is serialized for the optimizee runs
+        self.env.restore_checkpoint(optimizee.simulate)
+        jube.prepare_optimizee(optimizee, self.paths.simulation_path)
         # Run the simulation
         self.env.run(optimizee.simulate)
 
     def end_experiment(self, optimizer):
         """
-        Ends the experiment and disables the logging
+        Ends the experiment, writes the phase timings of the run to
+        timings.csv and timings.json in the results directory and disables the
+        logging
 
         :param optimizer: optimizer object
         :return traj, trajectory object
@@ -179,6 +226,10 @@ class Experiment(object):
         """
         # Outer-loop optimizer end
         optimizer.end(self.traj)
+        export_timings_csv(self.traj, os.path.join(self.paths.results_path,
+                                                   'timings.csv'))
+        export_timings_json(self.traj, os.path.join(self.paths.results_path,
+                                                    'timings.json'))
         # Finally disable logging and close all log-files
         self.env.disable_logging()
         return self.traj, self.paths
@@ -0,0 +1,292 @@
+import os
+import shutil
+import tempfile
+import uuid
+
+import numpy as np
+
+from l2l import ParameterCodec
+from l2l.utils.individual import Individual
+
+
+class SharedNoiseTable:
+    """
+    A large table of standard Gaussian noise, stored in a .npy file which every process opens memory-mapped, so that
+    the operating system shares a single copy of it between all the processes of a node. A perturbation of d values is
+    then described by an offset into the table instead of the d values themselves, as in:
+
+        Salimans, T., Ho, J., Chen, X. & Sutskever, I. Evolution Strategies as a Scalable Alternative to
+        Reinforcement Learning. arXiv:1703.03864 [cs, stat] (2017).
+
+    The table also stores the versions of the center and scale of the search distribution which the individuals are
+    sampled around (see :meth:`store_base`), so that they are written once per generation instead of being sent with
+    every individual. They are written to `base_path`, which unlike the noise belongs to a single run. The versions are
+    kept until they are removed with :meth:`remove_base` or :meth:`remove_bases`, as the individuals stored in a
+    trajectory can only be reconstructed as long as their version exists. The directories of the table have to be
+    reachable from all the processes evaluating individuals, i.e. on a shared file system when they run on several
+    nodes.
+
+    The table is created by the first process which needs it and reused afterwards. Pickling the table only pickles its
+    description, the noise is opened again from the file.
+
+    :param path: Directory of the table
+    :param size: Number of values of the table. It has to be larger than the number of parameters of an individual
+    :param seed: Seed of the random generator filling the table
+    :param dtype: Floating point type of the table, 'float32' (default) or 'float64'
+    :param base_path: Directory of the versions of the search distribution. Defaults to a subdirectory of `path` which
+        is specific to this table object, so that several runs can share the noise
+    """
+
+    def __init__(self, path, size, seed=0, dtype='float32', base_path=None):
+        self.path = os.path.abspath(path)
+        self.size = int(size)
+        self.seed = int(seed)
+        self.dtype = np.dtype(dtype).name
+        self.filename = os.path.join(self.path, 'noise_{}_{}_{}.npy'.format(self.seed, self.size, self.dtype))
+        if base_path is None:
+            base_path = os.path.join(self.path, 'bases_{}'.format(uuid.uuid4().hex))
+        self.base_path = os.path.abspath(base_path)
+        self._noise = None
+        self._bases = {}
+        if not os.path.exists(self.filename):
+            self._create()
+
+    def _create(self, chunk_size=2 ** 20):
+        os.makedirs(self.path, exist_ok=True)
+        # Written under a temporary name first, as other processes may open the table at the same time
+        tmp_filename = '{}.{}.tmp'.format(self.filename, os.getpid())
+        noise = np.lib.format.open_memmap(tmp_filename, mode='w+', dtype=self.dtype, shape=(self.size,))
+        random_state = np.random.RandomState(self.seed)
+        for start in range(0, self.size, chunk_size):
+            stop = min(start + chunk_size, self.size)
+            noise[start:stop] = random_state.standard_normal(stop - start)
+        noise.flush()
+        del noise
+        os.replace(tmp_filename, self.filename)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_noise'] = None
+        state['_bases'] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+
+    @property
+    def noise(self):
+        """
+        The noise of the table, as a read-only memory-mapped array
+        """
+        if self._noise is None:
+            self._noise = np.load(self.filename, mmap_mode='r')
+        return self._noise
+
+    def get(self, offset, dim):
+        """
+        Returns the dim values of noise starting at offset
+        """
+        return self.noise[offset:offset + dim]
+
+    def sample_offsets(self, random_state, n, dim):
+        """
+        Draws the offsets of n perturbations of dim values
+        :param random_state: The random generator to use
+        """
+        if dim > self.size:
+            raise ValueError("The noise table has {} values, which is less than the {} needed for a perturbation"
+                             .format(self.size, dim))
+        return random_state.randint(0, self.size - dim + 1, n)
+
+    def _base_filename(self, version):
+        return os.path.join(self.base_path, 'base_{}.npy'.format(version))
+
+    def store_base(self, version, center, scale):
+        """
+        Stores a version of the center and scale of the search distribution
+        :param version: Id of the version
+        :param center: array of shape (d,)
+        :param scale: array of shape (d,) or scalar
+        """
+        center = np.asarray(center, dtype=np.float64)
+        base = np.vstack((center, np.broadcast_to(scale, center.shape)))
+        filename = self._base_filename(version)
+        os.makedirs(self.base_path, exist_ok=True)
+        tmp_filename = '{}.{}.tmp'.format(filename, os.getpid())
+        with open(tmp_filename, 'wb') as f:
+            np.save(f, base)
+        os.replace(tmp_filename, filename)
+        self._bases[version] = base
+
+    def load_base(self, version):
+        """
+        Returns a stored version of the search distribution as an array of shape (2, d) holding the center and the
+        scale. Only the latest versions are kept in memory
+        """
+        if version not in self._bases:
+            if len(self._bases) >= 2:
+                del self._bases[min(self._bases)]
+            self._bases[version] = np.load(self._base_filename(version))
+        return self._bases[version]
+
+    def remove_base(self, version):
+        """
+        Removes a version of the search distribution which is not used anymore. The individuals of this version, e.g.
+        those stored in a trajectory, cannot be reconstructed afterwards
+        """
+        self._bases.pop(version, None)
+        try:
+            os.remove(self._base_filename(version))
+        except FileNotFoundError:
+            pass
+
+    def remove_bases(self):
+        """
+        Removes all the versions of the search distribution, together with their directory, once the run is over
+        """
+        self._bases = {}
+        shutil.rmtree(self.base_path, ignore_errors=True)
+
+
+def default_noise_table_path(traj):
+    """
+    Returns the default directory of the noise table of a run: the directory `noise_table` in the simulation path of
+    the experiment if the trajectory was prepared by :class:`~l2l.utils.experiment.Experiment`, which is shared with
+    the JUBE runs, and in the temporary directory otherwise
+    :param traj: The trajectory of the run
+    """
+    if 'JUBE_params' in traj.par.keys():
+        return os.path.join(traj.parameters["JUBE_params"].params['paths_obj'].simulation_path, 'noise_table')
+    return os.path.join(tempfile.gettempdir(), 'l2l_noise_table')
+
+
+def default_noise_table_base_path(traj):
+    """
+    Returns the default directory of the versions of the search distribution of a run (see
+    :meth:`SharedNoiseTable.store_base`): the directory `noise_table_bases` in the simulation path of the experiment if
+    the trajectory was prepared by :class:`~l2l.utils.experiment.Experiment`, next to the trajectories stored by the
+    run, and None otherwise, i.e. a subdirectory of the noise table specific to the run
+    :param traj: The trajectory of the run
+    """
+    if 'JUBE_params' in traj.par.keys():
+        return os.path.join(traj.parameters["JUBE_params"].params['paths_obj'].simulation_path, 'noise_table_bases')
+    return None
+
+
+class NoiseTablePopulation:
+    """
+    A population of individuals sampled around the center of a search distribution with the noise of a
+    :class:`SharedNoiseTable`. The parameters of individual i are
+
+        center + signs[i] * scale * noise[offsets[i]:offsets[i] + d]
+
+    where center and scale are the given version stored in the table. Optimizers can assign such a population to
+    `self.eval_pop` instead of a :class:`~l2l.utils.population.Population`: the trajectory then holds
+    :class:`NoiseTableIndividual` objects, which only carry the version, the offset and the sign, and the parameters
+    are reconstructed by the process evaluating the individual.
+
+    :param table: The :class:`SharedNoiseTable`
+    :param version: Version of the search distribution, see :meth:`SharedNoiseTable.store_base`
+    :param offsets: array of shape (n,) with the offset of the perturbation of each individual
+    :param signs: array of shape (n,) with the sign of the perturbation of each individual, 0 for the center itself
+    :param codec: The :class:`~l2l.ParameterCodec` of the individuals
+    """
+
+    def __init__(self, table, version, offsets, signs, codec):
+        self.table = table
+        self.version = version
+        self.offsets = np.asarray(offsets)
+        self.signs = np.asarray(signs)
+        self.codec = codec
+
+    @classmethod
+    def sample(cls, table, version, center, scale, n, mirrored_sampling, random_state, codec, include_center=False):
+        """
+        Stores a version of the search distribution in the table and samples a population around it
+        :param n: Number of perturbations to draw
+        :param mirrored_sampling: Add the mirrored perturbation of each drawn one, which gives 2 * n individuals
+        :param random_state: The random generator used to draw the offsets
+        :param include_center: Add the center as the last individual
+        """
+        table.store_base(version, center, scale)
+        offsets = table.sample_offsets(random_state, n, codec.size)
+        signs = np.ones(n)
+        if mirrored_sampling:
+            offsets = np.concatenate((offsets, offsets))
+            signs = np.concatenate((signs, -signs))
+        if include_center:
+            offsets = np.append(offsets, 0)
+            signs = np.append(signs, 0.)
+        return cls(table, version, offsets, signs, codec)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def noise(self):
+        """
+        Returns the signed perturbations of the individuals before scaling, as an array of shape (n, d)
+        """
+        d = self.codec.size
+        return np.array([sign * self.table.get(offset, d) if sign else np.zeros(d)
+                         for offset, sign in zip(self.offsets, self.signs)], dtype=np.float64)
+
+    @property
+    def values(self):
+        """
+        The parameters of the individuals as an array of shape (n, d)
+        """
+        center, scale = self.table.load_base(self.version)
+        return center + scale * self.noise()
+
+    def __getitem__(self, index):
+        return self._individual(None, index).todict_unprefixed()
+
+    def _individual(self, generation, index):
+        return NoiseTableIndividual(generation, index, self.table, self.version, int(self.offsets[index]),
+                                    float(self.signs[index]), self.codec)
+
+    def individuals(self, generation):
+        """
+        Returns the individuals of the population as a list of :class:`NoiseTableIndividual`
+        :param generation: Id of the generation of the individuals
+        """
+        return [self._individual(generation, index) for index in range(len(self))]
+
+
+class NoiseTableIndividual(Individual):
+    """
+    An individual of a :class:`NoiseTablePopulation`. Only the version of the search distribution, the offset and the
+    sign of its perturbation are pickled, so that sending it to another process costs the same whatever the number of
+    its parameters. Its parameters are reconstructed from the :class:`SharedNoiseTable` when they are first accessed.
+    """
+
+    def __init__(self, generation, ind_idx, table, version, offset, sign, codec):
+        self.generation = generation
+        self.ind_idx = ind_idx
+        self.table = table
+        self.version = version
+        self.offset = offset
+        self.sign = sign
+        self.codec = codec if isinstance(codec, ParameterCodec) else ParameterCodec(codec)
+        self._params = None
+
+    @property
+    def params(self):
+        if self._params is None:
+            center, scale = self.table.load_base(self.version)
+            values = center.copy()
+            if self.sign:
+                values += self.sign * scale * self.table.get(self.offset, self.codec.size)
+            self._params = {'individual.' + key: val for key, val in self.codec.decode(values).items()}
+        return self._params
+
+    def todict_unprefixed(self):
+        """
+        Returns the Individual-Dict of the individual, i.e. its parameters without the 'individual.' prefix
+        """
+        return {key[len('individual.'):]: val for key, val in self.params.items()}
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['_params'] = None
+        return state
@@ -0,0 +1,60 @@
+import csv
+import json
+
+
+def get_timings(trajectory):
+    """
+    Returns the phase timings recorded by the :class:`~l2l.utils.environment.Environment`, see
+    :meth:`~l2l.utils.environment.Environment._record_timings`
+    :param trajectory: The trajectory of the run
+    :return: a dictionary indexed by generation id, with the items 'phases' and 'evaluation_times' for each
+        generation. Empty if no timings were recorded
+    """
+    if 'timings' not in trajectory.results._data:
+        return {}
+    return dict(sorted(trajectory.results.timings._data.items()))
+
+
+def timings_to_rows(trajectory):
+    """
+    Returns the phase timings of a run as a list of rows (generation, phase, ind_idx, seconds). The evaluation time of
+    each individual is a row of the phase 'individual_evaluation', the ind_idx of the other phases is None
+    :param trajectory: The trajectory of the run
+    """
+    rows = []
+    for generation, entry in get_timings(trajectory).items():
+        for phase, seconds in sorted(entry['phases'].items()):
+            rows.append((generation, phase, None, seconds))
+        for ind_idx, seconds in sorted(entry['evaluation_times'].items()):
+            rows.append((generation, 'individual_evaluation', ind_idx, seconds))
+    return rows
+
+
+def export_timings_csv(trajectory, path):
+    """
+    Writes the phase timings of a run to a CSV file with the columns generation, phase, ind_idx and seconds, see
+    :func:`timings_to_rows`
+    :param trajectory: The trajectory of the run
+    :param path: Path of the CSV file
+    """
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['generation', 'phase', 'ind_idx', 'seconds'])
+        for generation, phase, ind_idx, seconds in timings_to_rows(trajectory):
+            writer.writerow([generation, phase, '' if ind_idx is None else ind_idx, seconds])
+
+
+def export_timings_json(trajectory, path):
+    """
+    Writes the phase timings of a run to a JSON file holding a list with one object per generation, with the keys
+    'generation', 'phases' and 'evaluation_times', see :func:`get_timings`
+    :param trajectory: The trajectory of the run
+    :param path: Path of the JSON file
+    """
+    timings = [{'generation': generation,
+                'phases': entry['phases'],
+                'evaluation_times': [{'ind_idx': ind_idx, 'seconds': seconds}
+                                     for ind_idx, seconds in sorted(entry['evaluation_times'].items())]}
+               for generation, entry in get_timings(trajectory).items()]
+    with open(path, 'w') as f:
+        json.dump(timings, f, indent=2)
@@ -0,0 +1,286 @@
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+
+from l2l.utils.evaluation_scheduler import EvaluationError
+
+logger = logging.getLogger("utils.PoolRunner")
+
+# State of each worker process. It is set exactly once per worker by the pool
+# initializer so that the optimizee is not shipped again with every individual
+_worker_runfunc = None
+_worker_trajectory = None
+_worker_started = None
+
+
+def _init_worker(runfunc, trajectory, started):
+    """
+    Initializer of the pool worker processes. Keeps the function to be called from the optimizee (and with it the
+    optimizee itself) and a lean trajectory resident in the worker.
+    :param runfunc: The function to be called from the optimizee
+    :param trajectory: A lean trajectory as returned by :meth:`~l2l.utils.trajectory.Trajectory.lean_copy`
+    :param started: Queue on which the worker reports the tasks it starts, see :meth:`PoolRunner._check_workers`
+    """
+    global _worker_runfunc, _worker_trajectory, _worker_started
+    _worker_runfunc = runfunc
+    _worker_trajectory = trajectory
+    _worker_started = started
+
+
+def _run_individual(task):
+    """
+    Evaluates a single individual inside of a worker process
+    :param task: A tuple (task id, individual to evaluate)
+    :return: a tuple (task id, fitness, time in seconds taken by the evaluation)
+    """
+    task_id, individual = task
+    # Written synchronously, so that the task is known even if the worker dies right away
+    _worker_started.put((task_id, os.getpid()))
+    _worker_trajectory.individual = individual
+    _worker_trajectory.par['generation'] = individual.generation
+    start = time.time()
+    fitness = _worker_runfunc(_worker_trajectory)
+    return task_id, fitness, time.time() - start
+
+
+def _run_chunk(tasks):
+    """
+    Evaluates a chunk of individuals inside of a worker process, see :func:`_run_individual`
+    """
+    return [_run_individual(task) for task in tasks]
+
+
+class PoolRunner:
+    """
+    PoolRunner evaluates the individuals of a generation on a pool of local worker processes. It is meant for single
+    machines with many cores, where the overhead of generating JUBE files and launching a new interpreter per
+    individual dominates the evaluation time.
+    The optimizee is shipped to each worker only once, when the pool is created, and stays resident in the workers
+    for all the generations run through this runner. Only the individuals are sent to the workers afterwards.
+
+    NOTE: The workers keep the parameters of the trajectory as they were when the pool was created. Parameters which
+    are changed by the optimizer after that are not seen by the optimizee, except for the current generation.
+    NOTE: Every worker has its own copy of the optimizee, including its random state. Stochastic optimizees will
+    therefore not produce the same values as in a serial run.
+
+    A worker process which dies while evaluating an individual (e.g. because of a segmentation fault or of the
+    out-of-memory killer) is replaced by the pool, but its individual would never be returned. The workers therefore
+    report which individual they start, and the individual of a dead worker is reported as an
+    :class:`~l2l.utils.evaluation_scheduler.EvaluationError` with the reason 'crash'. The liveness of the workers is
+    checked every `poll_interval` seconds while waiting for results.
+
+    The evaluations which are given up, e.g. because they exceeded their time limit, are stopped by killing the worker
+    process evaluating them, which the pool then replaces by a new one.
+    """
+
+    # Interval in seconds at which the worker processes are checked while waiting for results
+    poll_interval = 0.1
+
+    def __init__(self, runfunc, trajectory, n_workers=None):
+        """
+        Initializes the PoolRunner and starts the worker processes
+        :param runfunc: The function to be called from the optimizee
+        :param trajectory: A trajectory object holding the parameters to be used by the optimizee
+        :param n_workers: Number of worker processes. Defaults to the number of CPUs of the machine
+        """
+        self.n_workers = n_workers if n_workers else os.cpu_count()
+        self._started = multiprocessing.SimpleQueue()
+        self.pool = multiprocessing.Pool(processes=self.n_workers,
+                                         initializer=_init_worker,
+                                         initargs=(runfunc, trajectory.lean_copy(), self._started))
+        # Results of the individuals submitted one by one, in the order in which they are completed
+        self._completed = queue.Queue()
+        # Individuals of the tasks which are not completed yet and pids of the workers which started them, indexed by
+        # task id. The callbacks of the pool run in another thread, hence the lock
+        self._tasks = {}
+        self._task_pids = {}
+        self._next_task_id = 0
+        self._lock = threading.Lock()
+        # Ids of the tasks given up before their worker reported them, whose worker is killed once it does
+        self._cancelled = set()
+        # Set once a task has been lost with its worker or a worker has been killed, as the pool then waits for the lost
+        # tasks forever when closing
+        self._lost_tasks = False
+        # Tuples (generation, ind_idx, seconds) with the time taken by each evaluation, emptied by the environment
+        self.evaluation_times = []
+        logger.info("Started pool with {} worker processes".format(self.n_workers))
+
+    def run(self, trajectory, generation):
+        """
+        Evaluates all the individuals of the generation on the worker pool
+        :param trajectory: trajectory object storing individual parameters for each generation
+        :param generation: id of the generation
+        :return results: a list of tuples (ind_idx, fitness), one for each individual of the generation
+        :raises ~l2l.utils.evaluation_scheduler.EvaluationError: if a worker died while evaluating an individual
+        """
+        individuals = trajectory.individuals[generation]
+        tasks = [self._add_task(ind) for ind in individuals]
+        # A few chunks per worker keep the workers balanced while bounding the communication overhead. The chunks are
+        # made here, as only an iterator over single results can be waited for with a timeout
+        chunksize = max(1, len(individuals) // (4 * self.n_workers))
+        chunks = [tasks[i:i + chunksize] for i in range(0, len(tasks), chunksize)]
+        results = self.pool.imap_unordered(_run_chunk, chunks)
+        fitnesses = {}
+        for _ in chunks:
+            while True:
+                try:
+                    chunk_results = results.next(self.poll_interval)
+                    break
+                except multiprocessing.TimeoutError:
+                    lost = self._check_workers()
+                    if lost:
+                        raise lost[0]
+            self._read_started()
+            for task_id, fitness, seconds in chunk_results:
+                individual = self._pop_task(task_id)
+                self.evaluation_times.append((generation, individual.ind_idx, seconds))
+                fitnesses[individual.ind_idx] = fitness
+        return [(ind.ind_idx, fitnesses[ind.ind_idx]) for ind in individuals]
+
+    def _add_task(self, individual):
+        with self._lock:
+            task_id = self._next_task_id
+            self._next_task_id += 1
+            self._tasks[task_id] = individual
+        return task_id, individual
+
+    def _pop_task(self, task_id):
+        """
+        Returns the individual of a completed task, or None if the task has already been given up as lost
+        """
+        with self._lock:
+            self._task_pids.pop(task_id, None)
+            return self._tasks.pop(task_id, None)
+
+    def _read_started(self):
+        """
+        Reads the reports of the workers on the tasks they started. They are read regularly, as the workers block once
+        the pipe of the queue is full
+        """
+        while not self._started.empty():
+            task_id, pid = self._started.get()
+            with self._lock:
+                if task_id in self._tasks:
+                    self._task_pids[task_id] = pid
+                elif task_id in self._cancelled:
+                    self._cancelled.remove(task_id)
+                    self._kill_worker(pid)
+
+    def _kill_worker(self, pid):
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            # The worker has already finished the task and exited
+            pass
+        self._lost_tasks = True
+
+    def _check_workers(self):
+        """
+        Gives up the tasks whose worker process has died
+        :return: a list of :class:`~l2l.utils.evaluation_scheduler.EvaluationError`, one for each task given up
+        """
+        self._read_started()
+        # Dead worker processes are removed from the children of this process
+        alive = {process.pid for process in multiprocessing.active_children()}
+        errors = []
+        with self._lock:
+            for task_id, pid in list(self._task_pids.items()):
+                if pid not in alive:
+                    del self._task_pids[task_id]
+                    individual = self._tasks.pop(task_id)
+                    errors.append(EvaluationError(individual, 'crash', "The worker process {} died".format(pid)))
+        if errors:
+            self._lost_tasks = True
+        return errors
+
+    @property
+    def n_idle(self):
+        """
+        Number of worker processes which are not evaluating any submitted individual
+        """
+        return self.n_workers - len(self._tasks)
+
+    def submit(self, individual):
+        """
+        Starts the evaluation of a single individual on the worker pool and returns immediately. Its result is
+        returned by :meth:`wait_result` once it is completed.
+        :param individual: The individual to evaluate
+        """
+        task = self._add_task(individual)
+
+        def on_success(result):
+            if self._pop_task(result[0]) is None:
+                return
+            self.evaluation_times.append((individual.generation, individual.ind_idx, result[2]))
+            self._completed.put((individual, result[1]))
+
+        def on_error(error):
+            if self._pop_task(task[0]) is None:
+                return
+            # The traceback of the worker is attached as the cause of the error
+            self._completed.put(EvaluationError(individual, 'error', str(error.__cause__ or error)))
+
+        self.pool.apply_async(_run_individual, (task,), callback=on_success, error_callback=on_error)
+
+    def wait_result(self, timeout=None):
+        """
+        Waits until the evaluation of one of the submitted individuals is completed
+        :param timeout: Maximal time to wait in seconds, or None to wait until an evaluation is completed
+        :return: a tuple (individual, fitness) for the first individual to complete, or None if the timeout expired
+        :raises ~l2l.utils.evaluation_scheduler.EvaluationError: if the evaluation of the individual failed or its
+            worker process died
+        """
+        self._read_started()
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            wait_timeout = self.poll_interval
+            if deadline is not None:
+                wait_timeout = max(0., min(wait_timeout, deadline - time.time()))
+            try:
+                result = self._completed.get(timeout=wait_timeout)
+                break
+            except queue.Empty:
+                pass
+            for error in self._check_workers():
+                self._completed.put(error)
+            if deadline is not None and time.time() >= deadline and self._completed.empty():
+                return None
+        if isinstance(result, EvaluationError):
+            raise result
+        return result
+
+    def cancel(self, individual):
+        """
+        Stops the evaluation of an individual, including the copies of it which are not started yet. The worker
+        processes evaluating it are killed, and replaced by new ones by the pool.
+        :param individual: The individual whose evaluation is stopped
+        """
+        self._read_started()
+        key = (individual.generation, individual.ind_idx)
+        with self._lock:
+            for task_id, ind in list(self._tasks.items()):
+                if (ind.generation, ind.ind_idx) != key:
+                    continue
+                del self._tasks[task_id]
+                pid = self._task_pids.pop(task_id, None)
+                if pid is None:
+                    self._cancelled.add(task_id)
+                else:
+                    logger.info("Killing the worker process {} evaluating individual {} of generation {}".format(
+                        pid, individual.ind_idx, individual.generation))
+                    self._kill_worker(pid)
+
+    def close(self):
+        """
+        Stops the worker processes once all pending evaluations are done. Evaluations which have been given up or lost
+        are not waited for, the worker processes are terminated instead.
+        """
+        if self._tasks or self._cancelled or self._lost_tasks:
+            self.pool.terminate()
+        else:
+            self.pool.close()
+        self.pool.join()
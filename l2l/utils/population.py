@@ -0,0 +1,134 @@
+import numpy as np
+
+from l2l import ParameterCodec
+from l2l.utils.individual import Individual
+
+
+class Population:
+    """
+    A population of individuals stored as a struct of arrays: a single (n, d) array holding the parameters of one
+    individual per row, and the dict specification (see :func:`~l2l.dict_to_list`) shared by all of them. Optimizers
+    which work on arrays of parameters can assign a Population to `self.eval_pop` instead of a list of
+    Individual-Dicts, which avoids converting every individual to a dictionary and back in every generation.
+
+    Indexing and iterating the population gives Individual-Dicts, so that it can be used in place of a list of them.
+    The values of these dictionaries are views into the array of the population, not copies.
+
+    :param values: array of shape (n, d) with the parameters of one individual per row, in the order given by the dict
+        specification
+    :param dict_spec: The dict specification of the individuals, as returned by :func:`~l2l.dict_to_list`, or a
+        :class:`~l2l.ParameterCodec` for it
+    """
+
+    def __init__(self, values, dict_spec):
+        self.values = np.asarray(values)
+        self.codec = dict_spec if isinstance(dict_spec, ParameterCodec) else ParameterCodec(dict_spec)
+        if self.values.ndim != 2:
+            raise ValueError("The values of a population must be an array of shape (n, d), got shape {}"
+                             .format(self.values.shape))
+        if self.codec.size != self.values.shape[1]:
+            raise ValueError("The dict specification describes {} values per individual, but the population has {}"
+                             .format(self.codec.size, self.values.shape[1]))
+
+    @property
+    def dict_spec(self):
+        return self.codec.dict_spec
+
+    @classmethod
+    def from_dicts(cls, individual_dicts, dict_spec=None):
+        """
+        Creates a population from a list of Individual-Dicts
+        :param individual_dicts: The Individual-Dicts, all with the same parameters
+        :param dict_spec: The dict specification of the individuals, or a :class:`~l2l.ParameterCodec` for it.
+            Computed from the first individual if not given
+        """
+        if dict_spec is None:
+            if not individual_dicts:
+                raise ValueError("The dict specification is needed to create an empty population")
+            codec = ParameterCodec.from_individual(individual_dicts[0])
+        elif isinstance(dict_spec, ParameterCodec):
+            codec = dict_spec
+        else:
+            codec = ParameterCodec(dict_spec)
+        return cls(codec.encode_population(individual_dicts), codec)
+
+    def __len__(self):
+        return self.values.shape[0]
+
+    def __getitem__(self, index):
+        return self.codec.decode(self.values[index])
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def to_dicts(self):
+        """
+        Returns the individuals as a list of Individual-Dicts
+        """
+        return self.codec.decode_population(self.values)
+
+    def bounded(self, bounding_func):
+        """
+        Returns a new population with the bounding function of the optimizee applied on each individual
+        :param bounding_func: Function taking and returning an Individual-Dict, e.g. the bounding_func of the optimizee
+        """
+        return Population.from_dicts([bounding_func(ind) for ind in self], self.codec)
+
+    def parameter(self, key):
+        """
+        Returns the values of the given parameter for all the individuals, i.e. an array of shape (n,) for a scalar
+        parameter or (n, length) for a sequence, as a view into the population
+        :param key: Name of the parameter in the Individual-Dicts
+        """
+        return self.values[:, dict(self.codec.columns)[key]]
+
+    def individuals(self, generation):
+        """
+        Returns the individuals of the population as a sequence of :class:`~l2l.utils.individual.Individual`, which
+        is what the trajectory stores for each generation
+        :param generation: Id of the generation of the individuals
+        """
+        return PopulationIndividuals(self, generation)
+
+
+class PopulationIndividuals:
+    """
+    Read-only sequence of the :class:`~l2l.utils.individual.Individual` objects of a :class:`Population`. The
+    individuals are only created when they are accessed, with their parameters as views into the population, so a
+    worker which receives an individual only receives its own row of the population.
+    """
+
+    def __init__(self, population, generation):
+        self.population = population
+        self.generation = generation
+
+    def __len__(self):
+        return len(self.population)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Individual index {} out of range".format(index))
+        ind = Individual(self.generation, index)
+        ind.params = {'individual.' + key: val for key, val in self.population[index].items()}
+        return ind
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+
+def stack_parameter(individuals, key):
+    """
+    Returns the values of a parameter for a list of individuals as a single array with one row per individual. If the
+    individuals are those of a :class:`Population`, the array is a view into it and nothing is copied.
+    :param individuals: list of :class:`~l2l.utils.individual.Individual`
+    :param key: Name of the parameter, without the 'individual.' prefix
+    """
+    if isinstance(individuals, PopulationIndividuals):
+        return individuals.population.parameter(key)
+    return np.array([ind.params['individual.' + key] for ind in individuals])
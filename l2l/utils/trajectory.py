@@ -1,4 +1,6 @@
 import time
+
+from l2l import timed
 from l2l.utils.groups import ParameterGroup, ResultGroup, ParameterDict
 from l2l.utils.individual import Individual
 import logging
@@ -26,11 +28,15 @@ class Trajectory:
         self.individual = Individual()
         self.results = ResultGroup()
         self.results.f_add_result_group('all_results', "Contains all the results")
+        self.results.f_add_result_group('evaluation_failures', "Contains the failed evaluations of individuals")
+        self.results.f_add_result_group('timings', "Contains the time spent in each phase of every generation")
         self.current_results = {}
         self._parameters.parameter_group = {}
         self._parameters.parameter = {}
         self.individuals = {}
         self.v_idx = 0
+        # Time in seconds spent in each phase of the current generation, see Environment
+        self.phase_timings = {}
 
     def copy(self):
         from copy import copy as cp
@@ -49,6 +55,25 @@ class Trajectory:
 
         return t
 
+    def lean_copy(self):
+        """
+        Returns a copy of the trajectory which only holds the parameters and the current individual, i.e. without the
+        individuals and results of all the generations. This is what an optimizee needs to be simulated, and it does
+        not grow with the length of the run, which makes it cheap to send to other processes.
+        The parameters are shared with this trajectory, not copied.
+        """
+        t = Trajectory()
+        if hasattr(self, '_name'):
+            t._name = self._name
+        t._timestamp = self._timestamp
+        for key, val in self._parameters._data.items():
+            # The parameter dictionary keeps a reference to its trajectory, which must not be carried over
+            if key != 'trajectory':
+                t._parameters._data[key] = val
+        t.individual = self.individual
+        t.v_idx = self.v_idx
+        return t
+
     def f_add_parameter_group(self, name, comment=""):
         """
         Adds a new parameter group
@@ -112,6 +137,10 @@ class Trajectory:
         :param build_dict: The dictionary containing the new generation id and its individuals
         :param fail_safe: Currently ignored
         """
+        with timed(None, 'f_expand', self.phase_timings):
+            self._expand(build_dict)
+
+    def _expand(self, build_dict):
         params = {}
         gen = []
         ind_idx = []
@@ -134,6 +163,19 @@ class Trajectory:
             self.individuals[generation].append(ind)
         logging.info("Expanded trajectory for generation: " + str(generation))
 
+    def f_expand_population(self, population, generation):
+        """
+        Adds a new generation to the trajectory from a :class:`~l2l.utils.population.Population` or a
+        :class:`~l2l.utils.noise_table.NoiseTablePopulation`. Unlike :meth:`f_expand`, the individuals are not copied
+        one by one: the population is stored as it is, and the individuals are created from its rows when they are
+        accessed.
+        :param population: The population of the new generation
+        :param generation: The id of the new generation
+        """
+        with timed(None, 'f_expand', self.phase_timings):
+            self.individuals[generation] = population.individuals(generation)
+        logging.info("Expanded trajectory for generation: " + str(generation))
+
     def __str__(self):
         return str(self._parameters)
 
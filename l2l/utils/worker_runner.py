@@ -0,0 +1,322 @@
+import argparse
+import logging
+import os
+import socket
+import subprocess
+import sys
+import time
+import traceback
+from collections import deque
+from multiprocessing.connection import Client, Listener, wait
+
+from l2l import timed
+from l2l.utils.evaluation_scheduler import EvaluationError
+
+logger = logging.getLogger("utils.WorkerRunner")
+
+# Environment variable holding the (hex encoded) key used to authenticate the workers
+AUTHKEY_ENV = 'L2L_WORKER_AUTHKEY'
+
+
+class WorkerRunner:
+    """
+    WorkerRunner evaluates the individuals on long-lived worker daemons connected through sockets. Every worker
+    receives the optimizee once, when it connects, and keeps it in memory for the whole experiment. Afterwards only the
+    individuals are sent to the workers and only the fitness values are sent back, so there is neither an interpreter
+    start-up nor a deserialisation of the optimizee per evaluation.
+
+    By default the workers are started as local processes. If an address is given, the workers are expected to be
+    started by the user instead, e.g. on other nodes, with::
+
+        L2L_WORKER_AUTHKEY=<key> python -m l2l.utils.worker_runner <host> <port>
+
+    where the key is the one set in the same environment variable for the process running the experiment.
+
+    NOTE: As for the :class:`~l2l.utils.pool_runner.PoolRunner`, the workers keep the parameters of the trajectory
+    as they were when the workers were started, except for the current generation.
+
+    A local worker process which exits before it is connected, e.g. because it cannot import the modules of the
+    optimizee, makes the WorkerRunner raise instead of waiting for it forever. The local worker processes are checked
+    every `poll_interval` seconds while waiting for them to connect.
+    """
+
+    # Interval in seconds at which the local worker processes are checked while waiting for them to connect
+    poll_interval = 0.1
+
+    def __init__(self, runfunc, trajectory, n_workers=None, address=None):
+        """
+        Initializes the WorkerRunner, waits for the workers to connect and sends them the optimizee
+        :param runfunc: The function to be called from the optimizee
+        :param trajectory: A trajectory object holding the parameters to be used by the optimizee
+        :param n_workers: Number of workers. Defaults to the number of CPUs of the machine
+        :param address: (host, port) tuple to listen on for external workers. If not given, n_workers local worker
+                        processes are started instead
+        """
+        self.n_workers = n_workers if n_workers else os.cpu_count()
+        if AUTHKEY_ENV in os.environ:
+            authkey = bytes.fromhex(os.environ[AUTHKEY_ENV])
+        else:
+            authkey = os.urandom(32)
+        self.listener = Listener(address if address else ('127.0.0.1', 0), authkey=authkey)
+        # Listener does not take a timeout, so it is set on its socket, which the accepted connections do not inherit
+        self.listener._listener._socket.settimeout(self.poll_interval)
+        self.local = address is None
+        # Local worker processes, indexed by their pid
+        self.processes = {}
+        if self.local:
+            for _ in range(self.n_workers):
+                self._start_local_worker(authkey)
+        else:
+            host, port = self.listener.address
+            logger.info("Waiting for {} workers to connect to {}:{}".format(self.n_workers, host, port))
+
+        self._authkey = authkey
+        self._runfunc = runfunc
+        self._lean_trajectory = trajectory.lean_copy()
+        self.connections = []
+        # The pid of the worker behind each connection and the individual it is evaluating
+        self._pids = {}
+        self._evaluating = {}
+        # Tuples (generation, ind_idx, seconds) with the time taken by each evaluation, emptied by the environment
+        self.evaluation_times = []
+        try:
+            for _ in range(self.n_workers):
+                self._accept_worker()
+            # The workers load the optimizee in parallel, and only count as idle once it is loaded
+            for conn in self.connections:
+                self._wait_ready(conn)
+        except BaseException:
+            self.listener.close()
+            for process in self.processes.values():
+                process.kill()
+                process.wait()
+            raise
+        logger.info("Connected to {} workers".format(self.n_workers))
+
+        self._idle = list(self.connections)
+        self._busy = []
+        # Individuals submitted while all the workers were busy, and results received but not yet returned
+        self._queued = deque()
+        self._ready = deque()
+
+    def _start_local_worker(self, authkey):
+        host, port = self.listener.address
+        env = dict(os.environ)
+        env[AUTHKEY_ENV] = authkey.hex()
+        # The workers have to be able to import the modules of the optimizee, just as this process does
+        env['PYTHONPATH'] = os.pathsep.join(p for p in sys.path if p)
+        process = subprocess.Popen([sys.executable, '-m', 'l2l.utils.worker_runner', host, str(port)], env=env)
+        self.processes[process.pid] = process
+
+    def _accept_worker(self):
+        while True:
+            try:
+                conn = self.listener.accept()
+                break
+            except socket.timeout:
+                self._check_unconnected_workers()
+        self._pids[conn] = conn.recv()
+        conn.send((self._runfunc, self._lean_trajectory))
+        self.connections.append(conn)
+        return conn
+
+    def _check_unconnected_workers(self):
+        """
+        Raises if a local worker process which is not connected yet has exited, as it will never connect
+        """
+        connected = set(self._pids.values())
+        for pid, process in self.processes.items():
+            if pid not in connected and process.poll() is not None:
+                raise Exception("The worker process {} exited with code {} before connecting".format(
+                    pid, process.returncode))
+
+    def _wait_ready(self, conn):
+        try:
+            conn.recv()
+        except EOFError:
+            process = self.processes.get(self._pids[conn])
+            if process is None:
+                raise Exception("A worker failed to load the optimizee")
+            raise Exception("The worker process {} failed to load the optimizee and exited with code {}".format(
+                process.pid, process.wait()))
+
+    @property
+    def n_idle(self):
+        """
+        Number of workers which are not evaluating any individual
+        """
+        return len(self._idle)
+
+    def run(self, trajectory, generation):
+        """
+        Evaluates all the individuals of the generation on the workers. A new individual is sent to a worker as soon
+        as it returns the fitness of the previous one.
+        :param trajectory: trajectory object storing individual parameters for each generation
+        :param generation: id of the generation
+        :return results: a list of tuples (ind_idx, fitness), one for each individual of the generation
+        """
+        individuals = trajectory.individuals[generation]
+        with timed(None, 'dispatch', trajectory.phase_timings):
+            for ind in individuals:
+                self.submit(ind)
+        fitnesses = {}
+        for _ in individuals:
+            ind, fitness = self.wait_result()
+            fitnesses[ind.ind_idx] = fitness
+        return [(ind.ind_idx, fitnesses[ind.ind_idx]) for ind in individuals]
+
+    def submit(self, individual):
+        """
+        Sends an individual to an idle worker, or queues it until a worker is idle, and returns immediately. Its
+        result is returned by :meth:`wait_result` once it is completed.
+        :param individual: The individual to evaluate
+        """
+        self._queued.append(individual)
+        self._dispatch()
+
+    def wait_result(self, timeout=None):
+        """
+        Waits until the evaluation of one of the submitted individuals is completed
+        :param timeout: Maximal time to wait in seconds, or None to wait until an evaluation is completed
+        :return: a tuple (individual, fitness) for the first individual to complete, or None if the timeout expired
+        :raises ~l2l.utils.evaluation_scheduler.EvaluationError: if the evaluation of the individual failed. A local
+            worker whose evaluation failed is replaced by a new one, an external worker is only disconnected if its
+            connection was lost
+        """
+        while not self._ready:
+            self._dispatch()
+            if not self._busy:
+                raise Exception("No individual is being evaluated on the workers")
+            ready = wait(self._busy, timeout)
+            if not ready:
+                return None
+            for conn in ready:
+                individual = self._evaluating[conn]
+                try:
+                    status, _, value, seconds = conn.recv()
+                except EOFError:
+                    self._replace_worker(conn)
+                    raise EvaluationError(individual, 'crash', "Lost the connection to the worker")
+                except Exception as e:
+                    self._replace_worker(conn)
+                    raise EvaluationError(individual, 'corrupt', "Could not receive the result: {}".format(e))
+                if status != 'ok':
+                    if self._pids[conn] in self.processes:
+                        self._replace_worker(conn)
+                    else:
+                        self._release(conn)
+                    raise EvaluationError(individual, 'error', value)
+                self.evaluation_times.append((individual.generation, individual.ind_idx, seconds))
+                self._ready.append((individual, value))
+                self._release(conn)
+        self._dispatch()
+        return self._ready.popleft()
+
+    def _release(self, conn):
+        del self._evaluating[conn]
+        self._busy.remove(conn)
+        self._idle.append(conn)
+
+    def cancel(self, individual):
+        """
+        Stops the evaluation of an individual, including the copies of it which are queued. A local worker evaluating
+        it is killed and replaced by a new one. An external worker cannot be restarted, so it is disconnected and the
+        evaluations go on with the remaining workers.
+        :param individual: The individual whose evaluation is stopped
+        """
+        key = (individual.generation, individual.ind_idx)
+        self._queued = deque(ind for ind in self._queued if (ind.generation, ind.ind_idx) != key)
+        for conn, ind in list(self._evaluating.items()):
+            if (ind.generation, ind.ind_idx) == key:
+                self._replace_worker(conn)
+        self._dispatch()
+
+    def _replace_worker(self, conn):
+        self._busy.remove(conn)
+        self.connections.remove(conn)
+        self._evaluating.pop(conn, None)
+        conn.close()
+        process = self.processes.pop(self._pids.pop(conn), None)
+        if process is not None:
+            process.kill()
+            process.wait()
+            self._start_local_worker(self._authkey)
+            conn = self._accept_worker()
+            self._wait_ready(conn)
+            self._idle.append(conn)
+            logger.info("Replaced the worker process {}".format(process.pid))
+        else:
+            self.n_workers -= 1
+            logger.warning("Disconnected a worker, {} workers are left".format(self.n_workers))
+            if not self.connections:
+                raise Exception("No worker is left")
+
+    def _dispatch(self):
+        """
+        Sends the queued individuals to the idle workers
+        """
+        while self._idle and self._queued:
+            conn = self._idle.pop()
+            individual = self._queued.popleft()
+            conn.send(individual)
+            self._evaluating[conn] = individual
+            self._busy.append(conn)
+
+    def close(self):
+        """
+        Stops the workers and closes all the connections
+        """
+        for conn in self.connections:
+            try:
+                conn.send(None)
+            except OSError:
+                pass
+            conn.close()
+        self.listener.close()
+        for process in self.processes.values():
+            if process.poll() is None and any(self._pids[conn] == process.pid for conn in self._busy):
+                # The worker is still evaluating an individual which is not waited for anymore
+                process.kill()
+            process.wait()
+
+
+def work(host, port, authkey):
+    """
+    Main loop of a worker. Connects to the WorkerRunner, receives the optimizee once and then evaluates the
+    individuals it is sent until it receives None.
+    :param host: Host the WorkerRunner listens on
+    :param port: Port the WorkerRunner listens on
+    :param authkey: Key used to authenticate the connection
+    """
+    conn = Client((host, port), authkey=authkey)
+    conn.send(os.getpid())
+    runfunc, trajectory = conn.recv()
+    conn.send('ready')
+    while True:
+        try:
+            individual = conn.recv()
+        except EOFError:
+            break
+        if individual is None:
+            break
+        trajectory.individual = individual
+        trajectory.par['generation'] = individual.generation
+        start = time.time()
+        try:
+            result = ('ok', individual.ind_idx, runfunc(trajectory), time.time() - start)
+        except Exception:
+            result = ('error', individual.ind_idx, traceback.format_exc(), time.time() - start)
+        try:
+            conn.send(result)
+        except OSError:
+            # The WorkerRunner has disconnected the worker
+            break
+    conn.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Worker evaluating individuals for a WorkerRunner")
+    parser.add_argument('host', help="Host the WorkerRunner listens on")
+    parser.add_argument('port', type=int, help="Port the WorkerRunner listens on")
+    args = parser.parse_args()
+    work(args.host, args.port, bytes.fromhex(os.environ[AUTHKEY_ENV]))